@@ -3,8 +3,7 @@ from logging.config import fileConfig
 from alembic import context
 from sqlalchemy import engine_from_config, pool
 
-from app.core.db import Base
-from app.settings import settings
+from app.core.db import Base, database_url, is_sqlite
 
 # Import models so they register on Base.metadata for autogenerate.
 from app.core import models_base  # noqa: F401
@@ -13,8 +12,12 @@ from app.modules.medical import models  # noqa: F401
 
 config = context.config
 
-# Same DB the app uses (local ./data/db or NAS /app/data/db).
-config.set_main_option("sqlalchemy.url", f"sqlite:///{settings.db_path}")
+# Same DB the app uses (DATABASE_URL, else local ./data/db or NAS /app/data/db).
+_url = database_url()
+# ConfigParser interpolates %, which URL-encoded passwords may contain.
+config.set_main_option("sqlalchemy.url", _url.render_as_string(hide_password=False).replace("%", "%%"))
+# SQLite can't ALTER most things in place: emit them via batch (copy-and-move).
+_batch = is_sqlite(_url)
 
 if config.config_file_name is not None:
     fileConfig(config.config_file_name)
@@ -27,7 +30,7 @@ def run_migrations_offline() -> None:
         url=config.get_main_option("sqlalchemy.url"),
         target_metadata=target_metadata,
         literal_binds=True,
-        render_as_batch=True,  # SQLite: emit ALTER via batch (copy-and-move)
+        render_as_batch=_batch,
         compare_type=True,
     )
     with context.begin_transaction():
@@ -44,7 +47,7 @@ def run_migrations_online() -> None:
         context.configure(
             connection=connection,
             target_metadata=target_metadata,
-            render_as_batch=True,  # SQLite: emit ALTER via batch
+            render_as_batch=_batch,
             compare_type=True,
         )
         with context.begin_transaction():
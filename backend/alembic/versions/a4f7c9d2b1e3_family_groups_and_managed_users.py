@@ -65,9 +65,10 @@ def upgrade() -> None:
         conn.execute(
             sa.text(
                 "INSERT INTO family_memberships(family_id, user_id, family_role, is_active) "
-                "VALUES (:family_id, :user_id, :family_role, 1)"
+                "VALUES (:family_id, :user_id, :family_role, :is_active)"
             ),
-            {"family_id": family_id, "user_id": u.id, "family_role": family_role},
+            # Bound, not a literal 1: PostgreSQL won't cast an integer to boolean.
+            {"family_id": family_id, "user_id": u.id, "family_role": family_role, "is_active": True},
         )
 
 
@@ -0,0 +1,51 @@
+"""add canonical-unit values to medical report metric maps
+
+Revision ID: a9c4e2b7d1f5
+Revises: f6d2c9a4e3b8
+Create Date: 2026-10-18 16:10:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a9c4e2b7d1f5'
+down_revision: Union[str, None] = 'f6d2c9a4e3b8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table('medical_report_metric_maps', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('canonical_value', sa.Float(), nullable=True))
+        batch_op.add_column(sa.Column('canonical_ref_low', sa.Float(), nullable=True))
+        batch_op.add_column(sa.Column('canonical_ref_high', sa.Float(), nullable=True))
+
+    # Metrics already in the canonical unit copy over as-is. Converted
+    # values need the unit registry and are filled by a mapping rebuild
+    # (scripts/medical_remap_metrics.py).
+    op.execute(
+        sa.text(
+            "UPDATE medical_report_metric_maps SET "
+            "canonical_value = (SELECT m.value_num FROM medical_report_metrics m "
+            "WHERE m.id = medical_report_metric_maps.report_metric_id), "
+            "canonical_ref_low = (SELECT m.ref_low FROM medical_report_metrics m "
+            "WHERE m.id = medical_report_metric_maps.report_metric_id), "
+            "canonical_ref_high = (SELECT m.ref_high FROM medical_report_metrics m "
+            "WHERE m.id = medical_report_metric_maps.report_metric_id) "
+            "WHERE EXISTS (SELECT 1 FROM medical_report_metrics m "
+            "JOIN medical_metric_dictionary d ON d.id = medical_report_metric_maps.dictionary_id "
+            "WHERE m.id = medical_report_metric_maps.report_metric_id "
+            "AND COALESCE(TRIM(m.unit), '') = COALESCE(TRIM(d.canonical_unit), ''))"
+        )
+    )
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('medical_report_metric_maps', schema=None) as batch_op:
+        batch_op.drop_column('canonical_ref_high')
+        batch_op.drop_column('canonical_ref_low')
+        batch_op.drop_column('canonical_value')
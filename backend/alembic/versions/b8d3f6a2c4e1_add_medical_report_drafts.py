@@ -0,0 +1,44 @@
+"""add medical report drafts
+
+Revision ID: b8d3f6a2c4e1
+Revises: f3b1c2d4e5a6
+Create Date: 2026-07-02 21:10:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b8d3f6a2c4e1'
+down_revision: Union[str, None] = 'f3b1c2d4e5a6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'medical_report_drafts',
+        sa.Column('id', sa.String(), nullable=False),
+        sa.Column('uploader_id', sa.Integer(), nullable=False),
+        sa.Column('subject_id', sa.Integer(), nullable=True),
+        sa.Column('status', sa.String(), server_default='parsing', nullable=False),
+        sa.Column('payload_json', sa.JSON(), nullable=False),
+        sa.Column('expires_at', sa.DateTime(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=False),
+        sa.ForeignKeyConstraint(['uploader_id'], ['users.id']),
+        sa.ForeignKeyConstraint(['subject_id'], ['users.id']),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    with op.batch_alter_table('medical_report_drafts', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_medical_report_drafts_uploader_id'), ['uploader_id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_medical_report_drafts_expires_at'), ['expires_at'], unique=False)
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('medical_report_drafts', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_medical_report_drafts_expires_at'))
+        batch_op.drop_index(batch_op.f('ix_medical_report_drafts_uploader_id'))
+    op.drop_table('medical_report_drafts')
@@ -0,0 +1,32 @@
+"""add accessed_at to medical report drafts
+
+Revision ID: c2e7a9f4d1b6
+Revises: b8d3f6a2c4e1
+Create Date: 2026-07-04 10:25:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c2e7a9f4d1b6'
+down_revision: Union[str, None] = 'b8d3f6a2c4e1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table('medical_report_drafts', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('accessed_at', sa.DateTime(), nullable=True))
+        batch_op.create_index(batch_op.f('ix_medical_report_drafts_accessed_at'), ['accessed_at'], unique=False)
+
+    op.execute(sa.text("UPDATE medical_report_drafts SET accessed_at = created_at"))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('medical_report_drafts', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_medical_report_drafts_accessed_at'))
+        batch_op.drop_column('accessed_at')
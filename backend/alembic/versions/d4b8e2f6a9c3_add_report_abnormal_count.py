@@ -0,0 +1,36 @@
+"""add denormalized abnormal_count to medical reports
+
+Revision ID: d4b8e2f6a9c3
+Revises: c2e7a9f4d1b6
+Create Date: 2026-10-18 09:40:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd4b8e2f6a9c3'
+down_revision: Union[str, None] = 'c2e7a9f4d1b6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table('medical_reports', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('abnormal_count', sa.Integer(), server_default='0', nullable=False))
+
+    op.execute(
+        sa.text(
+            "UPDATE medical_reports SET abnormal_count = ("
+            "SELECT COUNT(*) FROM medical_report_metrics m "
+            "WHERE m.report_id = medical_reports.id AND m.abnormal_flag IN ('high', 'low'))"
+        )
+    )
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('medical_reports', schema=None) as batch_op:
+        batch_op.drop_column('abnormal_count')
@@ -0,0 +1,36 @@
+"""add report list keyset index
+
+Revision ID: e1c5a8d3b7f2
+Revises: d4b8e2f6a9c3
+Create Date: 2026-10-18 11:05:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e1c5a8d3b7f2'
+down_revision: Union[str, None] = 'd4b8e2f6a9c3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        'ix_medical_reports_list_order',
+        'medical_reports',
+        [
+            sa.text('(report_date IS NULL)'),
+            sa.text('report_date DESC'),
+            sa.text('created_at DESC'),
+            sa.text('id DESC'),
+        ],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_medical_reports_list_order', table_name='medical_reports')
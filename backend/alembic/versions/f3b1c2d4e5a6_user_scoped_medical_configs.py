@@ -32,12 +32,12 @@ def upgrade() -> None:
                 SELECT fm.user_id
                 FROM family_memberships fm
                 WHERE fm.family_id = medical_report_categories.family_id
-                  AND fm.is_active = 1
+                  AND fm.is_active = :active
                 ORDER BY fm.family_role = 'admin' DESC, fm.user_id ASC
                 LIMIT 1
             )
             """
-        )
+        ).bindparams(active=True)
     )
 
     op.execute(sa.text("DELETE FROM medical_report_categories WHERE user_id IS NULL"))
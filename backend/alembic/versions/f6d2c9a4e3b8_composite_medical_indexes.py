@@ -0,0 +1,57 @@
+"""composite indexes for medical list/trend/catalog queries
+
+Revision ID: f6d2c9a4e3b8
+Revises: e1c5a8d3b7f2
+Create Date: 2026-10-18 14:20:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f6d2c9a4e3b8'
+down_revision: Union[str, None] = 'e1c5a8d3b7f2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Each composite replaces the single-column index on its leading column.
+    with op.batch_alter_table('medical_reports', schema=None) as batch_op:
+        batch_op.create_index('ix_medical_reports_subject_date', ['subject_id', 'report_date'], unique=False)
+        batch_op.create_index('ix_medical_reports_uploader_subject', ['uploader_id', 'subject_id'], unique=False)
+        batch_op.drop_index(batch_op.f('ix_medical_reports_subject_id'))
+        batch_op.drop_index(batch_op.f('ix_medical_reports_uploader_id'))
+
+    with op.batch_alter_table('medical_report_metrics', schema=None) as batch_op:
+        batch_op.create_index(
+            'ix_medical_report_metrics_report_item', ['report_id', 'item_code', 'item_name'], unique=False
+        )
+        batch_op.drop_index(batch_op.f('ix_medical_report_metrics_report_id'))
+
+    with op.batch_alter_table('medical_report_metric_maps', schema=None) as batch_op:
+        batch_op.create_index(
+            'ix_medical_report_metric_maps_dictionary_metric', ['dictionary_id', 'report_metric_id'], unique=False
+        )
+        batch_op.drop_index(batch_op.f('ix_medical_report_metric_maps_dictionary_id'))
+
+    op.execute(sa.text("ANALYZE"))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('medical_report_metric_maps', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_medical_report_metric_maps_dictionary_id'), ['dictionary_id'], unique=False)
+        batch_op.drop_index('ix_medical_report_metric_maps_dictionary_metric')
+
+    with op.batch_alter_table('medical_report_metrics', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_medical_report_metrics_report_id'), ['report_id'], unique=False)
+        batch_op.drop_index('ix_medical_report_metrics_report_item')
+
+    with op.batch_alter_table('medical_reports', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_medical_reports_uploader_id'), ['uploader_id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_medical_reports_subject_id'), ['subject_id'], unique=False)
+        batch_op.drop_index('ix_medical_reports_uploader_subject')
+        batch_op.drop_index('ix_medical_reports_subject_date')
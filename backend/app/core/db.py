@@ -1,18 +1,99 @@
 import os
 
-from sqlalchemy import create_engine
+from sqlalchemy import URL, create_engine, event, make_url
 from sqlalchemy.orm import DeclarativeBase, sessionmaker
 
 from app.settings import settings
 
-os.makedirs(os.path.dirname(settings.db_path), exist_ok=True)
+# Async driver used for each backend when settings.async_db is on.
+_ASYNC_DRIVERS = {"sqlite": "sqlite+aiosqlite", "postgresql": "postgresql+asyncpg"}
+
+
+def database_url() -> URL:
+    """settings.database_url, or the SQLite file at settings.db_path."""
+    return make_url(settings.database_url or f"sqlite:///{settings.db_path}")
+
+
+def is_sqlite(url: URL) -> bool:
+    return url.get_backend_name() == "sqlite"
+
+
+def engine_options(url: URL) -> dict:
+    """create_engine kwargs for `url`: SQLite gets its thread flag, server
+    databases get the configured pool."""
+    if is_sqlite(url):
+        return {"connect_args": {"check_same_thread": False}}
+    return {
+        "pool_size": settings.db_pool_size,
+        "max_overflow": settings.db_max_overflow,
+        "pool_timeout": settings.db_pool_timeout,
+        "pool_recycle": settings.db_pool_recycle,
+        "pool_pre_ping": settings.db_pool_pre_ping,
+    }
+
+
+def async_database_url(url: URL) -> URL:
+    backend = url.get_backend_name()
+    if backend not in _ASYNC_DRIVERS:
+        raise RuntimeError(f"no async driver configured for {backend}")
+    return url.set(drivername=_ASYNC_DRIVERS[backend])
+
+
+_url = database_url()
+if is_sqlite(_url) and _url.database and _url.database != ":memory:":
+    os.makedirs(os.path.dirname(os.path.abspath(_url.database)), exist_ok=True)
+
+engine = create_engine(_url, **engine_options(_url))
+
+
+def sqlite_pragmas() -> list[str]:
+    """Per-connection tuning from settings. WAL lets readers keep going while
+    a long write (bootstrap, rebuild mappings) is in progress; the rest trade
+    a little durability on power loss for far fewer fsyncs."""
+    return [
+        f"PRAGMA busy_timeout = {int(settings.sqlite_busy_timeout_ms)}",
+        f"PRAGMA journal_mode = {settings.sqlite_journal_mode}",
+        f"PRAGMA synchronous = {settings.sqlite_synchronous}",
+        # Negative cache_size is in KiB rather than pages.
+        f"PRAGMA cache_size = {-int(settings.sqlite_cache_size_kb)}",
+        f"PRAGMA mmap_size = {int(settings.sqlite_mmap_size)}",
+        f"PRAGMA temp_store = {settings.sqlite_temp_store}",
+        f"PRAGMA foreign_keys = {'ON' if settings.sqlite_foreign_keys else 'OFF'}",
+    ]
+
+
+def apply_sqlite_pragmas(dbapi_connection) -> None:
+    cursor = dbapi_connection.cursor()
+    try:
+        for pragma in sqlite_pragmas():
+            cursor.execute(pragma)
+    finally:
+        cursor.close()
+
+
+def _on_connect(dbapi_connection, connection_record) -> None:
+    apply_sqlite_pragmas(dbapi_connection)
+
+
+if is_sqlite(_url):
+    event.listen(engine, "connect", _on_connect)
+
 
-engine = create_engine(
-    f"sqlite:///{settings.db_path}",
-    connect_args={"check_same_thread": False},
-)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Optional async engine on the same database (settings.async_db). Sessions
+# from here run the ordinary sync query code via AsyncSession.run_sync, so
+# the DB I/O happens on the async driver instead of a threadpool slot.
+async_engine = None
+AsyncSessionLocal = None
+if settings.async_db:
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+    async_engine = create_async_engine(async_database_url(_url), **engine_options(_url))
+    if is_sqlite(_url):
+        event.listen(async_engine.sync_engine, "connect", _on_connect)
+    AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False)
+
 
 class Base(DeclarativeBase):
     pass
@@ -24,3 +105,10 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+async def get_async_db():
+    if AsyncSessionLocal is None:
+        raise RuntimeError("async DB is disabled (set ASYNC_DB=true)")
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -1,29 +1,104 @@
+import functools
+import inspect
+
 from fastapi import Depends, Header
 from sqlalchemy.orm import Session
 
-from app.core.db import get_db
+from app.core.db import get_async_db, get_db
 from app.core.exceptions import PikaException
 from app.core.user import service as user_service
 from app.core.user.models import FamilyMembership, User
+from app.settings import settings
 
 
-def get_current_user(
-    x_pika_token: str | None = Header(default=None),
-    db: Session = Depends(get_db),
-) -> User:
-    if not x_pika_token:
+def _resolve_user(db: Session, token: str | None) -> User:
+    if not token:
         raise PikaException("missing X-Pika-Token", code=401)
-    user = db.query(User).filter(User.openid == x_pika_token).first()
+    user = user_service.get_user_by_openid(db, openid=token)
     if not user:
         raise PikaException("invalid token", code=401)
     return user
 
 
-def get_current_membership(
-    user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
-) -> FamilyMembership:
+def _resolve_membership(db: Session, user: User) -> FamilyMembership:
     membership = user_service.ensure_user_family(db, user=user)
     if not membership or not membership.is_active:
         raise PikaException("family membership required", code=403)
     return membership
+
+
+def get_current_user(
+    x_pika_token: str | None = Header(default=None),
+    db: Session = Depends(get_db),
+) -> User:
+    return _resolve_user(db, x_pika_token)
+
+
+def get_current_membership(
+    user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+) -> FamilyMembership:
+    return _resolve_membership(db, user)
+
+
+async def get_current_user_async(
+    x_pika_token: str | None = Header(default=None),
+    db=Depends(get_async_db),
+) -> User:
+    return await db.run_sync(_resolve_user, x_pika_token)
+
+
+async def get_current_membership_async(
+    user: User = Depends(get_current_user_async),
+    db=Depends(get_async_db),
+) -> FamilyMembership:
+    return await db.run_sync(_resolve_membership, user)
+
+
+_ASYNC_DEPENDENCIES = {
+    get_db: get_async_db,
+    get_current_user: get_current_user_async,
+    get_current_membership: get_current_membership_async,
+}
+
+
+def to_async_endpoint(func):
+    """Wrap a sync DB endpoint as an async one on the async session.
+
+    The signature is copied with get_db / get_current_user /
+    get_current_membership swapped for their async counterparts, and the
+    body runs unchanged inside AsyncSession.run_sync, receiving the
+    session's sync facade as `db`.
+    """
+    sig = inspect.signature(func)
+    db_param = None
+    params = []
+    for param in sig.parameters.values():
+        dependency = getattr(param.default, "dependency", None)
+        if dependency in _ASYNC_DEPENDENCIES:
+            if dependency is get_db:
+                db_param = param.name
+            param = param.replace(default=Depends(_ASYNC_DEPENDENCIES[dependency]), annotation=inspect.Parameter.empty)
+        params.append(param)
+    if db_param is None:
+        raise TypeError(f"{func.__name__} has no Depends(get_db) parameter")
+
+    @functools.wraps(func)
+    async def endpoint(**kwargs):
+        db = kwargs.pop(db_param)
+        return await db.run_sync(lambda session: func(**kwargs, **{db_param: session}))
+
+    endpoint.__signature__ = sig.replace(parameters=params)
+    return endpoint
+
+
+def async_db_route(route):
+    """Register a sync DB endpoint with `route` (e.g. router.get(...)); with
+    ASYNC_DB on it is served through to_async_endpoint instead of the
+    threadpool. The module keeps the plain sync function either way."""
+
+    def register(func):
+        route(to_async_endpoint(func) if settings.async_db else func)
+        return func
+
+    return register
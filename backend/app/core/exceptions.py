@@ -27,6 +27,11 @@ class VisionParseError(PikaException):
     msg = "vision parse failed"
 
 
+class ParseQueueFullError(PikaException):
+    code = 5031
+    msg = "parse queue full"
+
+
 class DuplicateReportError(PikaException):
     code = 4090
     msg = "report already exists"
@@ -0,0 +1,147 @@
+"""Short-lived, write-invalidated snapshots of identity/ACL rows.
+
+Every authenticated request resolves token -> User -> active membership, and
+the medical endpoints then resolve family visibility; on a read endpoint
+those lookups used to outnumber the queries for the data actually returned.
+
+Caches here hold plain column-value snapshots (never ORM instances, which
+belong to one session). Hits are re-attached to the caller's session with
+make_transient_to_detached + merge(load=False), so callers get ordinary
+persistent objects without a SELECT. Entries live settings.identity_cache_ttl
+seconds; any flush or bulk INSERT/UPDATE/DELETE touching a watched model
+clears all caches in this process, and the TTL bounds staleness across
+processes.
+Keys include the engine URL so different databases never share entries.
+"""
+import threading
+import time
+from typing import Any, Hashable
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session, make_transient_to_detached
+
+from app.settings import settings
+
+_MAX_ENTRIES = 4096
+
+_caches: list["TTLCache"] = []
+_watched: set[type] = set()
+
+
+class TTLCache:
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self._entries: dict[Hashable, tuple[float, Any]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Any | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                del self._entries[key]
+                return None
+            return entry[1]
+
+    def put(self, key: Hashable, value: Any) -> None:
+        ttl = settings.identity_cache_ttl
+        if ttl <= 0:
+            return
+        with self._lock:
+            if len(self._entries) >= _MAX_ENTRIES:
+                self._entries.clear()
+            self._entries[key] = (time.monotonic() + ttl, value)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+def register_cache(name: str) -> TTLCache:
+    cache = TTLCache(name)
+    _caches.append(cache)
+    return cache
+
+
+def watch(*models: type) -> None:
+    """Clear every cache whenever one of these models is written."""
+    _watched.update(models)
+
+
+def clear_all() -> None:
+    for cache in _caches:
+        cache.clear()
+
+
+def bind_key(db: Session) -> str:
+    return str(db.get_bind().url)
+
+
+def snapshot(obj: Any) -> dict:
+    return {attr.key: getattr(obj, attr.key) for attr in inspect(obj).mapper.column_attrs}
+
+
+def attach(db: Session, model: type, values: dict) -> Any:
+    """Turn a snapshot back into a persistent instance of `db` without a query."""
+    obj = model()
+    for key, value in values.items():
+        setattr(obj, key, value)
+    make_transient_to_detached(obj)
+    return db.merge(obj, load=False)
+
+
+def cached_lookup(cache: TTLCache, db: Session, key: Hashable, model: type, load) -> Any | None:
+    """Return `model` for key from the cache, else from load() (and remember it).
+
+    Misses (None) are not cached; neither is a row with unflushed changes in
+    this session, since those might never be committed.
+    """
+    full_key = (bind_key(db), key)
+    values = cache.get(full_key)
+    if values is not None:
+        return attach(db, model, values)
+    obj = load()
+    if obj is not None and not db.is_modified(obj):
+        cache.put(full_key, snapshot(obj))
+    return obj
+
+
+def _touches_watched(objects) -> bool:
+    return any(type(obj) in _watched for obj in objects)
+
+
+@event.listens_for(Session, "after_flush")
+def _invalidate_after_flush(session: Session, flush_context) -> None:
+    if _touches_watched(session.new) or _touches_watched(session.dirty) or _touches_watched(session.deleted):
+        clear_all()
+        # Clear again at commit: another request may have re-read the old
+        # rows between this flush and the commit.
+        session.info["identity_cache_dirty"] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_after_commit(session: Session) -> None:
+    if session.info.pop("identity_cache_dirty", False):
+        clear_all()
+
+
+@event.listens_for(Session, "after_rollback")
+def _invalidate_after_rollback(session: Session) -> None:
+    # Anything cached since the flush may hold rows that are now rolled back.
+    if session.info.pop("identity_cache_dirty", False):
+        clear_all()
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _invalidate_bulk_writes(orm_execute_state) -> None:
+    if not (orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    for mapper in orm_execute_state.all_mappers:
+        if mapper.class_ in _watched:
+            clear_all()
+            orm_execute_state.session.info["identity_cache_dirty"] = True
+            return
@@ -1,6 +1,8 @@
+import hashlib
 import os
 import uuid
 from datetime import datetime
+from typing import BinaryIO
 
 from app.settings import settings
 
@@ -21,11 +23,11 @@ def _ext_from(filename: str | None, content_type: str | None) -> str:
     return ".jpg"
 
 
-def save_image(content: bytes, filename: str | None, content_type: str | None) -> str:
-    """Save raw image under uploads/medical/{YYYY}/{MM}/ and return a RELATIVE path.
+_CHUNK_SIZE = 1024 * 1024
 
-    Relative to UPLOAD_DIR. Absolute path is rejoined at read time via abs_path().
-    """
+
+def _new_image_location(filename: str | None, content_type: str | None) -> tuple[str, str]:
+    """(absolute dir, relative path) for a new image under uploads/medical/{YYYY}/{MM}/."""
     now = datetime.now()
     sub = os.path.join(now.strftime("%Y"), now.strftime("%m"))
     abs_dir = os.path.join(settings.upload_dir, sub)
@@ -33,12 +35,51 @@ def save_image(content: bytes, filename: str | None, content_type: str | None) -
 
     ext = _ext_from(filename, content_type)
     name = f"{now.strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}{ext}"
+    return abs_dir, os.path.join(sub, name).replace("\\", "/")
 
-    abs_path = os.path.join(abs_dir, name)
-    with open(abs_path, "wb") as f:
-        f.write(content)
 
-    return os.path.join(sub, name).replace("\\", "/")
+def save_image(content: bytes, filename: str | None, content_type: str | None) -> str:
+    """Save raw image under uploads/medical/{YYYY}/{MM}/ and return a RELATIVE path.
+
+    Relative to UPLOAD_DIR. Absolute path is rejoined at read time via abs_path().
+    """
+    _, rel_path = _new_image_location(filename, content_type)
+    with open(abs_path(rel_path), "wb") as f:
+        f.write(content)
+    return rel_path
+
+
+def save_image_stream(
+    fileobj: BinaryIO,
+    filename: str | None,
+    content_type: str | None,
+    *,
+    chunk_size: int = _CHUNK_SIZE,
+) -> tuple[str, str, int]:
+    """Like save_image, but copy from a file object chunk by chunk.
+
+    The image is hashed while it is spooled to a dot-prefixed temp file next
+    to its final name, then renamed into place, so at most one chunk is held
+    in memory and a half-written file is never visible under its real name.
+    Returns (relative path, sha256 hex, size in bytes).
+    """
+    abs_dir, rel_path = _new_image_location(filename, content_type)
+    final_path = abs_path(rel_path)
+    tmp_path = os.path.join(abs_dir, f".{os.path.basename(rel_path)}.part")
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with open(tmp_path, "wb") as out:
+            while chunk := fileobj.read(chunk_size):
+                digest.update(chunk)
+                out.write(chunk)
+                size += len(chunk)
+        os.replace(tmp_path, final_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return rel_path, digest.hexdigest(), size
 
 
 def abs_path(relative_path: str) -> str:
@@ -3,10 +3,14 @@ import string
 
 from sqlalchemy.orm import Session
 
-from app.core import storage
+from app.core import identity_cache, storage
 from app.core.exceptions import PikaException
 from app.core.user.models import FamilyGroup, FamilyInvite, FamilyMembership, User, UserFavorite
 
+_users_by_openid = identity_cache.register_cache("users_by_openid")
+_active_memberships = identity_cache.register_cache("active_memberships")
+identity_cache.watch(User, FamilyGroup, FamilyMembership)
+
 
 def list_favorites(db: Session, *, user_id: int) -> list[str]:
     rows = db.query(UserFavorite.service_key).filter_by(user_id=user_id).all()
@@ -47,12 +51,18 @@ def update_profile(
     return user
 
 
-def ensure_user_family(db: Session, *, user: User, family_name: str | None = None) -> FamilyMembership:
-    membership = (
-        db.query(FamilyMembership)
-        .filter(FamilyMembership.user_id == user.id, FamilyMembership.is_active.is_(True))
-        .first()
+def get_user_by_openid(db: Session, *, openid: str) -> User | None:
+    return identity_cache.cached_lookup(
+        _users_by_openid,
+        db,
+        openid,
+        User,
+        lambda: db.query(User).filter(User.openid == openid).first(),
     )
+
+
+def ensure_user_family(db: Session, *, user: User, family_name: str | None = None) -> FamilyMembership:
+    membership = get_active_membership(db, user_id=user.id)
     if membership:
         if (user.role or "").lower() == "admin" and membership.family_role != "admin":
             membership.family_role = "admin"
@@ -73,10 +83,16 @@ def ensure_user_family(db: Session, *, user: User, family_name: str | None = Non
 
 
 def get_active_membership(db: Session, *, user_id: int) -> FamilyMembership | None:
-    return (
-        db.query(FamilyMembership)
-        .filter(FamilyMembership.user_id == user_id, FamilyMembership.is_active.is_(True))
-        .first()
+    return identity_cache.cached_lookup(
+        _active_memberships,
+        db,
+        user_id,
+        FamilyMembership,
+        lambda: (
+            db.query(FamilyMembership)
+            .filter(FamilyMembership.user_id == user_id, FamilyMembership.is_active.is_(True))
+            .first()
+        ),
     )
 
 
@@ -0,0 +1,39 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from app.settings import settings
+
+_executor: ThreadPoolExecutor | None = None
+_lock = threading.Lock()
+
+
+def get_executor() -> ThreadPoolExecutor:
+    """Process-wide bounded pool for blocking calls made from async endpoints.
+
+    Created lazily so importing the app (tests, alembic) never spawns threads.
+    """
+    global _executor
+    if _executor is None:
+        with _lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=max(1, settings.blocking_workers),
+                    thread_name_prefix="pika-blocking",
+                )
+    return _executor
+
+
+async def run_blocking(func, /, *args, **kwargs):
+    """Run a sync callable on the bounded pool without blocking the event loop."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_executor(), partial(func, *args, **kwargs))
+
+
+def shutdown() -> None:
+    global _executor
+    with _lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
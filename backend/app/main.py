@@ -1,14 +1,19 @@
+import asyncio
 import logging
+from contextlib import asynccontextmanager
 
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 from sqlalchemy import text
 
+from app.core import workers
 from app.core.auth_router import router as auth_router
-from app.core.db import engine
+from app.core.db import async_engine, engine
 from app.core.exceptions import PikaException
 from app.core.user.router import router as user_router
+from app.modules.medical import jobs as medical_jobs
+from app.modules.medical import vision
 from app.modules.medical.router import router as medical_router
 from app.settings import settings
 
@@ -25,7 +30,20 @@ logging.getLogger("httpcore").setLevel(logging.WARNING)
 # Bump on each deploy so /health proves which build is actually running.
 APP_VERSION = "0.2.0"
 
-app = FastAPI(title="Pika Family Service Platform")
+
+@asynccontextmanager
+async def lifespan(_app: FastAPI):
+    sweeper = asyncio.create_task(medical_jobs.run_draft_sweeper())
+    yield
+    sweeper.cancel()
+    medical_jobs.shutdown()
+    workers.shutdown()
+    vision.shutdown()
+    if async_engine is not None:
+        await async_engine.dispose()
+
+
+app = FastAPI(title="Pika Family Service Platform", lifespan=lifespan)
 
 # WeChat Mini Program 请求不走浏览器 CORS（无 Origin 强制），CORS 主要影响浏览器/开发者工具调试。
 # 生产域名从 settings.public_domain（.env 注入）来，不硬编码；本地调试地址保留。
@@ -66,6 +84,8 @@ def health():
             "service": "pika-backend",
             "version": APP_VERSION,
             "db_revision": _db_revision(),
+            # Per process: each uvicorn worker has its own parse pool.
+            "parse_queue": {"pending": medical_jobs.queue_depth(), "limit": settings.parse_queue_limit},
         },
     }
 
@@ -0,0 +1,249 @@
+"""Draft store backends behind service.stage_draft / get_draft / commit_draft.
+
+`db` (default) keeps drafts in the medical_report_drafts table so they survive
+restarts and any uvicorn worker can serve the poll/commit for an upload that
+landed on another worker. `memory` is a process-local store for
+single-process dev runs.
+
+Expiry never scans every draft: the memory store keeps a min-heap on
+expires_at, the db store deletes through the expires_at index. Both are
+capped (settings.draft_max_count, plus draft_max_bytes for memory) with
+least-recently-used eviction, so a runaway client can't grow them unbounded.
+The periodic sweep lives in jobs.run_draft_sweeper.
+
+A parse result is written with update_if_parsing, never put: the sweep may
+expire or evict a draft (and delete its images) while vision runs, and an
+upsert would bring it back pointing at files that are gone.
+"""
+import heapq
+import json
+import threading
+from collections import OrderedDict
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+
+from app.modules.medical.models import MedicalReportDraft
+from app.settings import settings
+
+# Draft keys that live in their own columns rather than in payload_json.
+_COLUMN_KEYS = {"draft_id", "uploader_id", "subject_id", "status", "expires_at"}
+
+# Reads refresh the db row's accessed_at at most this often, so polling a
+# draft doesn't turn into a write per request.
+_TOUCH_INTERVAL = timedelta(minutes=1)
+
+
+class MemoryDraftStore:
+    def __init__(self, *, max_count: int | None = None, max_bytes: int | None = None) -> None:
+        self.max_count = max_count if max_count is not None else settings.draft_max_count
+        self.max_bytes = max_bytes if max_bytes is not None else settings.draft_max_bytes
+        # draft_id -> (draft, approx bytes), ordered least -> most recently used.
+        self._drafts: OrderedDict[str, tuple[dict, int]] = OrderedDict()
+        # (expires_at, draft_id); stale entries are skipped when popped.
+        self._expiry: list[tuple[datetime, str]] = []
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def put(self, db: Session, draft: dict) -> None:
+        with self._lock:
+            self._put(draft)
+
+    def update_if_parsing(self, db: Session, draft: dict) -> bool:
+        """Replace a draft only if it is still stored and still parsing."""
+        with self._lock:
+            entry = self._drafts.get(draft["draft_id"])
+            if entry is None or entry[0]["status"] != "parsing":
+                return False
+            self._put(draft)
+            return True
+
+    def get(self, db: Session, draft_id: str) -> dict | None:
+        with self._lock:
+            entry = self._drafts.get(draft_id)
+            if entry is None:
+                return None
+            self._drafts.move_to_end(draft_id)
+            return dict(entry[0])
+
+    def delete(self, db: Session, draft_id: str) -> None:
+        with self._lock:
+            self._drop(draft_id)
+
+    def purge_expired(self, db: Session, now: datetime) -> list[dict]:
+        purged = []
+        with self._lock:
+            while self._expiry and self._expiry[0][0] < now:
+                expires_at, draft_id = heapq.heappop(self._expiry)
+                entry = self._drafts.get(draft_id)
+                # Skip heap entries left behind by a re-put or delete.
+                if entry is not None and entry[0]["expires_at"] == expires_at:
+                    self._drop(draft_id)
+                    purged.append(entry[0])
+        return purged
+
+    def trim(self, db: Session) -> list[dict]:
+        with self._lock:
+            return self._evict_lru()
+
+    def image_paths(self, db: Session) -> set[str]:
+        with self._lock:
+            return {p for entry in self._drafts.values() for p in entry[0].get("image_paths") or []}
+
+    def __len__(self) -> int:
+        return len(self._drafts)
+
+    def _put(self, draft: dict) -> None:
+        draft_id = draft["draft_id"]
+        size = len(json.dumps(_dump_payload(draft), ensure_ascii=False))
+        self._drop(draft_id)
+        self._drafts[draft_id] = (dict(draft), size)
+        self._bytes += size
+        heapq.heappush(self._expiry, (draft["expires_at"], draft_id))
+        self._evict_lru()
+
+    def _drop(self, draft_id: str) -> None:
+        entry = self._drafts.pop(draft_id, None)
+        if entry is not None:
+            self._bytes -= entry[1]
+
+    def _evict_lru(self) -> list[dict]:
+        evicted = []
+        while self._drafts and (len(self._drafts) > self.max_count or self._bytes > self.max_bytes):
+            draft_id, (draft, _) = next(iter(self._drafts.items()))
+            self._drop(draft_id)
+            evicted.append(draft)
+        # Rebuild once the heap is mostly stale entries so it can't outgrow the store.
+        if len(self._expiry) > 2 * len(self._drafts) + 64:
+            self._expiry = [
+                (entry[0]["expires_at"], draft_id) for draft_id, entry in self._drafts.items()
+            ]
+            heapq.heapify(self._expiry)
+        return evicted
+
+
+class DbDraftStore:
+    def __init__(self, *, max_count: int | None = None) -> None:
+        self.max_count = max_count if max_count is not None else settings.draft_max_count
+
+    def put(self, db: Session, draft: dict) -> None:
+        row = db.get(MedicalReportDraft, draft["draft_id"])
+        if row is None:
+            row = MedicalReportDraft(id=draft["draft_id"])
+            db.add(row)
+        row.uploader_id = draft["uploader_id"]
+        row.subject_id = draft["subject_id"]
+        row.status = draft["status"]
+        row.expires_at = draft["expires_at"]
+        row.accessed_at = datetime.now()
+        row.payload_json = _dump_payload(draft)
+        db.commit()
+
+    def update_if_parsing(self, db: Session, draft: dict) -> bool:
+        """Conditional UPDATE: only a row that still exists and is still
+        parsing takes the result."""
+        result = db.execute(
+            update(MedicalReportDraft)
+            .where(MedicalReportDraft.id == draft["draft_id"], MedicalReportDraft.status == "parsing")
+            .values(
+                status=draft["status"],
+                expires_at=draft["expires_at"],
+                accessed_at=datetime.now(),
+                payload_json=_dump_payload(draft),
+            )
+            .execution_options(synchronize_session=False)
+        )
+        db.commit()
+        return result.rowcount == 1
+
+    def get(self, db: Session, draft_id: str) -> dict | None:
+        # populate_existing: a long-poll re-reads the row the parse job updated
+        # from another session, so never trust this session's identity map.
+        row = db.get(MedicalReportDraft, draft_id, populate_existing=True)
+        if row is None:
+            return None
+        now = datetime.now()
+        if row.accessed_at is None or now - row.accessed_at > _TOUCH_INTERVAL:
+            row.accessed_at = now
+            db.commit()
+        draft = _load_payload(row.payload_json)
+        draft.update(
+            draft_id=row.id,
+            uploader_id=row.uploader_id,
+            subject_id=row.subject_id,
+            status=row.status,
+            expires_at=row.expires_at,
+        )
+        return draft
+
+    def delete(self, db: Session, draft_id: str) -> None:
+        db.query(MedicalReportDraft).filter(MedicalReportDraft.id == draft_id).delete()
+        db.commit()
+
+    def purge_expired(self, db: Session, now: datetime) -> list[dict]:
+        rows = (
+            db.query(MedicalReportDraft.id, MedicalReportDraft.payload_json)
+            .filter(MedicalReportDraft.expires_at < now)
+            .all()
+        )
+        return self._delete_rows(db, rows)
+
+    def trim(self, db: Session) -> list[dict]:
+        """Evict least-recently-used drafts beyond max_count (via the accessed_at index)."""
+        rows = (
+            db.query(MedicalReportDraft.id, MedicalReportDraft.payload_json)
+            .order_by(MedicalReportDraft.accessed_at.desc())
+            .offset(self.max_count)
+            .all()
+        )
+        return self._delete_rows(db, rows)
+
+    def image_paths(self, db: Session) -> set[str]:
+        return {
+            p
+            for (payload,) in db.query(MedicalReportDraft.payload_json).yield_per(500)
+            for p in (payload or {}).get("image_paths") or []
+        }
+
+    def _delete_rows(self, db: Session, rows) -> list[dict]:
+        if not rows:
+            return []
+        (
+            db.query(MedicalReportDraft)
+            .filter(MedicalReportDraft.id.in_([draft_id for draft_id, _ in rows]))
+            .delete(synchronize_session=False)
+        )
+        db.commit()
+        return [{"draft_id": draft_id, **_load_payload(payload)} for draft_id, payload in rows]
+
+
+def _dump_payload(draft: dict) -> dict:
+    payload = {k: v for k, v in draft.items() if k not in _COLUMN_KEYS}
+    if isinstance(payload.get("report_date"), date):
+        payload["report_date"] = payload["report_date"].isoformat()
+    return payload
+
+
+def _load_payload(payload: dict) -> dict:
+    draft = dict(payload)
+    if draft.get("report_date"):
+        draft["report_date"] = date.fromisoformat(draft["report_date"])
+    return draft
+
+
+_STORES = {
+    "db": DbDraftStore,
+    "memory": MemoryDraftStore,
+}
+_store = None
+
+
+def get_store():
+    global _store
+    if _store is None:
+        backend = (settings.draft_store or "db").lower()
+        if backend not in _STORES:
+            raise ValueError(f"unknown draft_store: {settings.draft_store}")
+        _store = _STORES[backend]()
+    return _store
@@ -0,0 +1,143 @@
+"""Reconcile the medical upload tree with the images the database still references.
+
+Images are written before parsing, so a draft that expires or is abandoned
+(or a crash between save and commit) leaves files nobody points at. The GC
+loads every referenced relative path (committed reports plus live drafts)
+into a set, walks upload_dir once, and removes or quarantines the files not in
+it, a batch at a time. Files younger than the grace period are left alone so
+an upload that is still being staged/parsed is never touched.
+
+Quarantined files move to upload_dir/.quarantine/<same relative path>; the
+walk skips dot-entries, so quarantine and in-flight temp files are ignored.
+"""
+import logging
+import os
+import shutil
+import time
+from dataclasses import dataclass, field
+from datetime import timedelta
+from typing import Iterator
+
+from sqlalchemy.orm import Session
+
+from app.modules.medical import drafts
+from app.modules.medical.models import MedicalReport
+from app.settings import settings
+
+logger = logging.getLogger(__name__)
+
+ACTIONS = ("quarantine", "delete")
+QUARANTINE_DIR = ".quarantine"
+
+# Comfortably longer than service._DRAFT_TTL, so even drafts held by another
+# process's memory store are expired before their images count as orphans.
+DEFAULT_GRACE = timedelta(hours=6)
+
+
+@dataclass
+class GcReport:
+    scanned: int = 0
+    referenced: int = 0
+    too_recent: int = 0
+    orphans: int = 0
+    orphan_bytes: int = 0
+    removed: int = 0
+    removed_bytes: int = 0
+    dry_run: bool = True
+    action: str = "quarantine"
+    orphan_paths: list[str] = field(default_factory=list)
+
+
+def referenced_image_paths(db: Session) -> set[str]:
+    """Every upload-relative path a committed report or a live draft points at."""
+    paths: set[str] = set()
+    rows = db.query(MedicalReport.image_path, MedicalReport.image_paths).yield_per(1000)
+    for image_path, image_paths in rows:
+        if image_path:
+            paths.add(image_path)
+        paths.update(image_paths or [])
+    paths.update(drafts.get_store().image_paths(db))
+    return paths
+
+
+def iter_upload_files(root: str) -> Iterator[tuple[str, os.stat_result]]:
+    """Yield (relative path with '/' separators, stat) for regular files under root."""
+    stack = [""]
+    while stack:
+        rel_dir = stack.pop()
+        try:
+            entries = sorted(os.scandir(os.path.join(root, rel_dir)), key=lambda e: e.name)
+        except FileNotFoundError:
+            continue
+        for entry in entries:
+            if entry.name.startswith("."):
+                continue
+            rel = f"{rel_dir}/{entry.name}" if rel_dir else entry.name
+            if entry.is_dir(follow_symlinks=False):
+                stack.append(rel)
+            elif entry.is_file(follow_symlinks=False):
+                yield rel, entry.stat(follow_symlinks=False)
+
+
+def collect_orphan_images(
+    db: Session,
+    *,
+    dry_run: bool = True,
+    action: str = "quarantine",
+    grace: timedelta = DEFAULT_GRACE,
+    batch_size: int = 200,
+    limit: int | None = None,
+) -> GcReport:
+    """Find (and unless dry_run, remove) upload files no report or draft references.
+
+    At most `limit` orphans are handled per run, flushed every `batch_size`
+    files, so a large backlog can be worked off over several runs.
+    """
+    if action not in ACTIONS:
+        raise ValueError(f"unknown action: {action}")
+    root = settings.upload_dir
+    report = GcReport(dry_run=dry_run, action=action)
+    referenced = referenced_image_paths(db)
+    cutoff = time.time() - grace.total_seconds()
+
+    batch: list[tuple[str, int]] = []
+    for rel, st in iter_upload_files(root):
+        report.scanned += 1
+        if rel in referenced:
+            report.referenced += 1
+            continue
+        if st.st_mtime > cutoff:
+            report.too_recent += 1
+            continue
+        report.orphans += 1
+        report.orphan_bytes += st.st_size
+        report.orphan_paths.append(rel)
+        batch.append((rel, st.st_size))
+        if len(batch) >= batch_size:
+            _flush(root, batch, report)
+            batch = []
+        if limit is not None and report.orphans >= limit:
+            break
+    _flush(root, batch, report)
+    return report
+
+
+def _flush(root: str, batch: list[tuple[str, int]], report: GcReport) -> None:
+    if report.dry_run:
+        return
+    for rel, size in batch:
+        src = os.path.join(root, rel)
+        try:
+            if report.action == "delete":
+                os.remove(src)
+            else:
+                dst = os.path.join(root, QUARANTINE_DIR, rel)
+                os.makedirs(os.path.dirname(dst), exist_ok=True)
+                shutil.move(src, dst)
+        except FileNotFoundError:
+            continue
+        except OSError:
+            logger.exception("image gc: failed to %s %s", report.action, rel)
+            continue
+        report.removed += 1
+        report.removed_bytes += size
@@ -0,0 +1,80 @@
+"""Shrink report photos before they go to the vision model.
+
+A 12 MP phone shot is several MB of base64 in the request and far more
+pixels than the model reads text at. preprocess_for_vision fixes EXIF
+orientation, caps the long edge, optionally converts to grayscale /
+stretches contrast, and re-encodes at a target quality. Anything Pillow
+can't decode (e.g. HEIC without a plugin) is passed through untouched.
+"""
+import io
+import logging
+
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from app.settings import settings
+
+logger = logging.getLogger(__name__)
+
+_FORMATS = {"jpeg": "JPEG", "webp": "WEBP"}
+_EXIF_ORIENTATION = 0x0112
+
+
+def preprocess_for_vision(
+    image_bytes: bytes,
+    *,
+    max_edge: int | None = None,
+    image_format: str | None = None,
+    quality: int | None = None,
+    grayscale: bool | None = None,
+    autocontrast: bool | None = None,
+) -> bytes:
+    """Return bytes to send to the vision model; defaults come from settings.
+
+    Falls back to the original bytes when the image can't be decoded, or when
+    re-encoding an already small, upright image would only make it bigger.
+    """
+    max_edge = max_edge if max_edge is not None else settings.vision_max_edge
+    image_format = (image_format or settings.vision_image_format).lower()
+    quality = quality if quality is not None else settings.vision_image_quality
+    grayscale = grayscale if grayscale is not None else settings.vision_grayscale
+    autocontrast = autocontrast if autocontrast is not None else settings.vision_autocontrast
+    if image_format not in _FORMATS:
+        raise ValueError(f"unknown vision_image_format: {image_format}")
+
+    try:
+        img = Image.open(io.BytesIO(image_bytes))
+        img.load()
+    except (UnidentifiedImageError, OSError, Image.DecompressionBombError):
+        logger.warning("vision preprocess: cannot decode image, sending original")
+        return image_bytes
+
+    changed = False
+    if img.getexif().get(_EXIF_ORIENTATION, 1) != 1:
+        img, changed = ImageOps.exif_transpose(img), True
+
+    if max_edge and max(img.size) > max_edge:
+        img.thumbnail((max_edge, max_edge), Image.Resampling.LANCZOS)
+        changed = True
+
+    if img.mode not in ("RGB", "L"):
+        img = _flatten(img)
+    if grayscale:
+        img = img.convert("L")
+    if autocontrast:
+        img = ImageOps.autocontrast(img, cutoff=1)
+
+    out = io.BytesIO()
+    pil_format = _FORMATS[image_format]
+    img.save(out, format=pil_format, quality=quality, optimize=pil_format == "JPEG")
+    encoded = out.getvalue()
+    if not changed and not grayscale and not autocontrast and len(encoded) >= len(image_bytes):
+        return image_bytes
+    return encoded
+
+
+def _flatten(img: Image.Image) -> Image.Image:
+    """Drop alpha/palette onto a white background (scans are black on white)."""
+    rgba = img.convert("RGBA")
+    background = Image.new("RGB", rgba.size, (255, 255, 255))
+    background.paste(rgba, mask=rgba.getchannel("A"))
+    return background
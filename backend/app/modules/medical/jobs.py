@@ -0,0 +1,125 @@
+"""Background parse jobs for report drafts.
+
+Uploads only stage images; the vision call runs here on a bounded pool of
+settings.parse_workers, so HTTP requests don't have to hold the connection
+for the whole parse. Azure concurrency stays at settings.vision_concurrency
+(enforced in vision) no matter how many family members upload at once or
+how many pages their reports have.
+"""
+import asyncio
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from app.core.db import SessionLocal
+from app.core.exceptions import ParseQueueFullError
+from app.core.workers import run_blocking
+from app.modules.medical import service
+from app.settings import settings
+
+logger = logging.getLogger(__name__)
+
+_executor: ThreadPoolExecutor | None = None
+_lock = threading.Lock()
+_pending: dict[str, Future] = {}
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=max(1, settings.parse_workers),
+            thread_name_prefix="pika-parse",
+        )
+    return _executor
+
+
+def _run(draft_id: str) -> dict | None:
+    db = SessionLocal()
+    try:
+        return service.parse_draft(db, draft_id)
+    finally:
+        db.close()
+
+
+def ensure_capacity() -> None:
+    """Reject new uploads up front when the parse backlog is already full."""
+    depth = queue_depth()
+    if depth >= settings.parse_queue_limit:
+        logger.warning("parse queue full (%d/%d), upload rejected", depth, settings.parse_queue_limit)
+        raise ParseQueueFullError("识别任务排队中，请稍后再试")
+
+
+def submit_parse(draft_id: str) -> Future:
+    """Enqueue a parse for a staged draft. Idempotent while a job is pending."""
+    with _lock:
+        job = _pending.get(draft_id)
+        if job is not None:
+            return job
+        job = _get_executor().submit(_run, draft_id)
+        _pending[draft_id] = job
+    job.add_done_callback(lambda _job: _forget(draft_id))
+    return job
+
+
+def _forget(draft_id: str) -> None:
+    with _lock:
+        _pending.pop(draft_id, None)
+
+
+def pending_job(draft_id: str) -> Future | None:
+    return _pending.get(draft_id)
+
+
+def resume_orphaned(draft: dict) -> Future | None:
+    """Re-queue a draft left in parsing without a job, e.g. staged before a
+    restart. Drafts keep parsing for a while on whichever worker staged
+    them, so only ones older than settings.parse_orphan_after (or staged
+    before staged_at was recorded) count as orphaned. If the original job
+    was only slow, not lost, both finish but only the first result is
+    written (update_if_parsing)."""
+    if draft["status"] != "parsing" or draft["draft_id"] in _pending:
+        return None
+    staged_at = draft.get("staged_at")
+    if staged_at and datetime.now() - datetime.fromisoformat(staged_at) < timedelta(
+        seconds=settings.parse_orphan_after
+    ):
+        return None
+    logger.warning("re-queueing orphaned parse for draft %s", draft["draft_id"])
+    return submit_parse(draft["draft_id"])
+
+
+def queue_depth() -> int:
+    """Parse jobs queued or running in this process (reported by /health)."""
+    return len(_pending)
+
+
+def sweep_drafts() -> dict:
+    db = SessionLocal()
+    try:
+        return service.sweep_drafts(db)
+    finally:
+        db.close()
+
+
+async def run_draft_sweeper(interval: float | None = None) -> None:
+    """Expire/evict drafts periodically; started from the app lifespan."""
+    interval = interval or settings.draft_sweep_interval
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            out = await run_blocking(sweep_drafts)
+            if any(out.values()):
+                logger.info("draft sweep: %s", out)
+        except Exception:
+            logger.exception("draft sweep failed")
+
+
+def shutdown() -> None:
+    global _executor
+    with _lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
+        _pending.clear()
@@ -0,0 +1,419 @@
+"""Report metric -> dictionary mapping through the owner's aliases.
+
+Metrics are mapped as they are written (commit, edit, reparse) instead of
+waiting for a full rebuild, and rebuilds stream the owner's metrics in
+chunks with executemany writes, so memory stays flat on long histories.
+Every pass writes only the mappings whose outcome actually changed.
+
+Matching goes through a per-owner AliasIndex, cached with the identity
+caches and cleared by any alias write. A metric name is tried, in order:
+
+  exact      alias name after strip/lower             auto   1.0
+  normalized NFKC width folding, case folding,        fuzzy  0.95
+             bracketed text and punctuation dropped
+  code       item_code, or a code in brackets, equal  fuzzy  0.9
+             to the canonical key of a dictionary
+             entry the owner has aliases for
+  n-gram     character-bigram Dice similarity to an   fuzzy  score
+             alias name, at least
+             settings.mapping_fuzzy_min_score
+
+so OCR variants like "谷丙转氨酶（ALT）" land on the "谷丙转氨酶" alias.
+"%" and "#" survive normalization: "NEUT%" and "NEUT#" are different tests.
+
+Each map also carries the metric's value and reference range converted to
+the dictionary entry's canonical_unit (see units), so trends read a
+ready-made canonical series.
+
+The owner of a report's metrics is its subject, or its uploader when the
+report has no subject.
+"""
+import re
+import unicodedata
+from collections import Counter
+from itertools import islice
+from typing import Iterable, Iterator
+
+from sqlalchemy import and_, bindparam, func, or_, select, update
+from sqlalchemy.orm import Session
+
+from app.core import identity_cache
+from app.modules.medical import units
+from app.modules.medical.models import (
+    MedicalMetricAlias,
+    MedicalMetricDictionary,
+    MedicalReport,
+    MedicalReportMetric,
+    MedicalReportMetricMap,
+)
+from app.settings import settings
+
+# SQLite caps bound parameters per statement; stay well below it.
+IN_CHUNK = 500
+# Rows fetched per round trip when streaming an owner's metrics.
+STREAM_BATCH = 2000
+
+NORMALIZED_CONFIDENCE = 0.95
+CODE_CONFIDENCE = 0.9
+
+# (bind url, owner_user_id) -> AliasIndex
+_alias_indexes = identity_cache.register_cache("medical_alias_index")
+identity_cache.watch(MedicalMetricAlias)
+
+AliasEntry = tuple[int, int, str | None, str | None, int]
+
+_MAPS = MedicalReportMetricMap.__table__
+_UPDATE_MAP = (
+    update(_MAPS)
+    .where(_MAPS.c.id == bindparam("map_id"))
+    .values(
+        dictionary_id=bindparam("dictionary_id"),
+        alias_id=bindparam("alias_id"),
+        match_status=bindparam("match_status"),
+        confidence=bindparam("confidence"),
+        canonical_value=bindparam("canonical_value"),
+        canonical_ref_low=bindparam("canonical_ref_low"),
+        canonical_ref_high=bindparam("canonical_ref_high"),
+    )
+)
+_MAP_FIELDS = (
+    "dictionary_id", "alias_id", "match_status", "confidence",
+    "canonical_value", "canonical_ref_low", "canonical_ref_high",
+)
+_UNMAPPED = (None, None, "unmapped", None, None, None, None)
+
+# Applied after NFKC, which already turns （）［］ into ()[].
+_BRACKETED = re.compile(r"[(\[【〔]([^()\[\]【】〔〕]*)[)\]】〕]")
+_KEPT_SYMBOLS = frozenset("%#")
+# Distinct (item_name, item_code) lookups remembered per index.
+_MEMO_LIMIT = 20_000
+
+
+def alias_key(name: str | None) -> str:
+    return (name or "").strip().lower()
+
+
+def _fold(text: str | None) -> str:
+    return unicodedata.normalize("NFKC", text or "").casefold()
+
+
+def _squash(text: str) -> str:
+    return "".join(ch for ch in text if ch.isalnum() or ch in _KEPT_SYMBOLS)
+
+
+def normalize_name(name: str | None) -> str:
+    """Width/case folded, bracketed text dropped (unless that is all there
+    is), whitespace and punctuation removed."""
+    folded = _fold(name)
+    outside = _squash(_BRACKETED.sub("", folded))
+    return outside or _squash(folded)
+
+
+def bracket_codes(name: str | None) -> list[str]:
+    """Text inside brackets, e.g. "alt" from "谷丙转氨酶(ALT)"."""
+    return [_squash(part) for part in _BRACKETED.findall(_fold(name)) if _squash(part)]
+
+
+def _symbols(text: str) -> frozenset[str]:
+    return frozenset(ch for ch in text if ch in _KEPT_SYMBOLS)
+
+
+def _grams(text: str) -> frozenset[str]:
+    if len(text) < 2:
+        return frozenset([text]) if text else frozenset()
+    return frozenset(text[i:i + 2] for i in range(len(text) - 1))
+
+
+class AliasIndex:
+    """One owner's aliases, looked up by exact key, normalized name,
+    dictionary code and a character-bigram inverted index. Built once per
+    cache entry and read-only afterwards, apart from the lookup memo."""
+
+    def __init__(self, rows: Iterable[tuple]) -> None:
+        """rows: (alias id, dictionary id, canonical key, canonical name,
+        canonical unit, alias name, unit, hospital hint, priority), oldest
+        alias first."""
+        self.exact: dict[str, list[AliasEntry]] = {}
+        self.normalized: dict[str, list[AliasEntry]] = {}
+        self.by_code: dict[str, list[AliasEntry]] = {}
+        # dictionary id -> (canonical unit, (canonical key, canonical name))
+        self.dictionaries: dict[int, tuple[str | None, tuple[str, str]]] = {}
+        for (
+            alias_id, dictionary_id, canonical_key, canonical_name, canonical_unit,
+            name, unit, hospital, priority,
+        ) in rows:
+            self.dictionaries[dictionary_id] = (canonical_unit, (canonical_key, canonical_name))
+            entry = (alias_id, dictionary_id, unit, hospital, priority or 0)
+            self.exact.setdefault(alias_key(name), []).append(entry)
+            norm = normalize_name(name)
+            if norm:
+                self.normalized.setdefault(norm, []).append(entry)
+            code = normalize_name(canonical_key)
+            if code:
+                self.by_code.setdefault(code, []).append(entry)
+
+        self._grams: dict[str, list[str]] = {}
+        self._gram_counts: dict[str, int] = {}
+        for norm in self.normalized:
+            grams = _grams(norm)
+            self._gram_counts[norm] = len(grams)
+            for gram in grams:
+                self._grams.setdefault(gram, []).append(norm)
+        self._memo: dict[tuple, tuple | None] = {}
+
+    def __len__(self) -> int:
+        return sum(len(entries) for entries in self.exact.values())
+
+    def nearest(self, norm: str) -> tuple[float, str | None]:
+        """Best Dice similarity of norm's bigrams against an alias name that
+        carries the same %/# marks. Returns (score, name); name is None when
+        two dictionaries tie."""
+        grams = _grams(norm)
+        shared = Counter(name for gram in grams for name in self._grams.get(gram, ()))
+        best_score = 0.0
+        best: str | None = None
+        symbols = _symbols(norm)
+        for name, overlap in shared.items():
+            if _symbols(name) != symbols:
+                continue
+            score = 2 * overlap / (len(grams) + self._gram_counts[name])
+            if score > best_score:
+                best_score, best = score, name
+            elif score == best_score and best is not None and self._dictionaries(name) != self._dictionaries(best):
+                best = None
+        return best_score, best
+
+    def _dictionaries(self, norm: str) -> set[int]:
+        return {entry[1] for entry in self.normalized[norm]}
+
+    def candidates(self, item_name: str | None, item_code: str | None = None) -> tuple | None:
+        """(alias entries, match_status, confidence) for a metric, or None."""
+        key = (item_name, item_code)
+        if key in self._memo:
+            return self._memo[key]
+        found = self._lookup(item_name, item_code)
+        if len(self._memo) >= _MEMO_LIMIT:
+            self._memo.clear()
+        self._memo[key] = found
+        return found
+
+    def _lookup(self, item_name: str | None, item_code: str | None) -> tuple | None:
+        entries = self.exact.get(alias_key(item_name))
+        if entries:
+            return entries, "auto", 1.0
+
+        norm = normalize_name(item_name)
+        if norm in self.normalized:
+            return self.normalized[norm], "fuzzy", NORMALIZED_CONFIDENCE
+
+        for code in (normalize_name(item_code), *bracket_codes(item_name)):
+            if code in self.by_code:
+                return self.by_code[code], "fuzzy", CODE_CONFIDENCE
+
+        if norm:
+            score, name = self.nearest(norm)
+            if name is not None and score >= settings.mapping_fuzzy_min_score:
+                return self.normalized[name], "fuzzy", round(score, 3)
+        return None
+
+    def match(
+        self, *, item_name: str | None, item_code: str | None, unit: str | None, hospital: str | None
+    ) -> tuple[AliasEntry, str, float] | None:
+        found = self.candidates(item_name, item_code)
+        if found is None:
+            return None
+        entries, status, confidence = found
+        return best_alias(entries, unit=unit, hospital=hospital), status, confidence
+
+    def canonical_ratio(self, dictionary_id: int, unit: str | None) -> float | None:
+        """Factor from unit to the dictionary entry's canonical_unit."""
+        canonical_unit, analyte = self.dictionaries[dictionary_id]
+        return units.factor(unit, canonical_unit, analyte)
+
+
+def report_owner_id(report: MedicalReport) -> int:
+    return report.subject_id if report.subject_id is not None else report.uploader_id
+
+
+def owned_by(owner_user_id: int):
+    """Filter on MedicalReport for the reports whose metrics belong to owner."""
+    return or_(
+        MedicalReport.subject_id == owner_user_id,
+        and_(MedicalReport.subject_id.is_(None), MedicalReport.uploader_id == owner_user_id),
+    )
+
+
+def alias_index(db: Session, *, owner_user_id: int) -> AliasIndex:
+    """The owner's AliasIndex. Unflushed aliases are not seen (the session
+    doesn't autoflush): flush before mapping against them."""
+    key = (identity_cache.bind_key(db), owner_user_id)
+    index = _alias_indexes.get(key)
+    if index is not None:
+        return index
+
+    rows = (
+        db.query(
+            MedicalMetricAlias.id,
+            MedicalMetricAlias.dictionary_id,
+            MedicalMetricDictionary.canonical_key,
+            MedicalMetricDictionary.canonical_name,
+            MedicalMetricDictionary.canonical_unit,
+            MedicalMetricAlias.alias_name,
+            MedicalMetricAlias.alias_unit,
+            MedicalMetricAlias.hospital_hint,
+            MedicalMetricAlias.priority,
+        )
+        .join(MedicalMetricDictionary, MedicalMetricDictionary.id == MedicalMetricAlias.dictionary_id)
+        .filter(MedicalMetricAlias.owner_user_id == owner_user_id)
+        .order_by(MedicalMetricAlias.id.asc())
+        .all()
+    )
+    index = AliasIndex(rows)
+    _alias_indexes.put(key, index)
+    return index
+
+
+def best_alias(candidates: Iterable[AliasEntry], *, unit: str | None, hospital: str | None) -> AliasEntry | None:
+    """Highest priority wins; a matching unit adds 10, a matching hospital 20.
+    Ties go to the oldest alias."""
+    best: AliasEntry | None = None
+    best_score = -1
+    for entry in candidates:
+        _, _, alias_unit, hospital_hint, priority = entry
+        score = priority
+        if alias_unit and unit and alias_unit == unit:
+            score += 10
+        if hospital_hint and hospital and hospital_hint == hospital:
+            score += 20
+        if score > best_score:
+            best = entry
+            best_score = score
+    return best
+
+
+def _existing_maps(db: Session, metric_ids: list[int]) -> dict[int, tuple]:
+    """report_metric_id -> (map id, *_MAP_FIELDS)."""
+    rows = db.execute(
+        select(
+            _MAPS.c.report_metric_id,
+            _MAPS.c.id,
+            *(_MAPS.c[name] for name in _MAP_FIELDS),
+        ).where(_MAPS.c.report_metric_id.in_(metric_ids))
+    )
+    return {row[0]: tuple(row[1:]) for row in rows}
+
+
+def _map_chunk(db: Session, index: AliasIndex, rows: list[tuple], counts: dict) -> None:
+    existing = _existing_maps(db, [row[0] for row in rows])
+    inserts: list[dict] = []
+    updates: list[dict] = []
+    for metric_id, item_name, item_code, unit, hospital, value_num, ref_low, ref_high in rows:
+        found = index.match(item_name=item_name, item_code=item_code, unit=unit, hospital=hospital)
+        if found is None:
+            target = _UNMAPPED
+            counts["unmapped"] += 1
+        else:
+            best, status, confidence = found
+            ratio = index.canonical_ratio(best[1], unit)
+            target = (
+                best[1], best[0], status, confidence,
+                units.convert(value_num, ratio), units.convert(ref_low, ratio), units.convert(ref_high, ratio),
+            )
+            counts["mapped"] += 1
+
+        values = dict(zip(_MAP_FIELDS, target))
+        current = existing.get(metric_id)
+        if current is None:
+            inserts.append({"report_metric_id": metric_id, **values})
+        elif current[1:] != target:
+            updates.append({"map_id": current[0], **values})
+
+    # Plain Core executemany: no ORM objects, no per-row RETURNING.
+    if inserts:
+        db.execute(_MAPS.insert(), inserts)
+    if updates:
+        db.execute(_UPDATE_MAP, updates)
+    counts["changed"] += len(inserts) + len(updates)
+
+
+def _map_rows(db: Session, *, owner_user_id: int, rows: Iterable[tuple]) -> dict:
+    """Map (metric_id, item_name, item_code, unit, hospital, value_num,
+    ref_low, ref_high) rows, IN_CHUNK at a time: one SELECT of the chunk's
+    existing maps, then bulk writes of only the maps that are new or
+    changed. The caller commits."""
+    index = alias_index(db, owner_user_id=owner_user_id)
+    counts = {"mapped": 0, "unmapped": 0, "changed": 0}
+    rows = iter(rows)
+    while chunk := list(islice(rows, IN_CHUNK)):
+        _map_chunk(db, index, chunk, counts)
+    return counts
+
+
+def map_report_metrics(db: Session, *, report: MedicalReport) -> dict:
+    """Map a freshly written report's metrics (flushes to get their ids)."""
+    db.flush()
+    rows = [
+        (m.id, m.item_name, m.item_code, m.unit, report.hospital, m.value_num, m.ref_low, m.ref_high)
+        for m in report.metrics
+    ]
+    return _map_rows(db, owner_user_id=report_owner_id(report), rows=rows)
+
+
+def _owner_metric_query(db: Session, *, owner_user_id: int):
+    return (
+        db.query(
+            MedicalReportMetric.id,
+            MedicalReportMetric.item_name,
+            MedicalReportMetric.item_code,
+            MedicalReportMetric.unit,
+            MedicalReport.hospital,
+            MedicalReportMetric.value_num,
+            MedicalReportMetric.ref_low,
+            MedicalReportMetric.ref_high,
+        )
+        .join(MedicalReport, MedicalReport.id == MedicalReportMetric.report_id)
+        .filter(owned_by(owner_user_id))
+    )
+
+
+def remap_alias_names(
+    db: Session, *, owner_user_id: int, names: Iterable[str | None], alias_id: int | None = None
+) -> dict:
+    """Remap after an alias write: the owner's metrics named like any of
+    `names` (e.g. the alias's old and new name), plus every metric without
+    an exact match, which the alias may now reach (or stop reaching)
+    fuzzily. Flush the alias change first."""
+    db.flush()
+    keys = sorted({alias_key(name) for name in names} - {""})
+    maps = MedicalReportMetricMap
+    q = (
+        _owner_metric_query(db, owner_user_id=owner_user_id)
+        .outerjoin(maps, maps.report_metric_id == MedicalReportMetric.id)
+        .filter(
+            or_(
+                # SQL lower() folds ASCII only; a name that matches an alias
+                # only after non-ASCII case folding is picked up by a rebuild.
+                func.lower(func.trim(MedicalReportMetric.item_name)).in_(keys),
+                maps.id.is_(None),
+                maps.match_status != "auto",
+                maps.alias_id.is_(None),
+                maps.alias_id == alias_id,
+            )
+        )
+    )
+    # Materialized, not streamed: the query reads the maps it then rewrites.
+    rows = [tuple(row) for row in q.all()]
+    return _map_rows(db, owner_user_id=owner_user_id, rows=rows)
+
+
+def _owner_metric_rows(db: Session, *, owner_user_id: int) -> Iterator[tuple]:
+    """Stream the owner's metric rows. Only metrics and reports are read,
+    so writing maps meanwhile is safe."""
+    for row in _owner_metric_query(db, owner_user_id=owner_user_id).yield_per(STREAM_BATCH):
+        yield tuple(row)
+
+
+def rebuild(db: Session, *, owner_user_id: int) -> dict:
+    """Re-evaluate every metric of the owner; only changed mappings are written."""
+    rows = _owner_metric_rows(db, owner_user_id=owner_user_id)
+    return _map_rows(db, owner_user_id=owner_user_id, rows=rows)
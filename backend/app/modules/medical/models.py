@@ -1,6 +1,6 @@
 from datetime import date, datetime
 
-from sqlalchemy import Boolean, JSON, Date, DateTime, Float, ForeignKey, Integer, String, Text, UniqueConstraint, func
+from sqlalchemy import Boolean, JSON, Date, DateTime, Float, ForeignKey, Index, Integer, String, Text, UniqueConstraint, func
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.core.db import Base
@@ -8,10 +8,17 @@ from app.core.db import Base
 
 class MedicalReport(Base):
     __tablename__ = "medical_reports"
+    # Every read filters by "subject in family, or undated-subject upload by
+    # family": subject_id IN (...) OR (subject_id IS NULL AND uploader_id IN (...)).
+    # One index per branch; each also serves plain lookups on its first column.
+    __table_args__ = (
+        Index("ix_medical_reports_subject_date", "subject_id", "report_date"),
+        Index("ix_medical_reports_uploader_subject", "uploader_id", "subject_id"),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
-    uploader_id: Mapped[int] = mapped_column(ForeignKey("users.id"), index=True)
-    subject_id: Mapped[int | None] = mapped_column(ForeignKey("users.id"), nullable=True, index=True)
+    uploader_id: Mapped[int] = mapped_column(ForeignKey("users.id"))
+    subject_id: Mapped[int | None] = mapped_column(ForeignKey("users.id"), nullable=True)
     report_type: Mapped[str] = mapped_column(String, default="unknown", index=True)
     report_type_label: Mapped[str | None] = mapped_column(String, nullable=True)
     report_date: Mapped[date | None] = mapped_column(Date, nullable=True, index=True)
@@ -21,6 +28,9 @@ class MedicalReport(Base):
     content_hash: Mapped[str | None] = mapped_column(String, nullable=True, unique=True, index=True)
     status: Mapped[str] = mapped_column(String, default="parsed")  # uploaded/parsing/parsed/failed
     raw_json: Mapped[str | None] = mapped_column(Text, nullable=True)
+    # Metrics flagged high/low; kept in step with `metrics` by the service so
+    # the report list never has to load them.
+    abnormal_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default="0")
     created_at: Mapped[datetime] = mapped_column(DateTime, server_default=func.now())
 
     metrics: Mapped[list["MedicalReportMetric"]] = relationship(
@@ -28,13 +38,43 @@ class MedicalReport(Base):
     )
 
 
+# Matches the report list's sort (undated last, newest first, id as the
+# tiebreak) so keyset pages are an index range scan rather than a sort.
+Index(
+    "ix_medical_reports_list_order",
+    MedicalReport.report_date.is_(None),
+    MedicalReport.report_date.desc(),
+    MedicalReport.created_at.desc(),
+    MedicalReport.id.desc(),
+)
+
+
+class MedicalReportDraft(Base):
+    """A parsed-but-not-committed upload. Lives in the DB so any worker process
+    can serve the commit, and drafts survive restarts until expires_at."""
+
+    __tablename__ = "medical_report_drafts"
+
+    id: Mapped[str] = mapped_column(String, primary_key=True)
+    uploader_id: Mapped[int] = mapped_column(ForeignKey("users.id"), index=True)
+    subject_id: Mapped[int | None] = mapped_column(ForeignKey("users.id"), nullable=True)
+    status: Mapped[str] = mapped_column(String, nullable=False, server_default="parsing")  # parsing/parsed/failed
+    payload_json: Mapped[dict] = mapped_column(JSON, nullable=False)
+    expires_at: Mapped[datetime] = mapped_column(DateTime, nullable=False, index=True)
+    accessed_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True, index=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime, server_default=func.now())
+
+
 class MedicalReportMetric(Base):
     __tablename__ = "medical_report_metrics"
+    # Covers the unmapped metric catalog (group by code/name per visible
+    # report) without touching the table.
+    __table_args__ = (
+        Index("ix_medical_report_metrics_report_item", "report_id", "item_code", "item_name"),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
-    report_id: Mapped[int] = mapped_column(
-        ForeignKey("medical_reports.id", ondelete="CASCADE"), index=True
-    )
+    report_id: Mapped[int] = mapped_column(ForeignKey("medical_reports.id", ondelete="CASCADE"))
     item_name: Mapped[str] = mapped_column(String, nullable=False)
     item_code: Mapped[str | None] = mapped_column(String, nullable=True, index=True)
     value_text: Mapped[str | None] = mapped_column(String, nullable=True)
@@ -118,14 +158,21 @@ class MedicalReportMetricMap(Base):
     __tablename__ = "medical_report_metric_maps"
     __table_args__ = (
         UniqueConstraint("report_metric_id", name="uq_medical_report_metric_map_metric"),
+        # Trend by dictionary entry: dictionary -> metric ids without a table lookup.
+        Index("ix_medical_report_metric_maps_dictionary_metric", "dictionary_id", "report_metric_id"),
     )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     report_metric_id: Mapped[int] = mapped_column(ForeignKey("medical_report_metrics.id", ondelete="CASCADE"), index=True)
-    dictionary_id: Mapped[int | None] = mapped_column(ForeignKey("medical_metric_dictionary.id", ondelete="SET NULL"), nullable=True, index=True)
+    dictionary_id: Mapped[int | None] = mapped_column(ForeignKey("medical_metric_dictionary.id", ondelete="SET NULL"), nullable=True)
     alias_id: Mapped[int | None] = mapped_column(ForeignKey("medical_metric_aliases.id", ondelete="SET NULL"), nullable=True, index=True)
     match_status: Mapped[str] = mapped_column(String, nullable=False, server_default="unmapped")
     confidence: Mapped[float | None] = mapped_column(Float, nullable=True)
+    # value_num / ref_low / ref_high in the dictionary's canonical_unit,
+    # computed when the map is written; NULL when the unit doesn't convert.
+    canonical_value: Mapped[float | None] = mapped_column(Float, nullable=True)
+    canonical_ref_low: Mapped[float | None] = mapped_column(Float, nullable=True)
+    canonical_ref_high: Mapped[float | None] = mapped_column(Float, nullable=True)
     mapped_by: Mapped[int | None] = mapped_column(ForeignKey("users.id"), nullable=True, index=True)
     created_at: Mapped[datetime] = mapped_column(DateTime, server_default=func.now())
 
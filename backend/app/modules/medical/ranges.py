@@ -0,0 +1,132 @@
+"""Reference-range grammar and abnormal-flag derivation.
+
+Range text is folded first (NFKC turns full-width digits, "＜" and "～"
+into ASCII; "≤"/"≦"/"<=" become one form), then tried against GRAMMAR,
+a table of compiled patterns in priority order:
+
+  interval      "3.5-9.5", "3.5～9.5", "3.5至9.5"      both bounds, inclusive
+  comparison    "<5.0", "≤ 40", ">60", ">=1.2"          one bound
+  words         "40以下", "1.0以上", "小于5", "不低于3"  one bound
+  qualitative   "阴性", "(-)", "negative", "阳性"       expected result
+
+Parsed specs are cached by text, so a backfill over many rows parses each
+distinct range string once.
+"""
+import re
+import unicodedata
+from dataclasses import dataclass
+from functools import lru_cache
+
+NEGATIVE = "negative"
+POSITIVE = "positive"
+
+_NUM = r"(-?\d+(?:\.\d+)?)"
+_DASH = r"(?:-|~|–|—|〜|至|到|to)"
+_NEGATIVE = r"阴性|未检出|negative|^neg$|^\(?-\)?$"
+_POSITIVE = r"阳性|positive|^pos$|^\(?\++\)?$"
+
+
+@dataclass(frozen=True)
+class RefRange:
+    low: float | None = None
+    high: float | None = None
+    low_inclusive: bool = True
+    high_inclusive: bool = True
+    # NEGATIVE / POSITIVE for qualitative ranges, else None.
+    expected: str | None = None
+
+
+def _interval(m: re.Match) -> RefRange:
+    return RefRange(low=float(m.group(1)), high=float(m.group(2)))
+
+
+def _upper(inclusive: bool):
+    return lambda m: RefRange(high=float(m.group(1)), high_inclusive=inclusive)
+
+
+def _lower(inclusive: bool):
+    return lambda m: RefRange(low=float(m.group(1)), low_inclusive=inclusive)
+
+
+def _qualitative(expected: str):
+    return lambda m: RefRange(expected=expected)
+
+
+# (pattern, builder), tried in order against folded text; first match wins.
+GRAMMAR = [
+    (re.compile(_NUM + r"\s*" + _DASH + r"\s*" + _NUM), _interval),
+    (re.compile(r"<=\s*" + _NUM), _upper(True)),
+    (re.compile(r"<\s*" + _NUM), _upper(False)),
+    (re.compile(r">=\s*" + _NUM), _lower(True)),
+    (re.compile(r">\s*" + _NUM), _lower(False)),
+    (re.compile(r"(?:不超过|不高于|不大于|最高)\s*" + _NUM), _upper(True)),
+    (re.compile(r"(?:不低于|不少于|不小于|最低)\s*" + _NUM), _lower(True)),
+    (re.compile(r"(?:小于|低于|少于)\s*" + _NUM), _upper(False)),
+    (re.compile(r"(?:大于|高于|超过)\s*" + _NUM), _lower(False)),
+    (re.compile(_NUM + r"\s*[^\d\s]*?(?:以下|以内)"), _upper(True)),
+    (re.compile(_NUM + r"\s*[^\d\s]*?以上"), _lower(True)),
+    (re.compile(_NEGATIVE), _qualitative(NEGATIVE)),
+    (re.compile(_POSITIVE), _qualitative(POSITIVE)),
+]
+
+# Qualitative results, checked in order (so "弱阳性" is positive and
+# "未检出" isn't read as "检出").
+_RESULTS = [
+    (re.compile(_NEGATIVE), NEGATIVE),
+    (re.compile(_POSITIVE + "|检出"), POSITIVE),
+]
+
+_COMPARATORS = str.maketrans({"≤": "<=", "≦": "<=", "≥": ">=", "≧": ">="})
+
+
+def _fold(text: str) -> str:
+    folded = unicodedata.normalize("NFKC", text).translate(_COMPARATORS).casefold()
+    return " ".join(folded.split())
+
+
+@lru_cache(maxsize=4096)
+def parse(ref_range: str | None) -> RefRange | None:
+    """The RefRange a reference text describes, or None if no rule matches."""
+    if not ref_range:
+        return None
+    text = _fold(ref_range)
+    for pattern, build in GRAMMAR:
+        m = pattern.search(text)
+        if m:
+            return build(m)
+    return None
+
+
+def qualitative_result(value_text: str | None) -> str | None:
+    """NEGATIVE / POSITIVE for a qualitative value, else None."""
+    if not value_text:
+        return None
+    text = _fold(value_text)
+    for pattern, result in _RESULTS:
+        if pattern.search(text):
+            return result
+    return None
+
+
+def flag(spec: RefRange | None, *, value_num: float | None, value_text: str | None = None) -> str | None:
+    """high / low / normal against spec, or None when it can't be judged.
+    A qualitative result opposite to the expected one is flagged like an
+    out-of-range number: positive where negative is expected is "high"."""
+    if spec is None:
+        return None
+    if spec.expected is not None:
+        result = qualitative_result(value_text)
+        if result is None:
+            return None
+        if result == spec.expected:
+            return "normal"
+        return "high" if result == POSITIVE else "low"
+    if value_num is None:
+        return None
+    if spec.low is not None and (value_num < spec.low or (value_num == spec.low and not spec.low_inclusive)):
+        return "low"
+    if spec.high is not None and (value_num > spec.high or (value_num == spec.high and not spec.high_inclusive)):
+        return "high"
+    if spec.low is None and spec.high is None:
+        return None
+    return "normal"
@@ -1,3 +1,4 @@
+import asyncio
 import os
 
 from fastapi import APIRouter, Depends, File, Form, Query, UploadFile
@@ -7,13 +8,14 @@ from sqlalchemy.orm import Session
 
 from app.core import storage
 from app.core.db import get_db
-from app.core.deps import get_current_membership, get_current_user
+from app.core.deps import async_db_route, get_current_membership, get_current_user
 from app.core.exceptions import NotFoundError, PikaException, VisionParseError
 from app.core.user import service as user_service
 from app.core.user.models import FamilyMembership
 from app.core.schemas_base import ApiResponse
 from app.core.user.models import User
-from app.modules.medical import service
+from app.core.workers import run_blocking
+from app.modules.medical import jobs, service
 from app.modules.medical.models import (
     MedicalMetricDictionary,
     MedicalReport,
@@ -55,6 +57,9 @@ from app.modules.medical.schemas import (
 
 router = APIRouter(prefix="/api/medical", tags=["medical"])
 
+_DRAFT_MAX_WAIT = 30.0
+_DRAFT_POLL_INTERVAL = 0.5
+
 
 def _detail_out(db: Session, report: MedicalReport) -> ReportDetailOut:
     out = ReportOut.model_validate(report)
@@ -77,6 +82,11 @@ def _ensure_subject_in_family(db: Session, actor: User, subject_id: int | None)
         raise PikaException("subject out of family", code=403)
 
 
+def _require_upload_for(db: Session, actor: User, subject_id: int | None) -> None:
+    _ensure_subject_in_family(db, actor, subject_id)
+    _require_action_on_owner(db, actor, subject_id or actor.id, "upload_for_owner")
+
+
 def _report_owner_user_id(report: MedicalReport) -> int:
     return report.subject_id or report.uploader_id
 
@@ -481,6 +491,53 @@ def delete_mapping_alias(
     )
 
 
+async def _parse_staged_draft(db: Session, draft_id: str) -> dict:
+    await asyncio.wrap_future(jobs.submit_parse(draft_id))
+    draft = await run_blocking(service.get_draft, db, draft_id)
+    if not draft:
+        raise NotFoundError("draft not found or expired")
+    return draft
+
+
+async def _wait_for_draft(db: Session, draft_id: str, timeout: float) -> dict | None:
+    """Long-poll: return as soon as the draft leaves `parsing` or timeout hits.
+
+    Waits on the local job when this process owns it, otherwise re-polls the
+    draft store every _DRAFT_POLL_INTERVAL seconds.
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while True:
+        draft = await run_blocking(service.get_draft, db, draft_id)
+        remaining = deadline - loop.time()
+        if draft is None or draft["status"] != "parsing" or remaining <= 0:
+            return draft
+        job = jobs.pending_job(draft_id)
+        if job is not None:
+            # asyncio.wait (not wait_for) so a timeout never cancels the job.
+            await asyncio.wait({asyncio.wrap_future(job)}, timeout=remaining)
+        else:
+            await asyncio.sleep(min(_DRAFT_POLL_INTERVAL, remaining))
+
+
+def _draft_out(draft: dict) -> DraftOut:
+    return DraftOut(
+        draft_id=draft["draft_id"],
+        status=draft["status"],
+        is_lab_report=draft["is_lab_report"],
+        report_type=draft["report_type"],
+        report_type_label=draft["report_type_label"],
+        report_date=draft["report_date"],
+        hospital=draft["hospital"],
+        metrics=[DraftMetric(**m) for m in draft["metrics"]],
+    )
+
+
+def _require_draft_access(db: Session, actor: User, draft: dict) -> None:
+    owner_user_id = draft.get("subject_id") or draft.get("uploader_id")
+    _require_action_on_owner(db, actor, owner_user_id, "upload_for_owner")
+
+
 @router.post("/reports", response_model=ApiResponse[ReportDetailOut])
 async def upload_report(
     file: UploadFile = File(...),
@@ -492,21 +549,26 @@ async def upload_report(
     membership: FamilyMembership = Depends(get_current_membership),
 ):
     _ = membership
-    _ensure_subject_in_family(db, user, subject_id)
-    owner_user_id = subject_id or user.id
-    _require_action_on_owner(db, user, owner_user_id, "upload_for_owner")
-    content = await file.read()
-    report = service.create_report(
+    # SQLite, disk and the vision call all block; keep them off the event loop.
+    await run_blocking(_require_upload_for, db, user, subject_id)
+    jobs.ensure_capacity()
+    # Hand the spooled upload file to the worker; it is streamed to disk
+    # rather than read into memory here.
+    draft = await run_blocking(
+        service.stage_draft,
         db,
         uploader_id=user.id,
         subject_id=subject_id,
-        image_bytes=content,
-        filename=file.filename,
-        content_type=file.content_type,
+        files=[(file.file, file.filename, file.content_type)],
         report_date_override=report_date,
         hospital_override=hospital,
     )
-    return ApiResponse.ok(_detail_out(db, report))
+    await _parse_staged_draft(db, draft["draft_id"])
+    try:
+        report = await run_blocking(service.commit_parsed_draft, db, draft_id=draft["draft_id"])
+    except ValueError as e:
+        raise NotFoundError(str(e))
+    return ApiResponse.ok(await run_blocking(_detail_out, db, report))
 
 
 @router.post("/report-drafts", response_model=ApiResponse[DraftOut])
@@ -515,37 +577,56 @@ async def create_report_draft(
     report_date: str | None = Form(default=None),
     subject_id: int | None = Form(default=None),
     hospital: str | None = Form(default=None),
+    async_parse: bool = Form(default=False),
     db: Session = Depends(get_db),
     user: User = Depends(get_current_user),
     membership: FamilyMembership = Depends(get_current_membership),
 ):
-    _ = membership
-    _ensure_subject_in_family(db, user, subject_id)
-    owner_user_id = subject_id or user.id
-    _require_action_on_owner(db, user, owner_user_id, "upload_for_owner")
-    payload = []
-    for f in files:
-        payload.append((await f.read(), f.filename, f.content_type))
+    """Stage images and enqueue the vision parse.
 
-    draft = service.create_draft_from_images(
+    async_parse=1 returns immediately with status=parsing; poll
+    GET /report-drafts/{draft_id}?wait=N for the result. Older clients omit it
+    and get the parsed draft in this response, as before.
+    """
+    _ = membership
+    await run_blocking(_require_upload_for, db, user, subject_id)
+    jobs.ensure_capacity()
+    draft = await run_blocking(
+        service.stage_draft,
         db,
         uploader_id=user.id,
         subject_id=subject_id,
-        files=payload,
+        files=[(f.file, f.filename, f.content_type) for f in files],
         report_date_override=report_date,
         hospital_override=hospital,
     )
-    return ApiResponse.ok(
-        DraftOut(
-            draft_id=draft["draft_id"],
-            is_lab_report=draft["is_lab_report"],
-            report_type=draft["report_type"],
-            report_type_label=draft["report_type_label"],
-            report_date=draft["report_date"],
-            hospital=draft["hospital"],
-            metrics=[DraftMetric(**m) for m in draft["metrics"]],
-        )
-    )
+    if async_parse:
+        jobs.submit_parse(draft["draft_id"])
+    else:
+        draft = await _parse_staged_draft(db, draft["draft_id"])
+    return ApiResponse.ok(_draft_out(draft))
+
+
+@router.get("/report-drafts/{draft_id}", response_model=ApiResponse[DraftOut])
+async def get_report_draft(
+    draft_id: str,
+    wait: float = Query(default=0, ge=0, le=_DRAFT_MAX_WAIT),
+    db: Session = Depends(get_db),
+    user: User = Depends(get_current_user),
+    membership: FamilyMembership = Depends(get_current_membership),
+):
+    """Poll a draft's parse status; wait>0 long-polls up to that many seconds."""
+    _ = membership
+    draft = await run_blocking(service.get_draft, db, draft_id)
+    if not draft:
+        raise NotFoundError("draft not found or expired")
+    await run_blocking(_require_draft_access, db, user, draft)
+    jobs.resume_orphaned(draft)
+    if wait and draft["status"] == "parsing":
+        draft = await _wait_for_draft(db, draft_id, wait)
+        if not draft:
+            raise NotFoundError("draft not found or expired")
+    return ApiResponse.ok(_draft_out(draft))
 
 
 @router.post("/report-drafts/{draft_id}/commit", response_model=ApiResponse[ReportDetailOut])
@@ -557,9 +638,12 @@ def commit_report_draft(
     membership: FamilyMembership = Depends(get_current_membership),
 ):
     _ = membership
-    draft = service.get_draft(draft_id)
+    draft = service.get_draft(db, draft_id)
     if not draft:
         raise NotFoundError("draft not found or expired")
+    if draft["status"] == "parsing":
+        jobs.resume_orphaned(draft)
+        raise PikaException("draft is still parsing", code=409)
 
     effective_subject_id = body.subject_id if body.subject_id is not None else draft.get("subject_id")
     _ensure_subject_in_family(db, user, effective_subject_id)
@@ -584,7 +668,7 @@ def commit_report_draft(
     return ApiResponse.ok(_detail_out(db, report))
 
 
-@router.get("/reports", response_model=ApiResponse[ReportListOut])
+@async_db_route(router.get("/reports", response_model=ApiResponse[ReportListOut]))
 def list_reports(
     subject_id: int | None = Query(default=None),
     report_type: str | None = Query(default=None),
@@ -593,17 +677,18 @@ def list_reports(
     date_to: str | None = Query(default=None),
     page: int = Query(default=1, ge=1),
     size: int = Query(default=20, ge=1, le=100),
+    cursor: str | None = Query(default=None),
+    with_total: bool = Query(default=True),
     db: Session = Depends(get_db),
     user: User = Depends(get_current_user),
     membership: FamilyMembership = Depends(get_current_membership),
 ):
+    """Page/size for old clients; newer ones pass back `next_cursor` as
+    `cursor` (keyset, stable under inserts) and can skip the count."""
     family_user_ids = _family_user_ids(db, membership)
-    visible_owner_ids = [
-        uid for uid in family_user_ids
-        if service.has_acl_action(db, actor_user_id=user.id, owner_user_id=uid, action="view_report")
-    ]
+    visible_owner_ids = service.visible_owner_ids(db, actor_user_id=user.id, action="view_report")
     if not visible_owner_ids:
-        return ApiResponse.ok(ReportListOut(total=0, items=[]))
+        return ApiResponse.ok(ReportListOut(total=0 if with_total else None, items=[]))
 
     q = db.query(MedicalReport).filter(
         or_(
@@ -626,17 +711,16 @@ def list_reports(
     if date_to:
         q = q.filter(MedicalReport.report_date <= date_to)
 
-    total = q.count()
-    rows = (
-        q.order_by(
-            MedicalReport.report_date.is_(None),  # nulls last
-            MedicalReport.report_date.desc(),
-            MedicalReport.created_at.desc(),
-        )
-        .offset((page - 1) * size)
-        .limit(size)
-        .all()
-    )
+    total = q.count() if with_total else None
+    q = q.order_by(*service.REPORT_LIST_ORDER)
+    if cursor:
+        q = q.filter(service.reports_after_cursor(cursor))
+    else:
+        q = q.offset((page - 1) * size)
+    # One extra row tells us whether there is a next page.
+    rows = q.limit(size + 1).all()
+    next_cursor = service.encode_report_cursor(rows[size - 1]) if len(rows) > size else None
+    rows = rows[:size]
 
     nickname_by_id = {
         u.id: u.nickname
@@ -644,9 +728,6 @@ def list_reports(
     }
     items = []
     for r in rows:
-        abnormal = sum(
-            1 for m in r.metrics if m.abnormal_flag in ("high", "low")
-        )
         items.append(
             ReportListItem(
                 id=r.id,
@@ -657,25 +738,22 @@ def list_reports(
                 subject_id=r.subject_id,
                 subject_nickname=nickname_by_id.get(r.subject_id),
                 uploader_nickname=nickname_by_id.get(r.uploader_id),
-                abnormal_count=abnormal,
+                abnormal_count=r.abnormal_count,
                 status=r.status,
                 created_at=r.created_at,
             )
         )
-    return ApiResponse.ok(ReportListOut(total=total, items=items))
+    return ApiResponse.ok(ReportListOut(total=total, items=items, next_cursor=next_cursor))
 
 
-@router.get("/hospitals", response_model=ApiResponse[list[str]])
+@async_db_route(router.get("/hospitals", response_model=ApiResponse[list[str]]))
 def list_hospitals(
     db: Session = Depends(get_db),
     user: User = Depends(get_current_user),
     membership: FamilyMembership = Depends(get_current_membership),
 ):
-    family_user_ids = _family_user_ids(db, membership)
-    visible_owner_ids = [
-        uid for uid in family_user_ids
-        if service.has_acl_action(db, actor_user_id=user.id, owner_user_id=uid, action="view_report")
-    ]
+    _ = membership
+    visible_owner_ids = service.visible_owner_ids(db, actor_user_id=user.id, action="view_report")
     if not visible_owner_ids:
         return ApiResponse.ok([])
 
@@ -694,7 +772,7 @@ def list_hospitals(
     return ApiResponse.ok(sorted(r[0] for r in rows if r[0]))
 
 
-@router.get("/reports/{report_id}", response_model=ApiResponse[ReportDetailOut])
+@async_db_route(router.get("/reports/{report_id}", response_model=ApiResponse[ReportDetailOut]))
 def get_report(
     report_id: int,
     db: Session = Depends(get_db),
@@ -763,6 +841,7 @@ def delete_report(
 @router.post("/reports/{report_id}/reparse", response_model=ApiResponse[ReportDetailOut])
 def reparse_report(
     report_id: int,
+    fresh: bool = Query(default=False),
     db: Session = Depends(get_db),
     user: User = Depends(get_current_user),
     membership: FamilyMembership = Depends(get_current_membership),
@@ -774,7 +853,7 @@ def reparse_report(
     _require_report_editable(db, user, existing)
 
     try:
-        report = service.reparse_report(db, report_id=report_id)
+        report = service.reparse_report(db, report_id=report_id, fresh=fresh)
     except Exception:
         raise VisionParseError("重新解析失败，请稍后再试")
     if report is None:
@@ -800,24 +879,25 @@ def get_report_image(
     return FileResponse(path)
 
 
-@router.get("/metrics/trend", response_model=ApiResponse[TrendOut])
+@async_db_route(router.get("/metrics/trend", response_model=ApiResponse[TrendOut]))
 def metric_trend(
     dictionary_id: int | None = Query(default=None),
     item_code: str | None = Query(default=None),
     item_name: str | None = Query(default=None),
     subject_id: int | None = Query(default=None),
+    canonical: bool = Query(default=False),
     db: Session = Depends(get_db),
     user: User = Depends(get_current_user),
     membership: FamilyMembership = Depends(get_current_membership),
 ):
+    _ = membership
     if not isinstance(dictionary_id, int):
         dictionary_id = None
+    # Canonical-unit series exist only for dictionary trends: the values
+    # are precomputed on the metric maps.
+    canonical = canonical is True and dictionary_id is not None
 
-    family_user_ids = _family_user_ids(db, membership)
-    visible_owner_ids = [
-        uid for uid in family_user_ids
-        if service.has_acl_action(db, actor_user_id=user.id, owner_user_id=uid, action="view_report")
-    ]
+    visible_owner_ids = service.visible_owner_ids(db, actor_user_id=user.id, action="view_report")
     if not visible_owner_ids:
         return ApiResponse.ok(
             TrendOut(
@@ -829,13 +909,14 @@ def metric_trend(
                 ref_low=None,
                 ref_high=None,
                 has_mixed_reference=False,
+                canonical=canonical,
                 points=[],
             )
         )
 
     if dictionary_id is not None:
         q = (
-            db.query(MedicalReportMetric, MedicalReport, MedicalMetricDictionary)
+            db.query(MedicalReportMetric, MedicalReport, MedicalMetricDictionary, MedicalReportMetricMap)
             .join(MedicalReportMetricMap, MedicalReportMetricMap.report_metric_id == MedicalReportMetric.id)
             .join(MedicalMetricDictionary, MedicalMetricDictionary.id == MedicalReportMetricMap.dictionary_id)
             .join(MedicalReport, MedicalReportMetric.report_id == MedicalReport.id)
@@ -860,40 +941,62 @@ def metric_trend(
             MedicalReportMetric.seq.asc(),
         ).all()
 
-        reference_keys = {
-            (metric.ref_low, metric.ref_high, metric.ref_range)
-            for metric, _, _ in rows
-        }
+        dictionary = rows[0][2] if rows else db.get(MedicalMetricDictionary, dictionary_id)
+        if canonical:
+            # Points whose unit doesn't convert keep their raw unit and
+            # value_text, with no value_num to plot.
+            points = [
+                TrendPoint(
+                    report_date=rep.report_date,
+                    value_text=metric.value_text,
+                    value_num=mapped.canonical_value,
+                    unit=dic.canonical_unit if mapped.canonical_value is not None else metric.unit,
+                    ref_range=metric.ref_range,
+                    ref_low=mapped.canonical_ref_low,
+                    ref_high=mapped.canonical_ref_high,
+                    abnormal_flag=metric.abnormal_flag,
+                    report_id=rep.id,
+                    hospital=rep.hospital,
+                )
+                for metric, rep, dic, mapped in rows
+            ]
+            reference_keys = {(p.ref_low, p.ref_high) for p in points}
+        else:
+            points = [
+                TrendPoint(
+                    report_date=rep.report_date,
+                    value_text=metric.value_text,
+                    value_num=metric.value_num,
+                    unit=metric.unit,
+                    ref_range=metric.ref_range,
+                    ref_low=metric.ref_low,
+                    ref_high=metric.ref_high,
+                    abnormal_flag=metric.abnormal_flag,
+                    report_id=rep.id,
+                    hospital=rep.hospital,
+                )
+                for metric, rep, _, _ in rows
+            ]
+            reference_keys = {(p.ref_low, p.ref_high, p.ref_range) for p in points}
         has_mixed_reference = len(reference_keys) > 1
 
-        points = [
-            TrendPoint(
-                report_date=rep.report_date,
-                value_text=metric.value_text,
-                value_num=metric.value_num,
-                unit=metric.unit,
-                ref_range=metric.ref_range,
-                ref_low=metric.ref_low,
-                ref_high=metric.ref_high,
-                abnormal_flag=metric.abnormal_flag,
-                report_id=rep.id,
-                hospital=rep.hospital,
-            )
-            for metric, rep, _ in rows
-        ]
         first_metric = rows[0][0] if rows else None
-        last_metric = rows[-1][0] if rows else None
-        dictionary = rows[0][2] if rows else db.get(MedicalMetricDictionary, dictionary_id)
+        last_point = points[-1] if points else None
+        if canonical:
+            unit = dictionary.canonical_unit if dictionary else None
+        else:
+            unit = last_point.unit if last_point else (dictionary.canonical_unit if dictionary else None)
         return ApiResponse.ok(
             TrendOut(
                 dictionary_id=dictionary_id,
                 category_key=dictionary.category_key if dictionary else None,
                 item_code=first_metric.item_code if first_metric else None,
                 item_name=dictionary.canonical_name if dictionary else "",
-                unit=(last_metric.unit if last_metric else (dictionary.canonical_unit if dictionary else None)),
-                ref_low=last_metric.ref_low if last_metric else None,
-                ref_high=last_metric.ref_high if last_metric else None,
+                unit=unit,
+                ref_low=last_point.ref_low if last_point else None,
+                ref_high=last_point.ref_high if last_point else None,
                 has_mixed_reference=has_mixed_reference,
+                canonical=canonical,
                 points=points,
             )
         )
@@ -963,7 +1066,7 @@ def metric_trend(
     )
 
 
-@router.get("/metrics/catalog", response_model=ApiResponse[CatalogOut])
+@async_db_route(router.get("/metrics/catalog", response_model=ApiResponse[CatalogOut]))
 def metric_catalog(
     subject_id: int | None = Query(default=None),
     mapped: int = Query(default=0),
@@ -972,14 +1075,11 @@ def metric_catalog(
     user: User = Depends(get_current_user),
     membership: FamilyMembership = Depends(get_current_membership),
 ):
+    _ = membership
     mapped = int(mapped) if isinstance(mapped, int) else 0
     category_key = category_key if isinstance(category_key, str) else None
 
-    family_user_ids = _family_user_ids(db, membership)
-    visible_owner_ids = [
-        uid for uid in family_user_ids
-        if service.has_acl_action(db, actor_user_id=user.id, owner_user_id=uid, action="view_report")
-    ]
+    visible_owner_ids = service.visible_owner_ids(db, actor_user_id=user.id, action="view_report")
     if not visible_owner_ids:
         return ApiResponse.ok(CatalogOut(items=[]))
 
@@ -51,8 +51,11 @@ class ReportListItem(BaseModel):
 
 
 class ReportListOut(BaseModel):
-    total: int
+    # None when the client passed with_total=false.
+    total: int | None = None
     items: list[ReportListItem]
+    # Pass back as `cursor` for the next page; None on the last page.
+    next_cursor: str | None = None
 
 
 class TrendPoint(BaseModel):
@@ -77,6 +80,8 @@ class TrendOut(BaseModel):
     ref_low: float | None = None
     ref_high: float | None = None
     has_mixed_reference: bool = False
+    # Values, units and reference bounds in the dictionary's canonical_unit.
+    canonical: bool = False
     points: list[TrendPoint]
 
 
@@ -107,6 +112,7 @@ class DraftMetric(BaseModel):
 
 class DraftOut(BaseModel):
     draft_id: str
+    status: str = "parsed"  # parsing/parsed/failed
     is_lab_report: bool = True
     report_type: str
     report_type_label: str | None = None
@@ -199,6 +205,7 @@ class BootstrapOut(BaseModel):
 class MappingRebuildOut(BaseModel):
     mapped: int
     unmapped: int
+    changed: int = 0
 
 
 class MappingAliasOut(BaseModel):
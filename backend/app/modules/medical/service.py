@@ -1,18 +1,21 @@
+import base64
 import hashlib
+import io
 import json
 import logging
 import os
 import uuid
 from datetime import date, datetime, timedelta
+from typing import BinaryIO
 
-from sqlalchemy import and_, or_
-from sqlalchemy.orm import Session
+from sqlalchemy import and_, bindparam, func, insert, or_, select, update
+from sqlalchemy.orm import Session, aliased
 
-from app.core import storage
-from app.core.exceptions import DuplicateReportError
+from app.core import identity_cache, storage
+from app.core.exceptions import DuplicateReportError, PikaException
 from app.core.user import service as user_service
 from app.core.user.models import FamilyMembership, User
-from app.modules.medical import vision
+from app.modules.medical import drafts, mapping, vision
 from app.modules.medical.models import (
     MedicalAclGrant,
     MedicalMetricAlias,
@@ -20,9 +23,9 @@ from app.modules.medical.models import (
     MedicalReport,
     MedicalReportCategory,
     MedicalReportMetric,
-    MedicalReportMetricMap,
     MedicalUserFocusMetric,
 )
+from app.settings import settings
 
 logger = logging.getLogger(__name__)
 
@@ -51,7 +54,24 @@ _KEYWORD_CATEGORY_RULES = [
 ]
 
 _DRAFT_TTL = timedelta(hours=1)
-_DRAFTS: dict[str, dict] = {}
+
+ABNORMAL_FLAGS = ("high", "low")
+
+_METRICS = MedicalReportMetric.__table__
+# Range backfill: executemany of re-derived bounds and flags.
+_UPDATE_METRIC_RANGE = (
+    update(_METRICS)
+    .where(_METRICS.c.id == bindparam("metric_id"))
+    .values(
+        ref_low=bindparam("ref_low"),
+        ref_high=bindparam("ref_high"),
+        abnormal_flag=bindparam("abnormal_flag"),
+    )
+)
+
+# actor_user_id -> (active family member ids, {owner_user_id: granted actions})
+_acl_snapshots = identity_cache.register_cache("medical_acl")
+identity_cache.watch(MedicalAclGrant)
 
 
 def _parse_date(value) -> date | None:
@@ -67,18 +87,42 @@ def _new_draft_id() -> str:
     return uuid.uuid4().hex
 
 
-def _content_hash(files: list[tuple[bytes, str | None, str | None]]) -> str:
+def _content_hash(image_hashes) -> str:
     """Order-independent hash of a report's images: sha256 of each image's
     sha256, sorted then joined. Same images -> same hash regardless of order."""
-    per_image = sorted(hashlib.sha256(content).hexdigest() for content, _, _ in files)
-    return hashlib.sha256("".join(per_image).encode()).hexdigest()
+    return hashlib.sha256("".join(sorted(image_hashes)).encode()).hexdigest()
+
+
+def _save_images(files: list[tuple[bytes | BinaryIO, str | None, str | None]]) -> tuple[list[str], str]:
+    """Write each upload (raw bytes or a file object, e.g. UploadFile.file)
+    to storage, hashing as it streams. Returns (image_paths, content_hash);
+    on failure nothing written so far is left behind."""
+    image_paths: list[str] = []
+    image_hashes: list[str] = []
+    try:
+        for content, filename, content_type in files:
+            fileobj = io.BytesIO(content) if isinstance(content, bytes) else content
+            path, digest, _ = storage.save_image_stream(fileobj, filename, content_type)
+            image_paths.append(path)
+            image_hashes.append(digest)
+    except BaseException:
+        _remove_images(image_paths)
+        raise
+    return image_paths, _content_hash(image_hashes)
+
+
+def _remove_images(paths) -> int:
+    removed = 0
+    for rel in paths:
+        abs_p = storage.abs_path(rel)
+        if os.path.exists(abs_p):
+            os.remove(abs_p)
+            removed += 1
+    return removed
 
 
-def _cleanup_expired_drafts() -> None:
-    now = datetime.now()
-    expired = [k for k, v in _DRAFTS.items() if v.get("expires_at") and v["expires_at"] < now]
-    for k in expired:
-        _DRAFTS.pop(k, None)
+def _count_abnormal(metrics: list[MedicalReportMetric]) -> int:
+    return sum(1 for m in metrics if m.abnormal_flag in ABNORMAL_FLAGS)
 
 
 def _persist_report(
@@ -111,65 +155,40 @@ def _persist_report(
     )
     for m in metrics:
         report.metrics.append(MedicalReportMetric(**m))
+    report.abnormal_count = _count_abnormal(report.metrics)
 
     db.add(report)
+    mapping.map_report_metrics(db, report=report)
     db.commit()
     db.refresh(report)
     return report
 
 
-def create_draft_from_images(
+def stage_draft(
     db: Session,
     *,
     uploader_id: int,
     subject_id: int | None,
-    files: list[tuple[bytes, str | None, str | None]],
+    files: list[tuple[bytes | BinaryIO, str | None, str | None]],
     report_date_override: str | None = None,
     hospital_override: str | None = None,
 ) -> dict:
-    """Save images + parse first image into an in-memory draft.
+    """Save images into a new draft with status=parsing; vision runs later in
+    parse_draft (usually on the parse job pool).
 
-    Rejects duplicates (same image set already committed) before saving or
-    parsing, to save disk and Azure tokens.
+    Each image is hashed while it streams to disk, so the upload is never
+    held in memory whole. Duplicates (same image set already committed) are
+    rejected before any vision call, and their just-written files removed.
     """
-    _cleanup_expired_drafts()
-
-    content_hash = _content_hash(files)
+    image_paths, content_hash = _save_images(files)
     if db.query(MedicalReport.id).filter_by(content_hash=content_hash).first():
+        _remove_images(image_paths)
         raise DuplicateReportError("该检查单已存在，请勿重复上传")
 
-    image_paths = [
-        storage.save_image(content, filename, content_type)
-        for content, filename, content_type in files
-    ]
-
-    report_type = "unknown"
-    report_type_label = None
-    report_date = _parse_date(report_date_override)
-    hospital = hospital_override
-    is_lab_report = True
-    metrics: list[dict] = []
-    raw_json = None
-    status = "parsed"
-
     owner_user_id = subject_id or uploader_id
     categories = list_user_categories(db, user_id=owner_user_id)
     candidates = [c.display_name for c in categories if c.enabled]
 
-    try:
-        parsed, raw_text = vision.parse_report_image(files[0][0], category_candidates=candidates)
-        is_lab_report = parsed["is_lab_report"]
-        report_type = parsed["report_type"]
-        report_type_label = parsed["report_type_label"]
-        report_date = _parse_date(report_date_override or parsed["report_date"])
-        hospital = hospital_override or parsed["hospital"]
-        metrics = parsed["metrics"]
-        raw_json = raw_text
-    except Exception as e:
-        logger.exception("vision parse failed for draft")
-        status = "failed"
-        raw_json = json.dumps({"error": str(e)}, ensure_ascii=False)
-
     draft_id = _new_draft_id()
     draft = {
         "draft_id": draft_id,
@@ -177,23 +196,137 @@ def create_draft_from_images(
         "subject_id": subject_id,
         "image_paths": image_paths,
         "content_hash": content_hash,
-        "is_lab_report": is_lab_report,
-        "report_type": report_type,
-        "report_type_label": report_type_label,
-        "report_date": report_date,
-        "hospital": hospital,
-        "metrics": metrics,
-        "raw_json": raw_json,
-        "status": status,
+        "category_candidates": candidates,
+        "report_date_override": report_date_override,
+        "hospital_override": hospital_override,
+        "is_lab_report": True,
+        "report_type": "unknown",
+        "report_type_label": None,
+        "report_date": _parse_date(report_date_override),
+        "hospital": hospital_override,
+        "metrics": [],
+        "raw_json": None,
+        "status": "parsing",
+        # ISO string: the payload is stored as JSON.
+        "staged_at": datetime.now().isoformat(),
         "expires_at": datetime.now() + _DRAFT_TTL,
     }
-    _DRAFTS[draft_id] = draft
+    drafts.get_store().put(db, draft)
     return draft
 
 
-def get_draft(draft_id: str) -> dict | None:
-    _cleanup_expired_drafts()
-    return _DRAFTS.get(draft_id)
+def _parse_image_file(rel_path: str, vision_kwargs: dict) -> tuple[dict, str]:
+    with open(storage.abs_path(rel_path), "rb") as f:
+        image_bytes = f.read()
+    return vision.parse_report_image(image_bytes, **vision_kwargs)
+
+
+def _parse_pages(image_paths: list[str], **vision_kwargs) -> tuple[dict, str]:
+    """Run vision on every page of one report and merge the results.
+
+    Pages are parsed concurrently on the shared vision page pool, so a
+    multi-page report takes about as long as its slowest page when Azure
+    has free slots (settings.vision_concurrency, process-wide).
+    One page keeps the model text as raw_json; several pages store a JSON
+    list with one entry per page. A failed page is recorded there and
+    skipped; this raises only if every page fails.
+    """
+    if len(image_paths) == 1:
+        return _parse_image_file(image_paths[0], vision_kwargs)
+
+    pool = vision.page_executor()
+    futures = [pool.submit(_parse_image_file, p, vision_kwargs) for p in image_paths]
+
+    pages, raw_pages, errors = [], [], []
+    for page_no, future in enumerate(futures, start=1):
+        try:
+            parsed, raw_text = future.result()
+        except Exception as e:
+            logger.warning("vision parse failed for page %d: %s", page_no, e)
+            errors.append(e)
+            raw_pages.append({"page": page_no, "error": str(e)})
+            continue
+        pages.append(parsed)
+        raw_pages.append({"page": page_no, "raw": raw_text})
+    if not pages:
+        raise errors[0]
+    return vision.merge_pages(pages), json.dumps(raw_pages, ensure_ascii=False)
+
+
+def parse_draft(db: Session, draft_id: str) -> dict | None:
+    """Run vision on every page of a staged draft and move it to parsed/failed.
+
+    Returns None if the draft expired, or was expired/evicted by the sweep
+    while vision ran (its images are gone then). Vision errors never raise:
+    the draft is marked failed but keeps its images so the user can still
+    fill it in by hand.
+    """
+    draft = get_draft(db, draft_id)
+    if draft is None:
+        return None
+
+    report_date_override = draft.get("report_date_override")
+    hospital_override = draft.get("hospital_override")
+    try:
+        parsed, raw_text = _parse_pages(
+            draft["image_paths"], category_candidates=draft.get("category_candidates")
+        )
+        draft["is_lab_report"] = parsed["is_lab_report"]
+        draft["report_type"] = parsed["report_type"]
+        draft["report_type_label"] = parsed["report_type_label"]
+        draft["report_date"] = _parse_date(report_date_override or parsed["report_date"])
+        draft["hospital"] = hospital_override or parsed["hospital"]
+        draft["metrics"] = parsed["metrics"]
+        draft["raw_json"] = raw_text
+        draft["status"] = "parsed"
+    except Exception as e:
+        logger.exception("vision parse failed for draft")
+        draft["status"] = "failed"
+        draft["raw_json"] = json.dumps({"error": str(e)}, ensure_ascii=False)
+    if not drafts.get_store().update_if_parsing(db, draft):
+        logger.info("draft %s was swept during its parse; result dropped", draft_id)
+        return None
+    return draft
+
+
+def create_draft_from_images(
+    db: Session,
+    *,
+    uploader_id: int,
+    subject_id: int | None,
+    files: list[tuple[bytes | BinaryIO, str | None, str | None]],
+    report_date_override: str | None = None,
+    hospital_override: str | None = None,
+) -> dict:
+    """Save images + parse all pages into a draft, synchronously."""
+    draft = stage_draft(
+        db,
+        uploader_id=uploader_id,
+        subject_id=subject_id,
+        files=files,
+        report_date_override=report_date_override,
+        hospital_override=hospital_override,
+    )
+    return parse_draft(db, draft["draft_id"]) or draft
+
+
+def get_draft(db: Session, draft_id: str) -> dict | None:
+    """Look up one draft. Expired drafts read as missing even before the
+    background sweeper (sweep_drafts) has removed them."""
+    draft = drafts.get_store().get(db, draft_id)
+    if draft is None or draft["expires_at"] < datetime.now():
+        return None
+    return draft
+
+
+def sweep_drafts(db: Session) -> dict:
+    """Drop expired drafts, then enforce the store's size caps. Images of
+    dropped drafts were never committed to a report, so they go too."""
+    store = drafts.get_store()
+    expired = store.purge_expired(db, datetime.now())
+    evicted = store.trim(db)
+    removed = _remove_images(p for d in expired + evicted for p in d.get("image_paths") or [])
+    return {"expired": len(expired), "evicted": len(evicted), "images_removed": removed}
 
 
 def commit_draft(
@@ -207,7 +340,7 @@ def commit_draft(
     metrics: list[dict],
     subject_id: int | None = None,
 ) -> MedicalReport:
-    draft = get_draft(draft_id)
+    draft = get_draft(db, draft_id)
     if not draft:
         raise ValueError("draft not found or expired")
 
@@ -228,10 +361,26 @@ def commit_draft(
         content_hash=draft.get("content_hash"),
     )
 
-    _DRAFTS.pop(draft_id, None)
+    drafts.get_store().delete(db, draft_id)
     return report
 
 
+def commit_parsed_draft(db: Session, *, draft_id: str) -> MedicalReport:
+    """Commit a draft exactly as vision parsed it, without user edits."""
+    draft = get_draft(db, draft_id)
+    if not draft:
+        raise ValueError("draft not found or expired")
+    return commit_draft(
+        db,
+        draft_id=draft_id,
+        report_type=draft["report_type"],
+        report_type_label=draft["report_type_label"],
+        report_date=draft["report_date"],
+        hospital=draft["hospital"],
+        metrics=draft["metrics"],
+    )
+
+
 def create_report(
     db: Session,
     *,
@@ -252,15 +401,7 @@ def create_report(
         report_date_override=report_date_override,
         hospital_override=hospital_override,
     )
-    return commit_draft(
-        db,
-        draft_id=draft["draft_id"],
-        report_type=draft["report_type"],
-        report_type_label=draft["report_type_label"],
-        report_date=draft["report_date"],
-        hospital=draft["hospital"],
-        metrics=draft["metrics"],
-    )
+    return commit_parsed_draft(db, draft_id=draft["draft_id"])
 
 
 def delete_report(db: Session, *, report_id: int) -> bool:
@@ -272,35 +413,30 @@ def delete_report(db: Session, *, report_id: int) -> bool:
     if not report:
         return False
 
-    paths = report.image_paths or ([report.image_path] if report.image_path else [])
-    for rel in paths:
-        abs_p = storage.abs_path(rel)
-        if os.path.exists(abs_p):
-            os.remove(abs_p)
+    _remove_images(report.image_paths or ([report.image_path] if report.image_path else []))
 
     db.delete(report)
     db.commit()
     return True
 
 
-def reparse_report(db: Session, *, report_id: int) -> MedicalReport | None:
-    """Re-run vision on a stored report's first image and refresh its
+def reparse_report(db: Session, *, report_id: int, fresh: bool = False) -> MedicalReport | None:
+    """Re-run vision on all of a stored report's images and refresh its
     metrics/type/date/status. Returns None if the report does not exist.
-    Used to recover from transient parse failures without re-uploading.
+    Used to recover from transient parse failures without re-uploading;
+    fresh=True skips the vision reply cache.
     """
     report = db.get(MedicalReport, report_id)
     if not report:
         return None
 
-    abs_p = storage.abs_path(report.image_path)
-    with open(abs_p, "rb") as f:
-        image_bytes = f.read()
-
-    parsed, raw_text = vision.parse_report_image(image_bytes)
+    vision_kwargs = {"use_cache": False} if fresh else {}
+    parsed, raw_text = _parse_pages(report.image_paths or [report.image_path], **vision_kwargs)
 
     report.metrics.clear()
     for m in parsed["metrics"]:
         report.metrics.append(MedicalReportMetric(**m))
+    report.abnormal_count = _count_abnormal(report.metrics)
     report.report_type = parsed["report_type"] or "unknown"
     report.report_type_label = parsed["report_type_label"]
     parsed_date = _parse_date(parsed["report_date"])
@@ -308,6 +444,7 @@ def reparse_report(db: Session, *, report_id: int) -> MedicalReport | None:
         report.report_date = parsed_date
     report.raw_json = raw_text
     report.status = "parsed" if parsed["metrics"] else "failed"
+    mapping.map_report_metrics(db, report=report)
 
     db.commit()
     db.refresh(report)
@@ -350,7 +487,9 @@ def update_report(
         )
         if norm:
             report.metrics.append(MedicalReportMetric(**norm))
+    report.abnormal_count = _count_abnormal(report.metrics)
     report.status = "parsed" if report.metrics else report.status
+    mapping.map_report_metrics(db, report=report)
 
     db.commit()
     db.refresh(report)
@@ -412,6 +551,43 @@ def list_acl_grants(db: Session, *, owner_user_id: int) -> list[MedicalAclGrant]
     )
 
 
+def _acl_snapshot(db: Session, *, actor_user_id: int) -> tuple[tuple[int, ...], dict[int, list]]:
+    """The actor's active family members and every grant made to the actor.
+
+    Two queries on a miss however big the family is; cached per actor and
+    cleared whenever a membership or grant is written.
+    """
+    key = (identity_cache.bind_key(db), actor_user_id)
+    cached = _acl_snapshots.get(key)
+    if cached is not None:
+        return cached
+
+    actor_family_id = (
+        db.query(FamilyMembership.family_id)
+        .filter(FamilyMembership.user_id == actor_user_id, FamilyMembership.is_active.is_(True))
+        .limit(1)
+        .scalar_subquery()
+    )
+    member_ids = tuple(
+        uid
+        for (uid,) in db.query(FamilyMembership.user_id)
+        .filter(
+            FamilyMembership.family_id == actor_family_id,
+            FamilyMembership.is_active.is_(True),
+        )
+        .all()
+    )
+    grants = {
+        owner_id: list(actions or [])
+        for owner_id, actions in db.query(MedicalAclGrant.owner_user_id, MedicalAclGrant.actions_json)
+        .filter(MedicalAclGrant.grantee_user_id == actor_user_id)
+        .all()
+    }
+    snapshot = (member_ids, grants)
+    _acl_snapshots.put(key, snapshot)
+    return snapshot
+
+
 def has_acl_action(
     db: Session,
     *,
@@ -423,25 +599,93 @@ def has_acl_action(
         return True
     if action not in MEDICAL_ACTIONS:
         return False
-    if not user_service.in_same_family(db, actor_user_id=actor_user_id, target_user_id=owner_user_id):
+    member_ids, grants = _acl_snapshot(db, actor_user_id=actor_user_id)
+    if actor_user_id not in member_ids or owner_user_id not in member_ids:
         return False
-
-    grant = (
-        db.query(MedicalAclGrant)
-        .filter(
-            MedicalAclGrant.owner_user_id == owner_user_id,
-            MedicalAclGrant.grantee_user_id == actor_user_id,
-        )
-        .first()
-    )
-    if not grant:
-        return True
-    actions = grant.actions_json or []
+    actions = grants.get(owner_user_id)
     if not actions:
         return True
     return action in actions
 
 
+def visible_owner_ids(db: Session, *, actor_user_id: int, action: str) -> list[int]:
+    """Bulk form of has_acl_action over the actor's whole family.
+
+    Returns the ids of active family members (always including the actor)
+    whose data the actor may `action`, from the same cached snapshot.
+    """
+    if action not in MEDICAL_ACTIONS:
+        return [actor_user_id]
+    member_ids, grants = _acl_snapshot(db, actor_user_id=actor_user_id)
+    visible = [
+        uid
+        for uid in member_ids
+        if uid == actor_user_id or not grants.get(uid) or action in grants[uid]
+    ]
+    if actor_user_id not in visible:
+        visible.append(actor_user_id)
+    return visible
+
+
+# Report list sort: undated last, then newest first; id breaks created_at ties
+# (server timestamps only have second resolution).
+REPORT_LIST_ORDER = (
+    MedicalReport.report_date.is_(None),
+    MedicalReport.report_date.desc(),
+    MedicalReport.created_at.desc(),
+    MedicalReport.id.desc(),
+)
+
+
+def encode_report_cursor(report: MedicalReport) -> str:
+    """Opaque keyset cursor holding the sort key of the last row on a page."""
+    payload = [
+        report.report_date.isoformat() if report.report_date else None,
+        report.created_at.isoformat() if report.created_at else None,
+        report.id,
+    ]
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def _decode_report_cursor(cursor: str) -> tuple[date | None, datetime | None, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        raw_date, raw_created, report_id = json.loads(raw)
+        return (
+            date.fromisoformat(raw_date) if raw_date else None,
+            datetime.fromisoformat(raw_created) if raw_created else None,
+            int(report_id),
+        )
+    except (ValueError, TypeError):
+        raise PikaException("invalid cursor", code=400)
+
+
+def reports_after_cursor(cursor: str):
+    """Filter for rows that sort strictly after the cursor in REPORT_LIST_ORDER."""
+    cursor_date, cursor_created, cursor_id = _decode_report_cursor(cursor)
+    # Compare created_at with the anchor row's stored value while it exists:
+    # SQLite keeps server timestamps as text without microseconds, so a bound
+    # datetime never compares equal to them. Fall back to the cursor's copy
+    # if the anchor report has since been deleted.
+    anchor = aliased(MedicalReport)
+    anchor_created = func.coalesce(
+        select(anchor.created_at).where(anchor.id == cursor_id).scalar_subquery(),
+        cursor_created,
+    )
+    later_same_date = or_(
+        MedicalReport.created_at < anchor_created,
+        and_(MedicalReport.created_at == anchor_created, MedicalReport.id < cursor_id),
+    )
+    if cursor_date is None:
+        return and_(MedicalReport.report_date.is_(None), later_same_date)
+    return or_(
+        MedicalReport.report_date.is_(None),
+        MedicalReport.report_date < cursor_date,
+        and_(MedicalReport.report_date == cursor_date, later_same_date),
+    )
+
+
 def _active_family_id(db: Session, *, user_id: int) -> int:
     membership = (
         db.query(FamilyMembership)
@@ -680,6 +924,13 @@ def _guess_category(item_name: str) -> str:
 
 
 def bootstrap_metric_dictionary(db: Session, *, owner_user_id: int) -> dict:
+    """Create dictionary entries and owner aliases for every distinct
+    (name, code, unit, hospital) in the owner's reports.
+
+    Set-based: one pass over the distinct rows, existing dictionary keys and
+    alias tuples preloaded into memory, new rows written with bulk INSERTs.
+    The first row seen for a canonical key names its dictionary entry.
+    """
     rows = (
         db.query(
             MedicalReportMetric.item_name,
@@ -688,71 +939,78 @@ def bootstrap_metric_dictionary(db: Session, *, owner_user_id: int) -> dict:
             MedicalReport.hospital,
         )
         .join(MedicalReport, MedicalReport.id == MedicalReportMetric.report_id)
-        .filter(
-            or_(
-                MedicalReport.subject_id == owner_user_id,
-                and_(MedicalReport.subject_id.is_(None), MedicalReport.uploader_id == owner_user_id),
-            )
-        )
+        .filter(mapping.owned_by(owner_user_id))
+        .distinct()
         .all()
     )
 
-    created_dictionary = 0
-    created_alias = 0
-
+    wanted: list[tuple[str, str, str | None, str | None]] = []
+    new_dictionary: dict[str, dict] = {}
     for item_name, item_code, unit, hospital in rows:
         clean_name = (item_name or "").strip()
         if not clean_name:
             continue
         canonical_key = ((item_code or "").strip() or clean_name).lower()
-        category_key = _guess_category(clean_name)
-
-        dic = (
-            db.query(MedicalMetricDictionary)
-            .filter(MedicalMetricDictionary.canonical_key == canonical_key)
-            .first()
+        wanted.append((canonical_key, clean_name, unit or None, hospital or None))
+        new_dictionary.setdefault(canonical_key, {
+            "canonical_key": canonical_key,
+            "canonical_name": clean_name,
+            "canonical_unit": unit or None,
+            "category_key": _guess_category(clean_name),
+            "enabled": True,
+        })
+
+    dictionary_ids: dict[str, int] = {}
+    keys = list(new_dictionary)
+    for start in range(0, len(keys), mapping.IN_CHUNK):
+        dictionary_ids.update(
+            db.query(MedicalMetricDictionary.canonical_key, MedicalMetricDictionary.id)
+            .filter(MedicalMetricDictionary.canonical_key.in_(keys[start:start + mapping.IN_CHUNK]))
+            .all()
         )
-        if dic is None:
-            dic = MedicalMetricDictionary(
-                canonical_key=canonical_key,
-                canonical_name=clean_name,
-                canonical_unit=(unit or None),
-                category_key=category_key,
-                enabled=True,
-            )
-            db.add(dic)
-            db.flush()
-            created_dictionary += 1
-
-        alias = (
-            db.query(MedicalMetricAlias)
-            .filter(
-                MedicalMetricAlias.owner_user_id == owner_user_id,
-                MedicalMetricAlias.dictionary_id == dic.id,
-                MedicalMetricAlias.alias_name == clean_name,
-                MedicalMetricAlias.alias_unit == (unit or None),
-                MedicalMetricAlias.hospital_hint == (hospital or None),
-            )
-            .first()
+    missing = [values for key, values in new_dictionary.items() if key not in dictionary_ids]
+    if missing:
+        dictionary_ids.update(
+            db.execute(
+                insert(MedicalMetricDictionary).returning(
+                    MedicalMetricDictionary.canonical_key, MedicalMetricDictionary.id
+                ),
+                missing,
+            ).all()
         )
-        if alias is None:
-            db.add(
-                MedicalMetricAlias(
-                    owner_user_id=owner_user_id,
-                    dictionary_id=dic.id,
-                    alias_name=clean_name,
-                    alias_unit=(unit or None),
-                    hospital_hint=(hospital or None),
-                    report_type_hint=None,
-                    priority=100 if hospital else 10,
-                )
-            )
-            created_alias += 1
+
+    existing_aliases = set(
+        db.query(
+            MedicalMetricAlias.dictionary_id,
+            MedicalMetricAlias.alias_name,
+            MedicalMetricAlias.alias_unit,
+            MedicalMetricAlias.hospital_hint,
+        )
+        .filter(MedicalMetricAlias.owner_user_id == owner_user_id)
+        .all()
+    )
+    new_aliases = []
+    for canonical_key, clean_name, unit, hospital in wanted:
+        alias_tuple = (dictionary_ids[canonical_key], clean_name, unit, hospital)
+        if alias_tuple in existing_aliases:
+            continue
+        existing_aliases.add(alias_tuple)
+        new_aliases.append({
+            "owner_user_id": owner_user_id,
+            "dictionary_id": alias_tuple[0],
+            "alias_name": clean_name,
+            "alias_unit": unit,
+            "hospital_hint": hospital,
+            "report_type_hint": None,
+            "priority": 100 if hospital else 10,
+        })
+    if new_aliases:
+        db.execute(insert(MedicalMetricAlias), new_aliases)
 
     db.commit()
     return {
-        "dictionary_created": created_dictionary,
-        "alias_created": created_alias,
+        "dictionary_created": len(missing),
+        "alias_created": len(new_aliases),
     }
 
 
@@ -821,6 +1079,8 @@ def create_metric_alias(
         priority=priority,
     )
     db.add(row)
+    db.flush()
+    mapping.remap_alias_names(db, owner_user_id=owner_user_id, names=[row.alias_name], alias_id=row.id)
     db.commit()
     db.refresh(row)
     return row
@@ -847,6 +1107,7 @@ def update_metric_alias(
     if row is None:
         raise ValueError("alias not found")
 
+    old_name = row.alias_name
     if alias_name is not None:
         clean_name = alias_name.strip()
         if not clean_name:
@@ -859,6 +1120,8 @@ def update_metric_alias(
     if priority is not None:
         row.priority = priority
 
+    db.flush()
+    mapping.remap_alias_names(db, owner_user_id=owner_user_id, names=[old_name, row.alias_name], alias_id=row.id)
     db.commit()
     db.refresh(row)
     return row
@@ -876,70 +1139,96 @@ def delete_metric_alias(db: Session, *, owner_user_id: int, alias_id: int) -> bo
     if row is None:
         return False
     db.delete(row)
+    db.flush()
+    mapping.remap_alias_names(db, owner_user_id=owner_user_id, names=[row.alias_name], alias_id=row.id)
     db.commit()
     return True
 
 
 def rebuild_metric_mappings(db: Session, *, owner_user_id: int) -> dict:
-    aliases = db.query(MedicalMetricAlias).filter(MedicalMetricAlias.owner_user_id == owner_user_id).all()
-    alias_by_name: dict[str, list[MedicalMetricAlias]] = {}
-    for alias in aliases:
-        alias_by_name.setdefault(alias.alias_name.strip().lower(), []).append(alias)
-
-    rows = (
-        db.query(MedicalReportMetric, MedicalReport)
-        .join(MedicalReport, MedicalReport.id == MedicalReportMetric.report_id)
-        .filter(
-            or_(
-                MedicalReport.subject_id == owner_user_id,
-                and_(MedicalReport.subject_id.is_(None), MedicalReport.uploader_id == owner_user_id),
+    """Re-evaluate all of the owner's metrics against their aliases. Commits
+    and edits keep mappings current already; this catches up after bulk
+    alias imports (bootstrap) and only writes mappings that changed."""
+    out = mapping.rebuild(db, owner_user_id=owner_user_id)
+    db.commit()
+    return out
+
+
+def _rederive_range(row) -> tuple | None:
+    """New (ref_low, ref_high, abnormal_flag) for a stored metric, or None
+    if nothing changes. Stored bounds are kept unless both are missing (they
+    may have been edited); a stored high/low/normal is kept like an explicit
+    model flag, so only "unknown" flags are re-derived."""
+    _, _, value_text, value_num, ref_range, ref_low, ref_high, flag = row
+    if ref_low is None and ref_high is None:
+        ref_low, ref_high = vision._parse_range(ref_range)
+    new_flag = vision._derive_flag(
+        value_num, ref_low, ref_high, flag, ref_range=ref_range, value_text=value_text
+    )
+    target = (ref_low, ref_high, new_flag)
+    return None if target == tuple(row[5:]) else target
+
+
+def backfill_reference_ranges(db: Session, *, batch_size: int = 1000) -> dict:
+    """Re-parse every stored reference range with the current grammar and
+    re-derive the flags it now decides. Walks metrics by id in batches, one
+    executemany UPDATE of the changed rows per batch, committed per batch.
+    Then refreshes abnormal_count and the canonical-unit bounds of the
+    affected reports."""
+    scanned = 0
+    updated = 0
+    report_ids: set[int] = set()
+    last_id = 0
+    while True:
+        rows = db.execute(
+            select(
+                _METRICS.c.id,
+                _METRICS.c.report_id,
+                _METRICS.c.value_text,
+                _METRICS.c.value_num,
+                _METRICS.c.ref_range,
+                _METRICS.c.ref_low,
+                _METRICS.c.ref_high,
+                _METRICS.c.abnormal_flag,
+            )
+            .where(_METRICS.c.id > last_id)
+            .order_by(_METRICS.c.id)
+            .limit(batch_size)
+        ).all()
+        if not rows:
+            break
+        last_id = rows[-1][0]
+        scanned += len(rows)
+        changes = []
+        for row in rows:
+            target = _rederive_range(row)
+            if target is not None:
+                changes.append(dict(zip(("metric_id", "ref_low", "ref_high", "abnormal_flag"), (row[0], *target))))
+                report_ids.add(row[1])
+        if changes:
+            db.execute(_UPDATE_METRIC_RANGE, changes)
+            db.commit()
+            updated += len(changes)
+
+    owner_ids: set[int] = set()
+    ordered = sorted(report_ids)
+    for start in range(0, len(ordered), mapping.IN_CHUNK):
+        chunk = ordered[start:start + mapping.IN_CHUNK]
+        abnormal = (
+            select(func.count())
+            .where(
+                MedicalReportMetric.report_id == MedicalReport.id,
+                MedicalReportMetric.abnormal_flag.in_(ABNORMAL_FLAGS),
             )
+            .scalar_subquery()
         )
-        .all()
-    )
-
-    mapped = 0
-    unmapped = 0
-
-    for metric, report in rows:
-        key = (metric.item_name or "").strip().lower()
-        candidates = alias_by_name.get(key, [])
-        best: MedicalMetricAlias | None = None
-        best_score = -1
-        for candidate in candidates:
-            score = candidate.priority or 0
-            if candidate.alias_unit and metric.unit and candidate.alias_unit == metric.unit:
-                score += 10
-            if candidate.hospital_hint and report.hospital and candidate.hospital_hint == report.hospital:
-                score += 20
-            if score > best_score:
-                best = candidate
-                best_score = score
-
-        mapping = (
-            db.query(MedicalReportMetricMap)
-            .filter(MedicalReportMetricMap.report_metric_id == metric.id)
-            .first()
+        db.execute(
+            update(MedicalReport).where(MedicalReport.id.in_(chunk)).values(abnormal_count=abnormal),
+            execution_options={"synchronize_session": False},
         )
-        if mapping is None:
-            mapping = MedicalReportMetricMap(report_metric_id=metric.id)
-            db.add(mapping)
-
-        if best is None:
-            mapping.dictionary_id = None
-            mapping.alias_id = None
-            mapping.match_status = "unmapped"
-            mapping.confidence = None
-            unmapped += 1
-        else:
-            mapping.dictionary_id = best.dictionary_id
-            mapping.alias_id = best.id
-            mapping.match_status = "auto"
-            mapping.confidence = 1.0
-            mapped += 1
-
+        owner = func.coalesce(MedicalReport.subject_id, MedicalReport.uploader_id)
+        owner_ids.update(row[0] for row in db.query(owner).filter(MedicalReport.id.in_(chunk)).distinct())
+    for owner_id in sorted(owner_ids):
+        mapping.rebuild(db, owner_user_id=owner_id)
     db.commit()
-    return {
-        "mapped": mapped,
-        "unmapped": unmapped,
-    }
\ No newline at end of file
+    return {"scanned": scanned, "updated": updated, "reports": len(report_ids)}
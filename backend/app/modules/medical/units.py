@@ -0,0 +1,178 @@
+"""Lab unit registry: spelling normalization and linear conversion factors.
+
+Units are reduced to a canonical spelling ("μmol/L", "umol/l" and
+"µmol/L" are all "umol/l"), then looked up in a table of dimensions with a
+factor to that dimension's base unit. Conversions inside a dimension are
+pure ratios (g/dL -> g/L is x10). Mass <-> molar conversions need the
+analyte's molar mass, which is looked up by dictionary canonical key or
+name, so glucose in mg/dL converts to mmol/L but an unknown analyte in
+mg/dL does not.
+
+Everything here is pure and cached; mapping computes canonical values
+when it writes a metric map, so trends never convert per request.
+"""
+import re
+import unicodedata
+from functools import lru_cache
+
+MASS = "mass"  # base g/L
+MOLAR = "molar"  # base mol/L
+COUNT = "count"  # base per L
+ACTIVITY = "activity"  # base U/L
+FRACTION = "fraction"  # base 1
+
+# normalized spelling -> (dimension, factor to the dimension's base unit)
+UNITS: dict[str, tuple[str, float]] = {
+    "g/l": (MASS, 1.0),
+    "g/dl": (MASS, 10.0),
+    "mg/ml": (MASS, 1.0),
+    "mg/dl": (MASS, 1e-2),
+    "mg/l": (MASS, 1e-3),
+    "ug/ml": (MASS, 1e-3),
+    "ug/dl": (MASS, 1e-5),
+    "ug/l": (MASS, 1e-6),
+    "ng/ml": (MASS, 1e-6),
+    "ng/dl": (MASS, 1e-8),
+    "ng/l": (MASS, 1e-9),
+    "pg/ml": (MASS, 1e-9),
+    "mol/l": (MOLAR, 1.0),
+    "mmol/l": (MOLAR, 1e-3),
+    "umol/l": (MOLAR, 1e-6),
+    "nmol/l": (MOLAR, 1e-9),
+    "pmol/l": (MOLAR, 1e-12),
+    "/l": (COUNT, 1.0),
+    "/ul": (COUNT, 1e6),
+    "10^6/l": (COUNT, 1e6),
+    "10^9/l": (COUNT, 1e9),
+    "10^12/l": (COUNT, 1e12),
+    "10^3/ul": (COUNT, 1e9),
+    "10^6/ul": (COUNT, 1e12),
+    "u/l": (ACTIVITY, 1.0),
+    "ku/l": (ACTIVITY, 1e3),
+    "u/ml": (ACTIVITY, 1e3),
+    "mu/l": (ACTIVITY, 1e-3),
+    "mu/ml": (ACTIVITY, 1.0),
+    "uu/ml": (ACTIVITY, 1e-3),
+    "%": (FRACTION, 1e-2),
+    "l/l": (FRACTION, 1.0),
+}
+
+# Spellings that mean the same unit; applied after the generic folding.
+_SYNONYMS = {
+    "iu/l": "u/l",
+    "kiu/l": "ku/l",
+    "iu/ml": "u/ml",
+    "miu/l": "mu/l",
+    "miu/ml": "mu/ml",
+    "uiu/ml": "uu/ml",
+    "mcg/l": "ug/l",
+    "mcg/ml": "ug/ml",
+    "mcg/dl": "ug/dl",
+    "mmol/liter": "mmol/l",
+    "个/ul": "/ul",
+    "cells/ul": "/ul",
+    "10^3/mm3": "10^3/ul",
+    "/mm3": "/ul",
+    "g/100ml": "g/dl",
+    "mg/100ml": "mg/dl",
+}
+
+# g/mol, keyed by folded analyte key (dictionary canonical key or name).
+_GLUCOSE = 180.16
+_CREATININE = 113.12
+_UREA = 60.06
+_UREA_NITROGEN = 28.014
+_URIC_ACID = 168.11
+_CHOLESTEROL = 386.65
+_TRIGLYCERIDE = 885.7
+_BILIRUBIN = 584.66
+_CALCIUM = 40.08
+_MAGNESIUM = 24.305
+_PHOSPHATE = 30.97
+_IRON = 55.845
+MOLAR_MASSES: dict[str, float] = {
+    **dict.fromkeys(("glu", "glucose", "葡萄糖", "血糖", "空腹血糖", "空腹葡萄糖"), _GLUCOSE),
+    **dict.fromkeys(("cr", "crea", "creatinine", "肌酐", "血肌酐"), _CREATININE),
+    **dict.fromkeys(("urea", "尿素"), _UREA),
+    **dict.fromkeys(("bun", "尿素氮"), _UREA_NITROGEN),
+    **dict.fromkeys(("ua", "uric", "uricacid", "尿酸", "血尿酸"), _URIC_ACID),
+    **dict.fromkeys(
+        ("tc", "chol", "cholesterol", "总胆固醇", "hdl", "hdlc", "ldl", "ldlc",
+         "高密度脂蛋白胆固醇", "低密度脂蛋白胆固醇"),
+        _CHOLESTEROL,
+    ),
+    **dict.fromkeys(("tg", "trig", "triglyceride", "triglycerides", "甘油三酯"), _TRIGLYCERIDE),
+    **dict.fromkeys(
+        ("tbil", "dbil", "ibil", "bilirubin", "总胆红素", "直接胆红素", "间接胆红素"), _BILIRUBIN
+    ),
+    **dict.fromkeys(("ca", "calcium", "钙", "血钙"), _CALCIUM),
+    **dict.fromkeys(("mg", "magnesium", "镁", "血镁"), _MAGNESIUM),
+    **dict.fromkeys(("p", "phos", "phosphorus", "磷", "无机磷"), _PHOSPHATE),
+    **dict.fromkeys(("fe", "iron", "铁", "血清铁"), _IRON),
+}
+
+_SUPERSCRIPTS = str.maketrans("⁰¹²³⁴⁵⁶⁷⁸⁹", "0123456789")
+_SUPERSCRIPT_RUN = re.compile(r"[⁰¹²³⁴⁵⁶⁷⁸⁹]+")
+# "×10^9/L", "x10*9/L", "10E9/L", "10**9/L" -> "10^9/l"
+_POWER = re.compile(r"^(?:[x×*])?10(?:\^|\*\*|\*|e)(\d+)")
+_ANALYTE = re.compile(r"[^\w]+")
+
+
+@lru_cache(maxsize=1024)
+def normalize_unit(unit: str | None) -> str:
+    """Canonical spelling of a unit: micro signs as "u", powers of ten as
+    "10^n", lower case, no spaces. "" when there is no unit."""
+    if not unit:
+        return ""
+    text = _SUPERSCRIPT_RUN.sub(lambda m: "^" + m.group(0).translate(_SUPERSCRIPTS), unit)
+    text = unicodedata.normalize("NFKC", text).replace("μ", "u").replace("µ", "u")
+    text = "".join(text.split()).lower()
+    text = _POWER.sub(r"10^\1", text)
+    return _SYNONYMS.get(text, text)
+
+
+def _analyte_key(name: str | None) -> str:
+    return _ANALYTE.sub("", unicodedata.normalize("NFKC", name or "").casefold())
+
+
+def molar_mass(*names: str | None) -> float | None:
+    """Molar mass of the first name (canonical key, canonical name, ...)
+    the registry knows."""
+    for name in names:
+        mass = MOLAR_MASSES.get(_analyte_key(name))
+        if mass is not None:
+            return mass
+    return None
+
+
+@lru_cache(maxsize=4096)
+def factor(from_unit: str | None, to_unit: str | None, analyte: tuple[str | None, ...] = ()) -> float | None:
+    """Multiplier taking a value in from_unit to to_unit, or None when the
+    two aren't convertible (unknown unit, different dimension, or mass <->
+    molar without a known molar mass). Same spelling converts as 1.0, so
+    unitless metrics of a unitless dictionary entry pass through."""
+    source, target = normalize_unit(from_unit), normalize_unit(to_unit)
+    if source == target:
+        return 1.0
+    if source not in UNITS or target not in UNITS:
+        return None
+    (source_dim, source_factor), (target_dim, target_factor) = UNITS[source], UNITS[target]
+    if source_dim == target_dim:
+        return source_factor / target_factor
+    dims = {source_dim, target_dim}
+    if dims != {MASS, MOLAR}:
+        return None
+    mass = molar_mass(*analyte)
+    if mass is None:
+        return None
+    # g/L -> mol/L divides by g/mol.
+    to_base = source_factor / mass if source_dim == MASS else source_factor * mass
+    return to_base / target_factor
+
+
+def convert(value: float | None, ratio: float | None) -> float | None:
+    """value x ratio (a factor() result), rounded to 6 significant digits
+    so repeat conversions compare equal and float noise doesn't leak out."""
+    if value is None or ratio is None:
+        return None
+    return float(f"{value * ratio:.6g}")
@@ -1,22 +1,163 @@
 import base64
+import dataclasses
+import email.utils
 import json
+import logging
+import random
 import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 
+import httpx
+import openai
 from openai import AzureOpenAI
 
+from app.modules.medical import ranges, vision_cache
+from app.modules.medical.imaging import preprocess_for_vision
 from app.modules.medical.prompts import SYSTEM_PROMPT, build_user_prompt
 from app.settings import settings
 
+logger = logging.getLogger(__name__)
+
 _NUM_RE = re.compile(r"-?\d+(?:\.\d+)?")
-_RANGE_RE = re.compile(r"(-?\d+(?:\.\d+)?)\s*[-~–]\s*(-?\d+(?:\.\d+)?)")
+
+
+# Retried: rate limiting, server errors, and connection failures/timeouts.
+_RETRY_STATUS = {408, 409, 429}
+
+_client_instance: AzureOpenAI | None = None
+_client_lock = threading.Lock()
+_call_slots: threading.BoundedSemaphore | None = None
+_page_pool: ThreadPoolExecutor | None = None
 
 
 def _client() -> AzureOpenAI:
-    return AzureOpenAI(
-        azure_endpoint=settings.azure_openai_endpoint,
-        api_key=settings.azure_openai_api_key,
-        api_version=settings.azure_openai_api_version,
-    )
+    """Process-wide client, built on first use so import/startup stay cheap.
+
+    One keep-alive connection pool serves every parse (and every thread of
+    the parse/page pools), instead of a fresh pool + TLS handshake per call.
+    The SDK's own retries are off; _create_completion does them.
+    """
+    global _client_instance
+    if _client_instance is None:
+        with _client_lock:
+            if _client_instance is None:
+                timeout = httpx.Timeout(settings.vision_timeout, connect=settings.vision_connect_timeout)
+                _client_instance = AzureOpenAI(
+                    azure_endpoint=settings.azure_openai_endpoint,
+                    api_key=settings.azure_openai_api_key,
+                    api_version=settings.azure_openai_api_version,
+                    max_retries=0,
+                    timeout=timeout,
+                    http_client=httpx.Client(
+                        timeout=timeout,
+                        limits=httpx.Limits(
+                            max_connections=settings.vision_max_connections,
+                            max_keepalive_connections=settings.vision_max_connections,
+                        ),
+                    ),
+                )
+    return _client_instance
+
+
+def close_client() -> None:
+    global _client_instance
+    with _client_lock:
+        if _client_instance is not None:
+            _client_instance.close()
+            _client_instance = None
+
+
+def _get_call_slots() -> threading.BoundedSemaphore:
+    """One limit for every Azure call in the process, whichever thread makes
+    it (parse jobs, their pages, reparse), sized by settings.vision_concurrency."""
+    global _call_slots
+    if _call_slots is None:
+        with _client_lock:
+            if _call_slots is None:
+                _call_slots = threading.BoundedSemaphore(max(1, settings.vision_concurrency))
+    return _call_slots
+
+
+def page_executor() -> ThreadPoolExecutor:
+    """Process-wide pool the pages of multi-page reports are parsed on.
+
+    Shared by all reports rather than one pool each; the calls themselves
+    are still capped by _get_call_slots.
+    """
+    global _page_pool
+    if _page_pool is None:
+        with _client_lock:
+            if _page_pool is None:
+                _page_pool = ThreadPoolExecutor(
+                    max_workers=max(1, settings.vision_concurrency),
+                    thread_name_prefix="vision-page",
+                )
+    return _page_pool
+
+
+def shutdown() -> None:
+    global _page_pool
+    with _client_lock:
+        if _page_pool is not None:
+            _page_pool.shutdown(wait=False, cancel_futures=True)
+            _page_pool = None
+    close_client()
+
+
+def _is_retryable(exc: Exception) -> bool:
+    if isinstance(exc, openai.APIConnectionError):  # includes APITimeoutError
+        return True
+    if isinstance(exc, openai.APIStatusError):
+        return exc.status_code in _RETRY_STATUS or exc.status_code >= 500
+    return False
+
+
+def _retry_after(exc: Exception) -> float | None:
+    """Seconds the server asked us to wait (retry-after-ms / Retry-After), if any."""
+    response = getattr(exc, "response", None)
+    if response is None:
+        return None
+    headers = response.headers
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000
+        value = headers.get("retry-after")
+        if not value:
+            return None
+        try:
+            return float(value)
+        except ValueError:
+            when = email.utils.parsedate_to_datetime(value)
+            return max(0.0, when.timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def _retry_delay(attempt: int, exc: Exception) -> float:
+    """Server-provided delay if any, else full-jitter exponential backoff."""
+    cap = settings.vision_retry_max_delay
+    server_delay = _retry_after(exc)
+    if server_delay is not None:
+        return min(server_delay, cap)
+    return random.uniform(0, min(cap, settings.vision_retry_base_delay * (2 ** attempt)))
+
+
+def _create_completion(**kwargs):
+    attempt = 0
+    while True:
+        try:
+            # Held for the call only, not the backoff sleep below.
+            with _get_call_slots():
+                return _client().chat.completions.create(**kwargs)
+        except Exception as exc:
+            if attempt >= settings.vision_max_retries or not _is_retryable(exc):
+                raise
+            delay = _retry_delay(attempt, exc)
+            logger.warning("vision call failed (%s), retry %d in %.1fs", exc, attempt + 1, delay)
+            time.sleep(delay)
+            attempt += 1
 
 
 def _sniff_mime(image_bytes: bytes) -> str:
@@ -49,12 +190,11 @@ def _loads_lenient(text: str) -> dict:
 
 
 def _parse_range(ref_range: str | None) -> tuple[float | None, float | None]:
-    if not ref_range:
+    """(low, high) of a reference range; one-sided ranges leave a None."""
+    spec = ranges.parse(ref_range)
+    if spec is None:
         return None, None
-    m = _RANGE_RE.search(ref_range)
-    if m:
-        return float(m.group(1)), float(m.group(2))
-    return None, None
+    return spec.low, spec.high
 
 
 def _to_num(value: str | None) -> float | None:
@@ -64,17 +204,19 @@ def _to_num(value: str | None) -> float | None:
     return float(m.group(0)) if m else None
 
 
-def _derive_flag(value_num, ref_low, ref_high, given) -> str:
-    if given in ("high", "low", "normal", "unknown"):
-        if given != "unknown":
-            return given
-    if value_num is None or ref_low is None or ref_high is None:
-        return given or "unknown"
-    if value_num < ref_low:
-        return "low"
-    if value_num > ref_high:
-        return "high"
-    return "normal"
+def _derive_flag(value_num, ref_low, ref_high, given, *, ref_range=None, value_text=None) -> str:
+    """An explicit high/low/normal is kept; otherwise the flag is derived
+    from the bounds, with inclusiveness taken from ref_range ("<5" vs
+    "≤5") and qualitative ranges judged on value_text."""
+    if given in ("high", "low", "normal"):
+        return given
+    spec = ranges.parse(ref_range)
+    if spec is None:
+        spec = ranges.RefRange(low=ref_low, high=ref_high)
+    elif spec.expected is None:
+        # The bounds win over the text when they were edited apart.
+        spec = dataclasses.replace(spec, low=ref_low, high=ref_high)
+    return ranges.flag(spec, value_num=value_num, value_text=value_text) or given or "unknown"
 
 
 def _normalize_metric(raw: dict, seq: int) -> dict | None:
@@ -94,34 +236,67 @@ def _normalize_metric(raw: dict, seq: int) -> dict | None:
         "ref_range": ref_range,
         "ref_low": ref_low,
         "ref_high": ref_high,
-        "abnormal_flag": _derive_flag(value_num, ref_low, ref_high, raw.get("abnormal_flag")),
+        "abnormal_flag": _derive_flag(
+            value_num, ref_low, ref_high, raw.get("abnormal_flag"),
+            ref_range=ref_range, value_text=None if value is None else str(value),
+        ),
         "seq": seq,
     }
 
 
-def parse_report_image(image_bytes: bytes, *, category_candidates: list[str] | None = None) -> tuple[dict, str]:
+def parse_report_image(
+    image_bytes: bytes,
+    *,
+    category_candidates: list[str] | None = None,
+    use_cache: bool = True,
+) -> tuple[dict, str]:
     """Call GPT-4.5-mini vision and return (parsed dict, raw model text).
 
     parsed = {report_type, report_type_label, report_date, metrics:[...normalized...]}.
     Also includes is_lab_report (bool) and hospital (str|None).
+    Replies are cached by image + prompt (vision_cache); use_cache=False
+    forces a fresh call, whose reply still refreshes the cache.
     Raises on hard failure (caller decides to mark report failed but keep image)."""
-    resp = _client().chat.completions.create(
-        model=settings.azure_openai_deployment,
-        messages=[
-            {"role": "system", "content": SYSTEM_PROMPT},
-            {
-                "role": "user",
-                "content": [
-                    {"type": "text", "text": build_user_prompt(category_candidates)},
-                    {"type": "image_url", "image_url": {"url": _data_url(image_bytes)}},
-                ],
-            },
-        ],
-        response_format={"type": "json_object"},
-        temperature=0,
-    )
-    raw_text = resp.choices[0].message.content or ""
-    data = _loads_lenient(raw_text)
+    if settings.vision_preprocess:
+        image_bytes = preprocess_for_vision(image_bytes)
+    user_prompt = build_user_prompt(category_candidates)
+
+    cache = vision_cache.get_cache() if settings.vision_cache_enabled else None
+    key = None
+    raw_text = None
+    if cache is not None:
+        key = vision_cache.cache_key(
+            image_bytes,
+            model=settings.azure_openai_deployment,
+            system_prompt=SYSTEM_PROMPT,
+            user_prompt=user_prompt,
+        )
+        if use_cache:
+            raw_text = cache.get(key)
+
+    if raw_text is not None:
+        data = _loads_lenient(raw_text)
+    else:
+        resp = _create_completion(
+            model=settings.azure_openai_deployment,
+            messages=[
+                {"role": "system", "content": SYSTEM_PROMPT},
+                {
+                    "role": "user",
+                    "content": [
+                        {"type": "text", "text": user_prompt},
+                        {"type": "image_url", "image_url": {"url": _data_url(image_bytes)}},
+                    ],
+                },
+            ],
+            response_format={"type": "json_object"},
+            temperature=0,
+        )
+        raw_text = resp.choices[0].message.content or ""
+        data = _loads_lenient(raw_text)
+        # Only replies that parsed are worth replaying.
+        if cache is not None:
+            cache.put(key, raw_text)
 
     raw_metrics = data.get("metrics") or []
     metrics = []
@@ -139,3 +314,44 @@ def parse_report_image(image_bytes: bytes, *, category_candidates: list[str] | N
         "metrics": metrics,
     }
     return parsed, raw_text
+
+
+def _metric_keys(metric: dict) -> list[str]:
+    keys = [f"name:{metric['item_name'].strip().casefold()}"]
+    if metric.get("item_code"):
+        keys.append(f"code:{str(metric['item_code']).strip().casefold()}")
+    return keys
+
+
+def merge_pages(pages: list[dict]) -> dict:
+    """Merge per-page parse results of one multi-page report, in page order.
+
+    Header fields come from the first page that has them. A metric already
+    seen on an earlier page (same item_code or item_name, e.g. a repeated
+    header row) is dropped; seq is renumbered across pages.
+    """
+    merged = {
+        "is_lab_report": any(p.get("is_lab_report", True) for p in pages),
+        "report_type": "unknown",
+        "report_type_label": None,
+        "report_date": None,
+        "hospital": None,
+        "metrics": [],
+    }
+    for page in pages:
+        if merged["report_type"] == "unknown" and page.get("report_type") not in (None, "unknown"):
+            merged["report_type"] = page["report_type"]
+            merged["report_type_label"] = page.get("report_type_label")
+        for field in ("report_date", "hospital"):
+            if merged[field] is None and page.get(field):
+                merged[field] = page[field]
+
+    seen: set[str] = set()
+    for page in pages:
+        for metric in page.get("metrics") or []:
+            keys = _metric_keys(metric)
+            if seen.intersection(keys):
+                continue
+            seen.update(keys)
+            merged["metrics"].append({**metric, "seq": len(merged["metrics"])})
+    return merged
@@ -0,0 +1,141 @@
+"""On-disk cache of raw vision model replies.
+
+The same image set comes back through re-uploads after a failed commit,
+reparse and test reruns; each of those used to cost an identical Azure call.
+Entries are keyed by the sha256 of the exact image bytes sent (i.e. after
+preprocessing), the model deployment, and the full system + user prompt
+(which includes the category candidates), so editing a prompt or switching
+deployment naturally misses. The value is the raw model text, which
+parse_report_image re-normalizes on every hit.
+
+One file per entry under settings.vision_cache_dir, shared by every worker
+process. Reads bump the file's mtime; once the directory grows past
+vision_cache_max_bytes the oldest entries are deleted.
+"""
+import hashlib
+import os
+import threading
+import uuid
+
+from app.settings import settings
+
+# Evict down to this fraction of max_bytes so we don't rescan on every write.
+_EVICT_TARGET = 0.8
+
+
+def cache_key(image_bytes: bytes, *, model: str, system_prompt: str, user_prompt: str) -> str:
+    h = hashlib.sha256()
+    for part in (model, system_prompt, user_prompt):
+        h.update(part.encode())
+        h.update(b"\0")
+    h.update(hashlib.sha256(image_bytes).digest())
+    return h.hexdigest()
+
+
+class VisionCache:
+    def __init__(self, root: str, *, max_bytes: int) -> None:
+        self.root = root
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.evictions = 0
+        self._bytes: int | None = None
+        self._lock = threading.Lock()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, key[:2], f"{key}.txt")
+
+    def get(self, key: str) -> str | None:
+        path = self._path(key)
+        try:
+            with open(path, encoding="utf-8") as f:
+                text = f.read()
+            os.utime(path)
+        except FileNotFoundError:
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return text
+
+    def put(self, key: str, text: str) -> None:
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{uuid.uuid4().hex[:8]}.part"
+        data = text.encode("utf-8")
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        with self._lock:
+            # Overwriting a key (a use_cache=False refresh) replaces its old
+            # file; count only the difference.
+            try:
+                replaced = os.path.getsize(path)
+            except FileNotFoundError:
+                replaced = 0
+            os.replace(tmp_path, path)
+            self.writes += 1
+            if self._bytes is None:
+                self._bytes = self._scan_bytes()
+            else:
+                self._bytes += len(data) - replaced
+            if self._bytes > self.max_bytes:
+                self._evict()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "writes": self.writes,
+                "evictions": self.evictions,
+            }
+
+    def _entries(self) -> list[tuple[float, int, str]]:
+        entries = []
+        for dirpath, _, names in os.walk(self.root):
+            for name in names:
+                if not name.endswith(".txt"):
+                    continue
+                path = os.path.join(dirpath, name)
+                try:
+                    st = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, path))
+        return entries
+
+    def _scan_bytes(self) -> int:
+        return sum(size for _, size, _ in self._entries())
+
+    def _evict(self) -> None:
+        # Rescan rather than trust _bytes: other processes write here too.
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        target = self.max_bytes * _EVICT_TARGET
+        for _, size, path in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            self.evictions += 1
+        self._bytes = total
+
+
+_cache: VisionCache | None = None
+_cache_lock = threading.Lock()
+
+
+def get_cache() -> VisionCache:
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = VisionCache(settings.vision_cache_dir, max_bytes=settings.vision_cache_max_bytes)
+    return _cache
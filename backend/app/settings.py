@@ -28,6 +28,84 @@ class Settings(BaseSettings):
     avatar_dir: str = "./data/avatars"
     db_path: str = "./data/db/pika.db"
 
+    # SQLAlchemy URL, e.g. postgresql+psycopg://pika:secret@db/pika. Empty
+    # means the SQLite file at db_path. The pool options apply to server
+    # databases only (SQLite keeps SQLAlchemy's default file pool).
+    database_url: str = ""
+    db_pool_size: int = 5
+    db_max_overflow: int = 10
+    db_pool_timeout: float = 30.0
+    db_pool_recycle: int = 1800
+    db_pool_pre_ping: bool = True
+
+    # SQLite connection profile (applied on every new connection). Use
+    # journal_mode=delete if the DB file sits on a network share: WAL needs
+    # shared memory on the same host.
+    sqlite_journal_mode: str = "wal"
+    sqlite_synchronous: str = "normal"
+    sqlite_busy_timeout_ms: int = 5000
+    sqlite_cache_size_kb: int = 16 * 1024
+    sqlite_mmap_size: int = 128 * 1024 * 1024
+    sqlite_temp_store: str = "memory"
+    sqlite_foreign_keys: bool = True
+
+    # Serve the medical read endpoints from an AsyncSession (aiosqlite, or
+    # asyncpg for PostgreSQL) instead of the sync session in the threadpool.
+    async_db: bool = False
+
+    # Bounded pool for blocking work (SQLite, disk, vision) awaited from async endpoints.
+    blocking_workers: int = 4
+
+    # Draft parse jobs: worker count caps how many reports parse at once.
+    parse_workers: int = 2
+    parse_queue_limit: int = 50
+    # A draft still parsing this many seconds after upload, with no job in
+    # the polling process, is taken as orphaned (e.g. by a restart) and
+    # re-queued by the poll/commit endpoints.
+    parse_orphan_after: int = 600
+
+    # Draft store backend: "db" (shared by all workers, survives restarts) or "memory".
+    draft_store: str = "db"
+    # Hard caps (least-recently-used drafts are evicted) and sweeper period.
+    draft_max_count: int = 500
+    draft_max_bytes: int = 64 * 1024 * 1024
+    draft_sweep_interval: int = 60
+
+    # Image preprocessing before the vision call: EXIF rotation, shrink to
+    # vision_max_edge px, optional grayscale/autocontrast, re-encode as
+    # vision_image_format ("jpeg" or "webp") at vision_image_quality.
+    vision_preprocess: bool = True
+    vision_max_edge: int = 2048
+    vision_image_format: str = "jpeg"
+    vision_image_quality: int = 85
+    vision_grayscale: bool = False
+    vision_autocontrast: bool = False
+    # Azure vision calls in flight across the whole process (every parse job,
+    # page and reparse); multi-page reports share a page pool of this size.
+    vision_concurrency: int = 3
+
+    # Raw vision replies cached on disk by image + prompt; reparse?fresh=1 bypasses it.
+    vision_cache_enabled: bool = True
+    vision_cache_dir: str = "./data/cache/vision"
+    vision_cache_max_bytes: int = 64 * 1024 * 1024
+
+    # Shared Azure client: seconds per request / to connect, pooled connections,
+    # and our own retry on 429/5xx/timeouts (jittered backoff, honors Retry-After).
+    vision_timeout: float = 60.0
+    vision_connect_timeout: float = 5.0
+    vision_max_connections: int = 10
+    vision_max_retries: int = 3
+    vision_retry_base_delay: float = 0.5
+    vision_retry_max_delay: float = 20.0
+
+    # Seconds to reuse token -> user / membership / ACL lookups across requests;
+    # writes in this process invalidate immediately. 0 disables.
+    identity_cache_ttl: float = 30.0
+
+    # Lowest character-bigram similarity (0-1) at which a metric name that
+    # matches no alias exactly is still mapped, as "fuzzy".
+    mapping_fuzzy_min_score: float = 0.8
+
 
 @lru_cache
 def get_settings() -> Settings:
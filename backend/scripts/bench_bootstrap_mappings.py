@@ -0,0 +1,185 @@
+"""对比逐行查询与集合化的指标字典初始化（bootstrap）。
+
+需在 backend/ 目录下以模块方式运行（脚本导入 app 包，
+直接 python scripts/bench_bootstrap_mappings.py 会报 No module named 'app'）：
+
+    python -m scripts.bench_bootstrap_mappings --metrics 50000
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import random
+import shutil
+import tempfile
+import time
+
+from sqlalchemy import and_, create_engine, event, insert, or_, text
+from sqlalchemy.orm import Session
+
+from app.core import models_base  # noqa: F401
+from app.core.db import Base, apply_sqlite_pragmas
+from app.core.user import models as user_models  # noqa: F401
+from app.modules.medical import service
+from app.modules.medical.models import (
+    MedicalMetricAlias,
+    MedicalMetricDictionary,
+    MedicalReport,
+    MedicalReportMetric,
+)
+
+OWNER_ID = 1
+
+
+def legacy_bootstrap(db: Session, *, owner_user_id: int) -> dict:
+    """bootstrap_metric_dictionary as it was: two lookups per metric row.
+
+    Only correct on an autoflushing session: without autoflush the alias
+    lookup misses aliases added earlier in the loop, and a repeated
+    (name, unit, hospital) fails the unique constraint at commit.
+    """
+    rows = (
+        db.query(
+            MedicalReportMetric.item_name,
+            MedicalReportMetric.item_code,
+            MedicalReportMetric.unit,
+            MedicalReport.hospital,
+        )
+        .join(MedicalReport, MedicalReport.id == MedicalReportMetric.report_id)
+        .filter(
+            or_(
+                MedicalReport.subject_id == owner_user_id,
+                and_(MedicalReport.subject_id.is_(None), MedicalReport.uploader_id == owner_user_id),
+            )
+        )
+        .all()
+    )
+    created_dictionary = 0
+    created_alias = 0
+    for item_name, item_code, unit, hospital in rows:
+        clean_name = (item_name or "").strip()
+        if not clean_name:
+            continue
+        canonical_key = ((item_code or "").strip() or clean_name).lower()
+        dic = db.query(MedicalMetricDictionary).filter(MedicalMetricDictionary.canonical_key == canonical_key).first()
+        if dic is None:
+            dic = MedicalMetricDictionary(
+                canonical_key=canonical_key, canonical_name=clean_name, canonical_unit=(unit or None),
+                category_key=service._guess_category(clean_name), enabled=True,
+            )
+            db.add(dic)
+            db.flush()
+            created_dictionary += 1
+        alias = (
+            db.query(MedicalMetricAlias)
+            .filter(
+                MedicalMetricAlias.owner_user_id == owner_user_id,
+                MedicalMetricAlias.dictionary_id == dic.id,
+                MedicalMetricAlias.alias_name == clean_name,
+                MedicalMetricAlias.alias_unit == (unit or None),
+                MedicalMetricAlias.hospital_hint == (hospital or None),
+            )
+            .first()
+        )
+        if alias is None:
+            db.add(MedicalMetricAlias(
+                owner_user_id=owner_user_id, dictionary_id=dic.id, alias_name=clean_name,
+                alias_unit=(unit or None), hospital_hint=(hospital or None), report_type_hint=None,
+                priority=100 if hospital else 10,
+            ))
+            created_alias += 1
+    db.commit()
+    return {"dictionary_created": created_dictionary, "alias_created": created_alias}
+
+
+# name -> (function, session autoflush)
+IMPLEMENTATIONS = {
+    "legacy": (legacy_bootstrap, True),
+    "bulk": (service.bootstrap_metric_dictionary, False),
+}
+
+
+def _engine(path: str):
+    engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+    event.listen(engine, "connect", lambda conn, _: apply_sqlite_pragmas(conn))
+    return engine
+
+
+def _seed(path: str, *, metrics: int, names: int, hospitals: int, seed: int) -> None:
+    """One owner's history: `metrics` rows over ~10-item reports, drawn from
+    `names` distinct items with a couple of unit spellings each."""
+    rng = random.Random(seed)
+    per_report = 10
+    reports = -(-metrics // per_report)
+    engine = _engine(path)
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO users (id, openid, account_type, status) VALUES (1, 'bench', 'wechat', 'active')"))
+        conn.execute(insert(MedicalReport), [
+            {"id": i, "uploader_id": OWNER_ID, "subject_id": OWNER_ID, "report_type": "blood",
+             "hospital": f"医院{rng.randint(1, hospitals)}", "image_path": f"{i}.png", "status": "parsed",
+             "abnormal_count": 0}
+            for i in range(1, reports + 1)
+        ])
+        rows = []
+        for n in range(metrics):
+            k = rng.randint(1, names)
+            rows.append({
+                "report_id": n // per_report + 1, "item_name": f"指标{k}", "item_code": f"C{k}" if k % 3 else None,
+                "unit": rng.choice(("g/L", "mg/dL")) if k % 2 else "mmol/L", "value_num": rng.random() * 100,
+                "seq": n % per_report,
+            })
+        conn.execute(insert(MedicalReportMetric), rows)
+    engine.dispose()
+
+
+def run(name: str, seeded: str, workdir: str) -> dict:
+    path = os.path.join(workdir, f"{name}.db")
+    shutil.copyfile(seeded, path)
+    engine = _engine(path)
+    statements = 0
+
+    def count(*_):
+        nonlocal statements
+        statements += 1
+
+    event.listen(engine, "before_cursor_execute", count)
+    func, autoflush = IMPLEMENTATIONS[name]
+    with Session(engine, autoflush=autoflush) as db:
+        started = time.perf_counter()
+        out = func(db, owner_user_id=OWNER_ID)
+        elapsed = time.perf_counter() - started
+    engine.dispose()
+    return {"name": name, "seconds": elapsed, "statements": statements, **out}
+
+
+def _build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="对比逐行查询与集合化的指标字典初始化（bootstrap）")
+    parser.add_argument("--impl", choices=[*IMPLEMENTATIONS, "both"], default="both", help="实现")
+    parser.add_argument("--metrics", type=int, default=50_000, help="历史指标行数")
+    parser.add_argument("--names", type=int, default=400, help="不同指标名数量")
+    parser.add_argument("--hospitals", type=int, default=6, help="医院数量")
+    parser.add_argument("--seed", type=int, default=7, help="随机种子")
+    return parser
+
+
+def main() -> int:
+    args = _build_parser().parse_args()
+    names = list(IMPLEMENTATIONS) if args.impl == "both" else [args.impl]
+    with tempfile.TemporaryDirectory() as tmp:
+        seeded = os.path.join(tmp, "seed.db")
+        _seed(seeded, metrics=args.metrics, names=args.names, hospitals=args.hospitals, seed=args.seed)
+        print(f"{args.metrics} 条指标，{args.names} 个指标名，{args.hospitals} 家医院")
+        results = [run(name, seeded, tmp) for name in names]
+    for r in results:
+        print(
+            f"{r['name']:<6} {r['seconds']:.2f}s | SQL {r['statements']} 条 | "
+            f"新建字典 {r['dictionary_created']}，别名 {r['alias_created']}"
+        )
+    if len(results) == 2 and results[1]["seconds"] > 0:
+        print(f"加速 {results[0]['seconds'] / results[1]['seconds']:.1f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
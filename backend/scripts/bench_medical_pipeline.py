@@ -0,0 +1,186 @@
+"""离线压测上传→识别→入库全流程（使用本地模拟视觉接口）。
+
+需在 backend/ 目录下以模块方式运行（脚本导入 app 包，
+直接 python scripts/bench_medical_pipeline.py 会报 No module named 'app'）：
+
+    python -m scripts.bench_medical_pipeline --help
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import socket
+import tempfile
+import threading
+import time
+
+from scripts.mock_azure_vision import add_mock_arguments, config_from_args, create_app as create_mock_app
+
+MODES = ("upload", "draft")
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _start_mock(cfg) -> tuple[object, str]:
+    import uvicorn
+
+    port = _free_port()
+    server = uvicorn.Server(uvicorn.Config(create_mock_app(cfg), host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server, f"http://127.0.0.1:{port}"
+
+
+def _percentile(ordered: list[float], pct: float) -> float:
+    if not ordered:
+        return 0.0
+    idx = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[idx]
+
+
+def _fake_image(i: int) -> bytes:
+    """A phone-sized PNG, unique per upload so the duplicate check never short-circuits."""
+    import io
+
+    from PIL import Image, ImageDraw
+
+    img = Image.new("RGB", (2400, 1800), (240, 240, 236))
+    ImageDraw.Draw(img).text((100, 100), f"bench {i} {os.urandom(8).hex()}", fill=(0, 0, 0))
+    out = io.BytesIO()
+    img.save(out, format="PNG")
+    return out.getvalue()
+
+
+async def _run_load(app, *, token: str, mode: str, images: list[bytes], concurrency: int) -> tuple[list[float], dict]:
+    import httpx
+
+    latencies: list[float] = []
+    codes: dict = {}
+    sem = asyncio.Semaphore(concurrency)
+    headers = {"X-Pika-Token": token}
+
+    async def one(client, i: int) -> None:
+        async with sem:
+            started = time.perf_counter()
+            files = [("files" if mode == "draft" else "file", (f"{i}.png", images[i], "image/png"))]
+            if mode == "upload":
+                resp = await client.post("/api/medical/reports", files=files, headers=headers)
+                code = resp.json()["code"]
+            else:
+                resp = await client.post("/api/medical/report-drafts", files=files, headers=headers)
+                body = resp.json()
+                code = body["code"]
+                if code == 0:
+                    draft = body["data"]
+                    resp = await client.post(
+                        f"/api/medical/report-drafts/{draft['draft_id']}/commit",
+                        json={
+                            "report_type": draft["report_type"],
+                            "report_type_label": draft["report_type_label"],
+                            "report_date": draft["report_date"],
+                            "hospital": draft["hospital"],
+                            "metrics": draft["metrics"],
+                        },
+                        headers=headers,
+                    )
+                    code = resp.json()["code"]
+            latencies.append((time.perf_counter() - started) * 1000)
+            codes[code] = codes.get(code, 0) + 1
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=300) as client:
+        await asyncio.gather(*(one(client, i) for i in range(len(images))))
+    return latencies, codes
+
+
+def _build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="离线压测上传→识别→入库全流程（使用本地模拟视觉接口）")
+    parser.add_argument("--mode", choices=MODES, default="upload", help="upload=POST /reports；draft=草稿+提交")
+    parser.add_argument("--requests", type=int, default=50, help="总上传数")
+    parser.add_argument("--concurrency", type=int, default=8, help="并发上传数")
+    parser.add_argument("--parse-workers", type=int, default=None, help="覆盖 PARSE_WORKERS")
+    parser.add_argument("--vision-concurrency", type=int, default=None, help="覆盖 VISION_CONCURRENCY")
+    add_mock_arguments(parser)
+    return parser
+
+
+def main() -> int:
+    args = _build_parser().parse_args()
+    mock_server, endpoint = _start_mock(config_from_args(args))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # Settings are read at import time, so point everything at the temp
+        # dir and the mock before the app is imported. DATABASE_URL wins over
+        # DB_PATH, so blank it too, or a URL in .env would send the bench's
+        # create_all and inserts to the real database.
+        os.environ.update(
+            DATA_DIR=tmp,
+            DB_PATH=os.path.join(tmp, "db", "bench.db"),
+            DATABASE_URL="",
+            ASYNC_DB="false",
+            UPLOAD_DIR=os.path.join(tmp, "uploads"),
+            VISION_CACHE_ENABLED="false",
+            AZURE_OPENAI_ENDPOINT=endpoint,
+            AZURE_OPENAI_API_KEY="bench",
+            PARSE_QUEUE_LIMIT=str(max(args.requests, 50)),
+        )
+        if args.parse_workers:
+            os.environ["PARSE_WORKERS"] = str(args.parse_workers)
+        if args.vision_concurrency:
+            os.environ["VISION_CONCURRENCY"] = str(args.vision_concurrency)
+
+        from app.core import workers
+        from app.core.db import Base, SessionLocal, engine
+        from app.core.user import service as user_service
+        from app.core.user.models import User
+        from app.main import app
+        from app.modules.medical import jobs, service, vision
+        from app.settings import settings
+
+        Base.metadata.create_all(bind=engine)
+        db = SessionLocal()
+        user = User(openid="bench-openid", nickname="bench", role="admin", account_type="wechat", status="active")
+        db.add(user)
+        db.commit()
+        user_service.ensure_user_family(db, user=user)
+        service.list_user_categories(db, user_id=user.id)
+        db.close()
+
+        images = [_fake_image(i) for i in range(args.requests)]
+        started = time.perf_counter()
+        try:
+            latencies, codes = asyncio.run(
+                _run_load(app, token="bench-openid", mode=args.mode, images=images, concurrency=args.concurrency)
+            )
+        finally:
+            elapsed = time.perf_counter() - started
+            jobs.shutdown()
+            workers.shutdown()
+            vision.shutdown()
+            mock_server.should_exit = True
+
+    ordered = sorted(latencies)
+    stats = mock_server.config.app.state.stats
+    print(
+        f"模式 {args.mode}: {args.requests} 次上传, 并发 {args.concurrency}, "
+        f"parse_workers={settings.parse_workers}, vision_concurrency={settings.vision_concurrency}, "
+        f"模拟延迟 {args.distribution} {args.latency_ms:g}±{args.latency_jitter_ms:g}ms"
+    )
+    print(f"吞吐 {len(latencies) / elapsed:.2f} 次/秒 (总耗时 {elapsed:.1f}s)")
+    print(
+        f"延迟 p50 {_percentile(ordered, 50):.0f}ms p95 {_percentile(ordered, 95):.0f}ms "
+        f"p99 {_percentile(ordered, 99):.0f}ms max {ordered[-1] if ordered else 0:.0f}ms"
+    )
+    print(f"业务返回码: {dict(sorted(codes.items()))}")
+    print(f"模拟接口: 请求 {stats.requests}, 成功 {stats.ok}, 500 {stats.errors}, 429 {stats.rate_limited}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,146 @@
+"""对比逐条 ORM 与分块批量写入的映射重建（rebuild）。
+
+需在 backend/ 目录下以模块方式运行（脚本导入 app 包，
+直接 python scripts/bench_rebuild_mappings.py 会报 No module named 'app'）：
+
+    python -m scripts.bench_rebuild_mappings --metrics 50000
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import shutil
+import tempfile
+import time
+import tracemalloc
+
+from sqlalchemy import and_, event, or_
+from sqlalchemy.orm import Session
+
+from app.modules.medical import service
+from app.modules.medical.models import (
+    MedicalMetricAlias,
+    MedicalReport,
+    MedicalReportMetric,
+    MedicalReportMetricMap,
+)
+from scripts.bench_bootstrap_mappings import OWNER_ID, _engine, _seed
+
+
+def legacy_rebuild(db: Session, *, owner_user_id: int) -> dict:
+    """rebuild_metric_mappings as it was: ORM pairs for every metric, one
+    map lookup per metric, every map rewritten."""
+    aliases = db.query(MedicalMetricAlias).filter(MedicalMetricAlias.owner_user_id == owner_user_id).all()
+    alias_by_name: dict[str, list[MedicalMetricAlias]] = {}
+    for alias in aliases:
+        alias_by_name.setdefault(alias.alias_name.strip().lower(), []).append(alias)
+    rows = (
+        db.query(MedicalReportMetric, MedicalReport)
+        .join(MedicalReport, MedicalReport.id == MedicalReportMetric.report_id)
+        .filter(
+            or_(
+                MedicalReport.subject_id == owner_user_id,
+                and_(MedicalReport.subject_id.is_(None), MedicalReport.uploader_id == owner_user_id),
+            )
+        )
+        .all()
+    )
+    mapped = 0
+    unmapped = 0
+    for metric, report in rows:
+        best = None
+        best_score = -1
+        for candidate in alias_by_name.get((metric.item_name or "").strip().lower(), []):
+            score = candidate.priority or 0
+            if candidate.alias_unit and metric.unit and candidate.alias_unit == metric.unit:
+                score += 10
+            if candidate.hospital_hint and report.hospital and candidate.hospital_hint == report.hospital:
+                score += 20
+            if score > best_score:
+                best = candidate
+                best_score = score
+        mapping = db.query(MedicalReportMetricMap).filter(MedicalReportMetricMap.report_metric_id == metric.id).first()
+        if mapping is None:
+            mapping = MedicalReportMetricMap(report_metric_id=metric.id)
+            db.add(mapping)
+        if best is None:
+            mapping.dictionary_id, mapping.alias_id, mapping.match_status, mapping.confidence = None, None, "unmapped", None
+            unmapped += 1
+        else:
+            mapping.dictionary_id, mapping.alias_id, mapping.match_status, mapping.confidence = best.dictionary_id, best.id, "auto", 1.0
+            mapped += 1
+    db.commit()
+    return {"mapped": mapped, "unmapped": unmapped}
+
+
+IMPLEMENTATIONS = {
+    "legacy": legacy_rebuild,
+    "bulk": service.rebuild_metric_mappings,
+}
+
+
+def _timed(engine, func) -> dict:
+    statements = 0
+
+    def count(*_):
+        nonlocal statements
+        statements += 1
+
+    event.listen(engine, "before_cursor_execute", count)
+    tracemalloc.start()
+    started = time.perf_counter()
+    with Session(engine, autoflush=False) as db:
+        out = func(db, owner_user_id=OWNER_ID)
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    event.remove(engine, "before_cursor_execute", count)
+    return {"seconds": elapsed, "statements": statements, "peak_mb": peak / 1024 / 1024, **out}
+
+
+def run(name: str, seeded: str, workdir: str) -> list[dict]:
+    """First rebuild (every map new), then a second one with nothing to change."""
+    path = os.path.join(workdir, f"{name}.db")
+    shutil.copyfile(seeded, path)
+    engine = _engine(path)
+    try:
+        return [
+            {"name": name, "pass": label, **_timed(engine, IMPLEMENTATIONS[name])}
+            for label in ("首次", "重复")
+        ]
+    finally:
+        engine.dispose()
+
+
+def _build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="对比逐条 ORM 与分块批量写入的映射重建（rebuild）")
+    parser.add_argument("--impl", choices=[*IMPLEMENTATIONS, "both"], default="both", help="实现")
+    parser.add_argument("--metrics", type=int, default=50_000, help="历史指标行数")
+    parser.add_argument("--names", type=int, default=400, help="不同指标名数量")
+    parser.add_argument("--hospitals", type=int, default=6, help="医院数量")
+    parser.add_argument("--seed", type=int, default=7, help="随机种子")
+    return parser
+
+
+def main() -> int:
+    args = _build_parser().parse_args()
+    names = list(IMPLEMENTATIONS) if args.impl == "both" else [args.impl]
+    with tempfile.TemporaryDirectory() as tmp:
+        seeded = os.path.join(tmp, "seed.db")
+        _seed(seeded, metrics=args.metrics, names=args.names, hospitals=args.hospitals, seed=args.seed)
+        engine = _engine(seeded)
+        with Session(engine, autoflush=False) as db:
+            service.bootstrap_metric_dictionary(db, owner_user_id=OWNER_ID)
+        engine.dispose()
+        print(f"{args.metrics} 条指标，{args.names} 个指标名，{args.hospitals} 家医院（已 bootstrap）")
+        for name in names:
+            for r in run(name, seeded, tmp):
+                print(
+                    f"{r['name']:<6} {r['pass']} {r['seconds']:.2f}s | SQL {r['statements']} 条 | "
+                    f"内存峰值 {r['peak_mb']:.1f}MB | 映射 {r['mapped']} 未映射 {r['unmapped']}"
+                )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
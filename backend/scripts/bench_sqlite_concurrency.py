@@ -0,0 +1,173 @@
+"""对比 SQLite 默认配置与 WAL 配置下，长写事务期间的并发读。
+
+需在 backend/ 目录下以模块方式运行（脚本导入 app 包，
+直接 python scripts/bench_sqlite_concurrency.py 会报 No module named 'app'）：
+
+    python -m scripts.bench_sqlite_concurrency --help
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import tempfile
+import threading
+import time
+
+from sqlalchemy import create_engine, event, insert, text
+from sqlalchemy.exc import OperationalError
+
+from app.core import models_base  # noqa: F401
+from app.core.db import Base, apply_sqlite_pragmas
+from app.core.user import models as user_models  # noqa: F401
+from app.modules.medical import models  # noqa: F401
+from app.modules.medical.models import MedicalReport, MedicalReportMetric
+from app.settings import settings
+
+# "legacy" is what core/db.py used to get: SQLite's defaults.
+PROFILES = {
+    "legacy": {
+        "sqlite_journal_mode": "delete",
+        "sqlite_synchronous": "full",
+        "sqlite_cache_size_kb": 2000,
+        "sqlite_mmap_size": 0,
+        "sqlite_temp_store": "default",
+    },
+    "tuned": {},
+}
+
+_READ_SQL = text(
+    "SELECT count(*), sum(value_num) FROM medical_report_metrics WHERE report_id BETWEEN :lo AND :lo + 20"
+)
+
+
+def _engine(path: str):
+    engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+    event.listen(engine, "connect", lambda conn, _: apply_sqlite_pragmas(conn))
+    return engine
+
+
+def _seed(engine, reports: int) -> None:
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO users (id, openid, account_type, status) VALUES (1, 'bench', 'wechat', 'active')"))
+        conn.execute(insert(MedicalReport), [
+            {"id": i, "uploader_id": 1, "subject_id": 1, "report_type": "blood", "image_path": f"{i}.png",
+             "status": "parsed", "abnormal_count": 0}
+            for i in range(1, reports + 1)
+        ])
+        conn.execute(insert(MedicalReportMetric), [
+            {"report_id": i, "item_name": f"指标{k}", "item_code": f"C{k}", "value_num": float(k), "seq": k}
+            for i in range(1, reports + 1)
+            for k in range(5)
+        ])
+
+
+def _writer(engine, *, rows: int, batch: int, pause: float, done: threading.Event, out: dict) -> None:
+    """One long transaction, like bootstrap/rebuild mappings: many batched
+    inserts with a little Python work between them, committed at the end."""
+    started = time.perf_counter()
+    try:
+        with engine.begin() as conn:
+            for start in range(0, rows, batch):
+                conn.execute(insert(MedicalReportMetric), [
+                    {"report_id": 1 + (start + k) % 1000, "item_name": "写入", "item_code": "W",
+                     "value_num": 1.0, "seq": 100 + k}
+                    for k in range(min(batch, rows - start))
+                ])
+                time.sleep(pause)
+    finally:
+        out["write_s"] = time.perf_counter() - started
+        done.set()
+
+
+def _reader(engine, *, done: threading.Event, latencies: list[float], errors: list[str], seed: int) -> None:
+    i = seed
+    with engine.connect() as conn:
+        while not done.is_set():
+            started = time.perf_counter()
+            try:
+                conn.execute(_READ_SQL, {"lo": 1 + (i * 37) % 900}).one()
+                latencies.append((time.perf_counter() - started) * 1000)
+            except OperationalError as e:
+                errors.append(str(e.orig))
+            conn.rollback()
+            i += 1
+
+
+def _percentile(ordered: list[float], pct: float) -> float:
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))]
+
+
+def run_profile(name: str, *, readers: int, rows: int, batch: int, pause: float) -> dict:
+    saved = {key: getattr(settings, key) for key in PROFILES[name]}
+    for key, value in PROFILES[name].items():
+        setattr(settings, key, value)
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            engine = _engine(os.path.join(tmp, "bench.db"))
+            _seed(engine, 1000)
+            with engine.connect() as conn:
+                mode = conn.exec_driver_sql("PRAGMA journal_mode").scalar()
+
+            done = threading.Event()
+            latencies: list[float] = []
+            errors: list[str] = []
+            out: dict = {}
+            threads = [
+                threading.Thread(target=_reader, args=(engine,), kwargs={
+                    "done": done, "latencies": latencies, "errors": errors, "seed": r,
+                })
+                for r in range(readers)
+            ]
+            for t in threads:
+                t.start()
+            time.sleep(0.2)
+            _writer(engine, rows=rows, batch=batch, pause=pause, done=done, out=out)
+            for t in threads:
+                t.join()
+            engine.dispose()
+    finally:
+        for key, value in saved.items():
+            setattr(settings, key, value)
+
+    ordered = sorted(latencies)
+    return {
+        "profile": name,
+        "journal_mode": mode,
+        "write_s": out["write_s"],
+        "reads": len(latencies),
+        "errors": len(errors),
+        "p50": _percentile(ordered, 50),
+        "p99": _percentile(ordered, 99),
+        "max": ordered[-1] if ordered else 0.0,
+    }
+
+
+def _build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="对比 SQLite 默认配置与 WAL 配置下，长写事务期间的并发读")
+    parser.add_argument("--profile", choices=[*PROFILES, "both"], default="both", help="连接配置")
+    parser.add_argument("--readers", type=int, default=4, help="并发读线程数")
+    parser.add_argument("--rows", type=int, default=200_000, help="写事务插入行数")
+    parser.add_argument("--batch", type=int, default=2000, help="每批插入行数")
+    parser.add_argument("--pause-ms", type=float, default=5.0, help="批次之间的间隔（模拟映射计算）")
+    return parser
+
+
+def main() -> int:
+    args = _build_parser().parse_args()
+    names = list(PROFILES) if args.profile == "both" else [args.profile]
+    print(f"写事务 {args.rows} 行（每批 {args.batch}），读线程 {args.readers}，busy_timeout {settings.sqlite_busy_timeout_ms}ms")
+    for name in names:
+        r = run_profile(name, readers=args.readers, rows=args.rows, batch=args.batch, pause=args.pause_ms / 1000)
+        print(
+            f"{r['profile']:<7} journal={r['journal_mode']:<6} 写入 {r['write_s']:.2f}s | "
+            f"读取 {r['reads']} 次 ({r['reads'] / r['write_s']:.0f}/s), 失败 {r['errors']} 次, "
+            f"p50 {r['p50']:.2f}ms p99 {r['p99']:.2f}ms max {r['max']:.0f}ms"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,108 @@
+"""对比整块读取与流式写盘两种上传路径的内存峰值。
+
+需在 backend/ 目录下以模块方式运行（脚本导入 app 包，
+直接 python scripts/bench_upload_memory.py 会报 No module named 'app'）：
+
+    python -m scripts.bench_upload_memory --help
+"""
+from __future__ import annotations
+
+import argparse
+import hashlib
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import tracemalloc
+
+from app.core import storage
+from app.modules.medical import vision
+
+MODES = ("buffered", "streaming")
+
+
+def _upload_buffered(src_path: str) -> None:
+    """What the routers used to do: read the whole upload, hash it, write it,
+    then read it back for the vision data URL."""
+    with open(src_path, "rb") as f:
+        content = f.read()
+    hashlib.sha256(content).hexdigest()
+    rel = storage.save_image(content, "bench.jpg", "image/jpeg")
+    with open(storage.abs_path(rel), "rb") as f:
+        vision._data_url(f.read())
+
+
+def _upload_streaming(src_path: str) -> None:
+    """Current path: stream + hash into upload_dir, materialize once for vision."""
+    with open(src_path, "rb") as f:
+        rel, _, _ = storage.save_image_stream(f, "bench.jpg", "image/jpeg")
+    with open(storage.abs_path(rel), "rb") as f:
+        vision._data_url(f.read())
+
+
+def _max_rss_mb() -> float:
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes.
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+def run_mode(mode: str, *, size_mb: int, uploads: int) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        storage.settings.upload_dir = os.path.join(tmp, "uploads")
+        src_path = os.path.join(tmp, "src.jpg")
+        with open(src_path, "wb") as f:
+            for _ in range(size_mb):
+                f.write(os.urandom(1024 * 1024))
+
+        upload = _upload_buffered if mode == "buffered" else _upload_streaming
+        rss_before = _max_rss_mb()
+        tracemalloc.start()
+        peaks = []
+        for _ in range(uploads):
+            tracemalloc.reset_peak()
+            upload(src_path)
+            peaks.append(tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+
+    return {
+        "mode": mode,
+        "peak_alloc_mb": max(peaks) / (1024 * 1024),
+        "max_rss_mb": _max_rss_mb(),
+        "rss_growth_mb": _max_rss_mb() - rss_before,
+    }
+
+
+def _build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="对比整块读取与流式写盘两种上传路径的内存峰值")
+    parser.add_argument("--mode", choices=MODES + ("both",), default="both", help="测试的上传路径")
+    parser.add_argument("--size-mb", type=int, default=8, help="单张图片大小（MB）")
+    parser.add_argument("--uploads", type=int, default=5, help="每种模式上传次数")
+    return parser
+
+
+def main() -> int:
+    args = _build_parser().parse_args()
+    if args.mode == "both":
+        # One process per mode so ru_maxrss isn't shared between them.
+        for mode in MODES:
+            cmd = [
+                sys.executable, "-m", "scripts.bench_upload_memory",
+                "--mode", mode, "--size-mb", str(args.size_mb), "--uploads", str(args.uploads),
+            ]
+            rc = subprocess.call(cmd)
+            if rc:
+                return rc
+        return 0
+
+    out = run_mode(args.mode, size_mb=args.size_mb, uploads=args.uploads)
+    print(
+        f"{out['mode']:<10} 图片 {args.size_mb}MB x{args.uploads}: "
+        f"单次分配峰值 {out['peak_alloc_mb']:.1f}MB, "
+        f"进程峰值 RSS {out['max_rss_mb']:.1f}MB (+{out['rss_growth_mb']:.1f}MB)"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,153 @@
+"""本地桩服务上对比每次新建客户端与复用连接池的调用延迟。
+
+需在 backend/ 目录下以模块方式运行（脚本导入 app 包，
+直接 python scripts/bench_vision_client.py 会报 No module named 'app'）：
+
+    python -m scripts.bench_vision_client --help
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import ssl
+import statistics
+import subprocess
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from openai import AzureOpenAI
+
+from app.modules.medical import vision
+from app.settings import settings
+
+_REPLY = json.dumps(
+    {
+        "id": "bench",
+        "object": "chat.completion",
+        "created": 0,
+        "model": "stub",
+        "choices": [
+            {
+                "index": 0,
+                "finish_reason": "stop",
+                "message": {"role": "assistant", "content": '{"report_type": "blood", "metrics": []}'},
+            }
+        ],
+    }
+).encode()
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # One buffered write per response, no Nagle: otherwise delayed ACKs add
+    # ~40 ms to every keep-alive request and swamp what we're measuring.
+    wbufsize = 64 * 1024
+    disable_nagle_algorithm = True
+
+    def do_POST(self):  # noqa: N802
+        self.rfile.read(int(self.headers.get("content-length") or 0))
+        self.send_response(200)
+        self.send_header("content-type", "application/json")
+        self.send_header("content-length", str(len(_REPLY)))
+        self.end_headers()
+        self.wfile.write(_REPLY)
+
+    def log_message(self, *args):
+        pass
+
+
+def _self_signed_cert(tmp: str) -> tuple[str, str]:
+    cert, key = os.path.join(tmp, "cert.pem"), os.path.join(tmp, "key.pem")
+    subprocess.run(
+        [
+            "openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1",
+            "-keyout", key, "-out", cert, "-subj", "/CN=localhost",
+            "-addext", "subjectAltName=DNS:localhost,IP:127.0.0.1",
+        ],
+        check=True,
+        capture_output=True,
+    )
+    return cert, key
+
+
+def _start_stub(tls_files: tuple[str, str] | None) -> tuple[ThreadingHTTPServer, str]:
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _StubHandler)
+    scheme = "http"
+    if tls_files:
+        ctx = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        ctx.load_cert_chain(*tls_files)
+        server.socket = ctx.wrap_socket(server.socket, server_side=True)
+        scheme = "https"
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"{scheme}://localhost:{server.server_address[1]}"
+
+
+def _per_call_client() -> AzureOpenAI:
+    """The old vision._client(): a new client (and connection pool) every call."""
+    return AzureOpenAI(
+        azure_endpoint=settings.azure_openai_endpoint,
+        api_key=settings.azure_openai_api_key,
+        api_version=settings.azure_openai_api_version,
+    )
+
+
+def _measure(get_client, calls: int) -> list[float]:
+    latencies = []
+    for _ in range(calls):
+        started = time.perf_counter()
+        get_client().chat.completions.create(
+            model=settings.azure_openai_deployment,
+            messages=[{"role": "user", "content": "ping"}],
+        )
+        latencies.append((time.perf_counter() - started) * 1000)
+    return latencies
+
+
+def _summary(name: str, latencies: list[float]) -> str:
+    ordered = sorted(latencies)
+    p95 = ordered[max(0, int(len(ordered) * 0.95) - 1)]
+    return (
+        f"{name:<10} n={len(latencies)} mean {statistics.mean(latencies):.2f}ms "
+        f"p50 {statistics.median(latencies):.2f}ms p95 {p95:.2f}ms"
+    )
+
+
+def _build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="本地桩服务上对比每次新建客户端与复用连接池的调用延迟")
+    parser.add_argument("--calls", type=int, default=200, help="每种方式调用次数")
+    parser.add_argument("--no-tls", action="store_true", help="桩服务使用明文 HTTP（默认自签名 HTTPS，需要 openssl）")
+    return parser
+
+
+def main() -> int:
+    args = _build_parser().parse_args()
+    with tempfile.TemporaryDirectory() as tmp:
+        tls_files = None if args.no_tls else _self_signed_cert(tmp)
+        if tls_files:
+            # Both clients verify against the stub's self-signed cert.
+            os.environ["SSL_CERT_FILE"] = tls_files[0]
+        server, endpoint = _start_stub(tls_files)
+        settings.azure_openai_endpoint = endpoint
+        settings.azure_openai_api_key = settings.azure_openai_api_key or "bench"
+        vision.close_client()
+        try:
+            # Warm up imports / first connection so neither side pays for them.
+            _measure(vision._client, 3)
+            per_call = _measure(_per_call_client, args.calls)
+            pooled = _measure(vision._client, args.calls)
+        finally:
+            vision.close_client()
+            server.shutdown()
+
+    print(f"桩服务: {endpoint}")
+    print(_summary("per-call", per_call))
+    print(_summary("pooled", pooled))
+    print(f"每次调用节省 {statistics.mean(per_call) - statistics.mean(pooled):.2f}ms（连接建立/握手）")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
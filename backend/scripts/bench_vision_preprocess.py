@@ -0,0 +1,126 @@
+"""对比预处理前后发送给视觉模型的图片体积、耗时与识别一致性。
+
+需在 backend/ 目录下以模块方式运行（脚本导入 app 包，
+直接 python scripts/bench_vision_preprocess.py 会报 No module named 'app'）：
+
+    python -m scripts.bench_vision_preprocess --help
+"""
+from __future__ import annotations
+
+import argparse
+import base64
+import io
+import statistics
+import time
+from pathlib import Path
+
+from app.modules.medical import imaging, vision
+from app.settings import settings
+
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".webp", ".bmp", ".tif", ".tiff"}
+
+
+def _synthetic_report() -> bytes:
+    """A 4000x3000 'photo' of a lab sheet, for runs without sample images."""
+    from PIL import Image, ImageDraw
+
+    img = Image.new("RGB", (4000, 3000), (236, 232, 225))
+    draw = ImageDraw.Draw(img)
+    for row in range(60):
+        y = 120 + row * 45
+        draw.text((200, y), f"ITEM{row:02d}  检验项目 {row}", fill=(20, 20, 20))
+        draw.text((1800, y), f"{row * 1.7:.2f}", fill=(20, 20, 20))
+        draw.text((2600, y), "3.50-9.50  10^9/L", fill=(20, 20, 20))
+    noise = Image.effect_noise(img.size, 12).convert("RGB")
+    img = Image.blend(img, noise, 0.08)
+    out = io.BytesIO()
+    img.save(out, format="JPEG", quality=95)
+    return out.getvalue()
+
+
+def _load_samples(folder: Path | None) -> list[tuple[str, bytes]]:
+    if folder is None:
+        return [("synthetic.jpg", _synthetic_report())]
+    return [
+        (p.name, p.read_bytes())
+        for p in sorted(folder.iterdir())
+        if p.is_file() and p.suffix.lower() in IMAGE_EXTENSIONS
+    ]
+
+
+def _metric_keys(parsed: dict) -> set[tuple[str, str | None]]:
+    return {(m["item_name"], m.get("value_text")) for m in parsed.get("metrics") or []}
+
+
+def _timed_parse(image_bytes: bytes, *, preprocess: bool) -> tuple[dict, float]:
+    settings.vision_preprocess = preprocess
+    started = time.perf_counter()
+    parsed, _ = vision.parse_report_image(image_bytes)
+    return parsed, time.perf_counter() - started
+
+
+def _build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="对比预处理前后发送给视觉模型的图片体积、耗时与识别一致性")
+    parser.add_argument("--folder", default=None, help="样例图片目录；不填则使用合成图片")
+    parser.add_argument("--max-edge", type=int, default=settings.vision_max_edge, help="最长边像素")
+    parser.add_argument("--format", choices=("jpeg", "webp"), default=settings.vision_image_format, help="重新编码格式")
+    parser.add_argument("--quality", type=int, default=settings.vision_image_quality, help="编码质量")
+    parser.add_argument("--grayscale", action="store_true", help="转灰度")
+    parser.add_argument("--autocontrast", action="store_true", help="自动对比度")
+    parser.add_argument(
+        "--call-azure",
+        action="store_true",
+        help="实际调用 Azure，对比延迟与指标一致性（消耗 token；本次运行不读写视觉缓存，每次都真实调用）",
+    )
+    return parser
+
+
+def main() -> int:
+    args = _build_parser().parse_args()
+    folder = Path(args.folder).expanduser().resolve() if args.folder else None
+    samples = _load_samples(folder)
+    if not samples:
+        print("目录中没有图片")
+        return 1
+
+    settings.vision_max_edge = args.max_edge
+    settings.vision_image_format = args.format
+    settings.vision_image_quality = args.quality
+    settings.vision_grayscale = args.grayscale
+    settings.vision_autocontrast = args.autocontrast
+    # Cached replies would turn a repeat run's latencies into cache hits.
+    settings.vision_cache_enabled = False
+
+    ratios, prep_ms = [], []
+    for name, original in samples:
+        started = time.perf_counter()
+        processed = imaging.preprocess_for_vision(original)
+        elapsed = (time.perf_counter() - started) * 1000
+        prep_ms.append(elapsed)
+        orig_b64 = len(base64.b64encode(original))
+        new_b64 = len(base64.b64encode(processed))
+        ratios.append(new_b64 / orig_b64)
+        line = (
+            f"{name}: payload {orig_b64 / 1024:.0f}KB -> {new_b64 / 1024:.0f}KB "
+            f"({new_b64 / orig_b64:.0%}), 预处理 {elapsed:.0f}ms"
+        )
+        if args.call_azure:
+            before, t_before = _timed_parse(original, preprocess=False)
+            after, t_after = _timed_parse(original, preprocess=True)
+            base = _metric_keys(before)
+            agree = len(base & _metric_keys(after)) / len(base) if base else 1.0
+            line += (
+                f", 延迟 {t_before:.1f}s -> {t_after:.1f}s, "
+                f"指标 {len(before['metrics'])} -> {len(after['metrics'])}, 一致率 {agree:.0%}"
+            )
+        print(line)
+
+    print(
+        f"共 {len(samples)} 张: payload 中位比例 {statistics.median(ratios):.0%}, "
+        f"预处理中位耗时 {statistics.median(prep_ms):.0f}ms"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,40 @@
+"""按当前参考范围语法重新解析已有指标的参考范围并补算异常标记。
+
+需在 backend/ 目录下以模块方式运行（脚本导入 app 包，
+直接 python scripts/medical_backfill_ranges.py 会报 No module named 'app'）：
+
+    python -m scripts.medical_backfill_ranges --batch-size 1000
+"""
+from __future__ import annotations
+
+import argparse
+
+from app.core.db import SessionLocal
+from app.modules.medical import service
+
+
+def _build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        description="按当前参考范围语法重新解析已有指标的参考范围并补算异常标记"
+    )
+    parser.add_argument("--batch-size", type=int, default=1000, help="每批处理的指标行数")
+    return parser
+
+
+def main() -> int:
+    args = _build_parser().parse_args()
+    db = SessionLocal()
+    try:
+        out = service.backfill_reference_ranges(db, batch_size=args.batch_size)
+    except Exception as exc:  # noqa: BLE001
+        print(f"执行失败: {exc}")
+        return 1
+    finally:
+        db.close()
+    print(f"扫描指标: {out['scanned']}")
+    print(f"已更新: {out['updated']}（涉及报告 {out['reports']} 份）")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
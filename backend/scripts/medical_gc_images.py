@@ -0,0 +1,89 @@
+"""清理未被任何报告/草稿引用的检查单图片。
+
+需在 backend/ 目录下以模块方式运行（脚本导入 app 包，
+直接 python scripts/medical_gc_images.py 会报 No module named 'app'）：
+
+    python -m scripts.medical_gc_images            # dry-run
+    python -m scripts.medical_gc_images --apply
+"""
+from __future__ import annotations
+
+import argparse
+from datetime import timedelta
+
+from app.core.db import SessionLocal
+from app.modules.medical import image_gc
+
+
+def _format_bytes(n: int) -> str:
+    size = float(n)
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024 or unit == "GB":
+            return f"{size:.1f}{unit}" if unit != "B" else f"{int(size)}B"
+        size /= 1024
+    return f"{n}B"
+
+
+def _print_report(report: image_gc.GcReport, *, verbose: bool) -> None:
+    mode = "dry-run" if report.dry_run else report.action
+    print(f"模式: {mode}")
+    print(f"扫描文件: {report.scanned}")
+    print(f"仍被引用: {report.referenced}")
+    print(f"宽限期内跳过: {report.too_recent}")
+    print(f"孤儿文件: {report.orphans} ({_format_bytes(report.orphan_bytes)})")
+    if report.dry_run:
+        print(f"可回收: {_format_bytes(report.orphan_bytes)}")
+    else:
+        print(f"已处理: {report.removed} ({_format_bytes(report.removed_bytes)})")
+    if verbose:
+        for rel in report.orphan_paths:
+            print(f"  {rel}")
+
+
+def _build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="清理未被任何报告/草稿引用的检查单图片")
+    parser.add_argument(
+        "--action",
+        choices=image_gc.ACTIONS,
+        default="quarantine",
+        help="quarantine=移入 uploads 下的 .quarantine 目录；delete=直接删除",
+    )
+    parser.add_argument("--apply", action="store_true", help="实际执行；默认仅 dry-run 统计可回收空间")
+    parser.add_argument(
+        "--grace-minutes",
+        type=int,
+        default=int(image_gc.DEFAULT_GRACE.total_seconds() // 60),
+        help="修改时间在此之内的文件不处理（分钟）",
+    )
+    parser.add_argument("--batch-size", type=int, default=200, help="每批处理的文件数")
+    parser.add_argument("--limit", type=int, default=None, help="本次最多处理 N 个孤儿文件")
+    parser.add_argument("--verbose", action="store_true", help="列出孤儿文件路径")
+    return parser
+
+
+def main() -> int:
+    parser = _build_parser()
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        report = image_gc.collect_orphan_images(
+            db,
+            dry_run=not args.apply,
+            action=args.action,
+            grace=timedelta(minutes=args.grace_minutes),
+            batch_size=args.batch_size,
+            limit=args.limit,
+        )
+    except Exception as exc:  # noqa: BLE001
+        print(f"执行失败: {exc}")
+        return 1
+    finally:
+        db.close()
+
+    _print_report(report, verbose=bool(args.verbose))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,53 @@
+"""重建指标映射（含标准单位换算值），用于升级后回填或调整单位表之后。
+
+需在 backend/ 目录下以模块方式运行（脚本导入 app 包，
+直接 python scripts/medical_remap_metrics.py 会报 No module named 'app'）：
+
+    python -m scripts.medical_remap_metrics [--owner USER_ID ...]
+"""
+from __future__ import annotations
+
+import argparse
+
+from sqlalchemy import func
+
+from app.core.db import SessionLocal
+from app.modules.medical import service
+from app.modules.medical.models import MedicalReport
+
+
+def _owner_ids(db, only: list[int] | None) -> list[int]:
+    if only:
+        return sorted(set(only))
+    owner = func.coalesce(MedicalReport.subject_id, MedicalReport.uploader_id)
+    return [row[0] for row in db.query(owner).distinct().order_by(owner).all()]
+
+
+def _build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        description="重建指标映射（含标准单位换算值），用于升级后回填或调整单位表之后"
+    )
+    parser.add_argument("--owner", type=int, action="append", default=None, help="只处理指定用户，可重复")
+    return parser
+
+
+def main() -> int:
+    args = _build_parser().parse_args()
+    db = SessionLocal()
+    try:
+        total_changed = 0
+        for owner_id in _owner_ids(db, args.owner):
+            out = service.rebuild_metric_mappings(db, owner_user_id=owner_id)
+            total_changed += out["changed"]
+            print(f"用户 {owner_id}: 映射 {out['mapped']} 未映射 {out['unmapped']} 更新 {out['changed']}")
+    except Exception as exc:  # noqa: BLE001
+        print(f"执行失败: {exc}")
+        return 1
+    finally:
+        db.close()
+    print(f"共更新 {total_changed} 条映射")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
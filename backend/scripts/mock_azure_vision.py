@@ -0,0 +1,210 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import hashlib
+import json
+import math
+import random
+import time
+from dataclasses import dataclass
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+# Canned replies in the shape SYSTEM_PROMPT asks for; picked per image so the
+# same upload always gets the same report.
+CANNED_REPORTS = [
+    {
+        "is_lab_report": True,
+        "report_type": "blood_routine",
+        "report_type_label": "血常规",
+        "report_date": "2026-05-30",
+        "hospital": "北京协和医院",
+        "metrics": [
+            {"item_name": "白细胞计数", "item_code": "WBC", "value": "6.2", "unit": "10^9/L", "ref_range": "3.5-9.5", "abnormal_flag": "normal"},
+            {"item_name": "红细胞计数", "item_code": "RBC", "value": "4.1", "unit": "10^12/L", "ref_range": "4.3-5.8", "abnormal_flag": "low"},
+            {"item_name": "血红蛋白", "item_code": "HGB", "value": "128", "unit": "g/L", "ref_range": "130-175", "abnormal_flag": "low"},
+            {"item_name": "血小板计数", "item_code": "PLT", "value": "210", "unit": "10^9/L", "ref_range": "125-350", "abnormal_flag": "normal"},
+        ],
+    },
+    {
+        "is_lab_report": True,
+        "report_type": "liver_function",
+        "report_type_label": "肝功能",
+        "report_date": "2026-06-12",
+        "hospital": "上海瑞金医院",
+        "metrics": [
+            {"item_name": "谷丙转氨酶", "item_code": "ALT", "value": "52", "unit": "U/L", "ref_range": "9-50", "abnormal_flag": "high"},
+            {"item_name": "谷草转氨酶", "item_code": "AST", "value": "31", "unit": "U/L", "ref_range": "15-40", "abnormal_flag": "normal"},
+            {"item_name": "总胆红素", "item_code": "TBIL", "value": "12.4", "unit": "umol/L", "ref_range": "0-21", "abnormal_flag": "normal"},
+        ],
+    },
+    {
+        "is_lab_report": True,
+        "report_type": "electrolytes",
+        "report_type_label": "电解质",
+        "report_date": "2026-07-03",
+        "hospital": None,
+        "metrics": [
+            {"item_name": "钾", "item_code": "K", "value": "3.4", "unit": "mmol/L", "ref_range": "3.5-5.3", "abnormal_flag": "low"},
+            {"item_name": "钠", "item_code": "Na", "value": "140", "unit": "mmol/L", "ref_range": "137-147", "abnormal_flag": "normal"},
+        ],
+    },
+]
+
+LATENCY_DISTRIBUTIONS = ("fixed", "uniform", "normal", "lognormal")
+
+
+@dataclass
+class MockConfig:
+    latency_ms: float = 800.0
+    latency_jitter_ms: float = 200.0
+    distribution: str = "lognormal"
+    error_rate: float = 0.0
+    rate_limit_rate: float = 0.0
+    retry_after: float = 1.0
+    seed: int | None = None
+
+
+@dataclass
+class MockStats:
+    requests: int = 0
+    ok: int = 0
+    errors: int = 0
+    rate_limited: int = 0
+
+
+def sample_latency(cfg: MockConfig, rng: random.Random) -> float:
+    """Seconds to sleep for one request."""
+    mean, jitter = cfg.latency_ms, cfg.latency_jitter_ms
+    if cfg.distribution == "fixed":
+        ms = mean
+    elif cfg.distribution == "uniform":
+        ms = rng.uniform(mean - jitter, mean + jitter)
+    elif cfg.distribution == "normal":
+        ms = rng.gauss(mean, jitter)
+    elif mean > 0:
+        # Lognormal with the requested mean / stddev: long right tail, like real model latency.
+        sigma2 = math.log1p(jitter ** 2 / mean ** 2)
+        ms = rng.lognormvariate(math.log(mean) - sigma2 / 2, math.sqrt(sigma2))
+    else:
+        ms = 0.0
+    return max(0.0, ms) / 1000
+
+
+def _completion(content: str, model: str) -> dict:
+    return {
+        "id": f"chatcmpl-mock-{random.getrandbits(32):08x}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [
+            {
+                "index": 0,
+                "finish_reason": "stop",
+                "message": {"role": "assistant", "content": content},
+            }
+        ],
+        "usage": {"prompt_tokens": 1000, "completion_tokens": 200, "total_tokens": 1200},
+    }
+
+
+def _image_digest(body: dict) -> bytes:
+    for message in body.get("messages") or []:
+        content = message.get("content")
+        if not isinstance(content, list):
+            continue
+        for part in content:
+            if part.get("type") == "image_url":
+                return hashlib.sha256(part["image_url"]["url"].encode()).digest()
+    return b"\0"
+
+
+def create_app(cfg: MockConfig | None = None) -> FastAPI:
+    """Chat-completions stand-in for the Azure deployment vision.py calls."""
+    cfg = cfg or MockConfig()
+    rng = random.Random(cfg.seed)
+    stats = MockStats()
+    app = FastAPI(title="mock-azure-vision")
+    app.state.config = cfg
+    app.state.stats = stats
+
+    @app.post("/openai/deployments/{deployment}/chat/completions")
+    async def chat_completions(deployment: str, request: Request):
+        body = await request.json()
+        stats.requests += 1
+        await asyncio.sleep(sample_latency(cfg, rng))
+
+        roll = rng.random()
+        if roll < cfg.rate_limit_rate:
+            stats.rate_limited += 1
+            return JSONResponse(
+                {"error": {"code": "429", "message": "Rate limit is exceeded."}},
+                status_code=429,
+                headers={"retry-after": f"{cfg.retry_after:g}"},
+            )
+        if roll < cfg.rate_limit_rate + cfg.error_rate:
+            stats.errors += 1
+            return JSONResponse(
+                {"error": {"code": "InternalServerError", "message": "mock failure"}},
+                status_code=500,
+            )
+
+        report = CANNED_REPORTS[_image_digest(body)[0] % len(CANNED_REPORTS)]
+        stats.ok += 1
+        return _completion(json.dumps(report, ensure_ascii=False), deployment)
+
+    @app.get("/stats")
+    def get_stats():
+        return {
+            "requests": stats.requests,
+            "ok": stats.ok,
+            "errors": stats.errors,
+            "rate_limited": stats.rate_limited,
+        }
+
+    return app
+
+
+def add_mock_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--latency-ms", type=float, default=800.0, help="平均响应延迟（毫秒）")
+    parser.add_argument("--latency-jitter-ms", type=float, default=200.0, help="延迟抖动/标准差（毫秒）")
+    parser.add_argument("--distribution", choices=LATENCY_DISTRIBUTIONS, default="lognormal", help="延迟分布")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="返回 500 的比例 (0-1)")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="返回 429 的比例 (0-1)")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="429 的 Retry-After 秒数")
+    parser.add_argument("--seed", type=int, default=None, help="随机种子")
+
+
+def config_from_args(args: argparse.Namespace) -> MockConfig:
+    return MockConfig(
+        latency_ms=args.latency_ms,
+        latency_jitter_ms=args.latency_jitter_ms,
+        distribution=args.distribution,
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        retry_after=args.retry_after,
+        seed=args.seed,
+    )
+
+
+def _build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="本地模拟 Azure OpenAI 视觉接口（离线压测用）")
+    parser.add_argument("--host", default="127.0.0.1", help="监听地址")
+    parser.add_argument("--port", type=int, default=8765, help="监听端口")
+    add_mock_arguments(parser)
+    return parser
+
+
+def main() -> int:
+    import uvicorn
+
+    args = _build_parser().parse_args()
+    print(f"AZURE_OPENAI_ENDPOINT=http://{args.host}:{args.port}")
+    uvicorn.run(create_app(config_from_args(args)), host=args.host, port=args.port, log_level="warning")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,105 @@
+import inspect
+
+import pytest
+from fastapi import APIRouter, FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import NullPool
+
+from app.core.db import apply_sqlite_pragmas, async_database_url, get_async_db, is_sqlite
+from app.core.deps import to_async_endpoint
+from app.core.exceptions import PikaException
+from app.core.user import service as user_service
+from app.main import handle_pika_exception
+from app.modules.medical import router as medical_router
+from app.modules.medical import service, vision
+
+_FAKE_PARSED = {
+    "is_lab_report": True,
+    "report_type": "blood",
+    "report_type_label": "血常规",
+    "report_date": "2026-05-01",
+    "hospital": "医院A",
+    "metrics": [
+        {
+            "item_name": "WBC", "item_code": "WBC", "value_text": "11",
+            "value_num": 11.0, "unit": "10^9/L", "ref_range": "4-9",
+            "ref_low": 4.0, "ref_high": 9.0, "abnormal_flag": "high", "seq": 0,
+        }
+    ],
+}
+
+
+@pytest.fixture
+def async_client(db_session):
+    """The ported read endpoints served async, on an async engine over the
+    same database db_session writes to."""
+    url = db_session.get_bind().url
+    # NullPool: no connection outlives the TestClient's event loop.
+    engine = create_async_engine(async_database_url(url), poolclass=NullPool)
+    if is_sqlite(url):
+        event.listen(engine.sync_engine, "connect", lambda conn, _: apply_sqlite_pragmas(conn))
+    sessions = async_sessionmaker(engine, autoflush=False)
+
+    async def override_get_async_db():
+        async with sessions() as db:
+            yield db
+
+    api = APIRouter(prefix="/api/medical")
+    api.get("/reports")(to_async_endpoint(medical_router.list_reports))
+    api.get("/reports/{report_id}")(to_async_endpoint(medical_router.get_report))
+    api.get("/metrics/trend")(to_async_endpoint(medical_router.metric_trend))
+    app = FastAPI()
+    app.include_router(api)
+    app.add_exception_handler(PikaException, handle_pika_exception)
+    app.dependency_overrides[get_async_db] = override_get_async_db
+    with TestClient(app) as client:
+        yield client
+
+
+def test_wrapped_endpoint_is_async_with_async_dependencies():
+    endpoint = to_async_endpoint(medical_router.list_reports)
+    assert inspect.iscoroutinefunction(endpoint)
+    params = inspect.signature(endpoint).parameters
+    assert params["db"].default.dependency is get_async_db
+    assert params["user"].default.dependency.__name__ == "get_current_user_async"
+    assert params["membership"].default.dependency.__name__ == "get_current_membership_async"
+    # Query params are carried over untouched.
+    assert params["size"].default.default == 20
+
+
+def test_async_read_endpoints_match_sync(db_session, user, tmp_upload, monkeypatch, async_client):
+    monkeypatch.setattr(vision, "parse_report_image", lambda b, **kwargs: (_FAKE_PARSED, "{}"))
+    draft = service.create_draft_from_images(
+        db_session, uploader_id=user.id, subject_id=user.id,
+        files=[(b"\x89PNG async", "a.png", "image/png")],
+    )
+    report = service.commit_parsed_draft(db_session, draft_id=draft["draft_id"])
+    report_id = report.id
+    headers = {"X-Pika-Token": user.openid}
+
+    listed = async_client.get("/api/medical/reports", headers=headers).json()
+    assert listed["code"] == 0
+    assert listed["data"]["total"] == 1
+    assert listed["data"]["items"][0]["id"] == report_id
+    assert listed["data"]["items"][0]["abnormal_count"] == 1
+
+    detail = async_client.get(f"/api/medical/reports/{report_id}", headers=headers).json()
+    assert detail["code"] == 0
+    assert detail["data"]["metrics"][0]["item_code"] == "WBC"
+
+    trend = async_client.get("/api/medical/metrics/trend", params={"item_code": "WBC"}, headers=headers).json()
+    membership = user_service.get_active_membership(db_session, user_id=user.id)
+    sync_trend = medical_router.metric_trend(
+        dictionary_id=None, item_code="WBC", item_name=None, subject_id=None,
+        db=db_session, user=user, membership=membership,
+    )
+    assert trend["data"] == sync_trend.data.model_dump(mode="json")
+
+
+def test_async_dependencies_reject_bad_token(async_client):
+    body = async_client.get("/api/medical/reports", headers={"X-Pika-Token": "nope"}).json()
+    assert body["code"] == 401
+    body = async_client.get("/api/medical/reports").json()
+    assert body["code"] == 401
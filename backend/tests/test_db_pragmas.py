@@ -0,0 +1,60 @@
+import threading
+
+import pytest
+from sqlalchemy import text
+
+from app.core import db as core_db
+from app.core.user.models import User
+
+pytestmark = pytest.mark.sqlite_only
+
+
+def test_connections_get_tuned_profile(db_session):
+    conn = db_session.connection()
+    assert conn.exec_driver_sql("PRAGMA journal_mode").scalar() == "wal"
+    assert conn.exec_driver_sql("PRAGMA synchronous").scalar() == 1  # NORMAL
+    assert conn.exec_driver_sql("PRAGMA foreign_keys").scalar() == 1
+    assert conn.exec_driver_sql("PRAGMA temp_store").scalar() == 2  # MEMORY
+    assert conn.exec_driver_sql("PRAGMA busy_timeout").scalar() == core_db.settings.sqlite_busy_timeout_ms
+
+
+def test_pragmas_follow_settings(monkeypatch):
+    monkeypatch.setattr(core_db.settings, "sqlite_journal_mode", "delete")
+    monkeypatch.setattr(core_db.settings, "sqlite_foreign_keys", False)
+    monkeypatch.setattr(core_db.settings, "sqlite_cache_size_kb", 4096)
+
+    pragmas = core_db.sqlite_pragmas()
+    assert "PRAGMA journal_mode = delete" in pragmas
+    assert "PRAGMA foreign_keys = OFF" in pragmas
+    assert "PRAGMA cache_size = -4096" in pragmas
+
+
+def test_reader_not_blocked_by_exclusive_writer(db_session):
+    db_session.add(User(openid="before", nickname="a", account_type="wechat", status="active"))
+    db_session.commit()
+
+    engine = db_session.get_bind()
+    # An exclusive lock is what a long rollback-journal write ends up holding
+    # (on cache spill / commit); it locks every reader out. WAL readers keep
+    # reading the last committed snapshot.
+    writer = engine.raw_connection()
+    writer.isolation_level = None
+    cur = writer.cursor()
+    cur.execute("BEGIN EXCLUSIVE")
+    cur.execute("UPDATE users SET nickname = 'x' WHERE openid = 'before'")
+
+    seen: list = []
+
+    def read():
+        with engine.connect() as reader:
+            reader.exec_driver_sql("PRAGMA busy_timeout = 200")
+            seen.append(reader.execute(text("SELECT openid, nickname FROM users ORDER BY id")).all())
+
+    t = threading.Thread(target=read)
+    t.start()
+    t.join(timeout=5)
+    cur.execute("ROLLBACK")
+    writer.close()
+
+    assert seen, "reader was locked out by the writer"
+    assert [tuple(r) for r in seen[0]] == [("before", "a")]
@@ -0,0 +1,111 @@
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.core import deps, identity_cache
+from app.core.user import service as user_service
+from app.core.user.models import FamilyMembership, User
+from app.modules.medical import service
+
+
+@pytest.fixture
+def member(db_session, user):
+    family_id = user_service.get_active_membership(db_session, user_id=user.id).family_id
+    m = User(openid="member-openid", nickname="成员", role="member", account_type="wechat", status="active")
+    db_session.add(m)
+    db_session.flush()
+    db_session.add(FamilyMembership(family_id=family_id, user_id=m.id, family_role="member", is_active=True))
+    db_session.commit()
+    return m
+
+
+@contextmanager
+def _count_queries(db_session):
+    engine = db_session.get_bind()
+    statements: list[str] = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+
+def _resolve(db, token):
+    current = deps.get_current_user(x_pika_token=token, db=db)
+    membership = deps.get_current_membership(user=current, db=db)
+    return current, membership
+
+
+def test_repeat_request_resolves_identity_without_queries(db_session, user):
+    user_id = user.id
+    engine = db_session.get_bind()
+    with Session(bind=engine, autoflush=False) as first:
+        _resolve(first, user.openid)
+
+    with Session(bind=engine, autoflush=False) as second, _count_queries(second) as statements:
+        current, membership = _resolve(second, user.openid)
+        assert current.id == user_id
+        assert current.nickname == "tester"
+        assert membership.user_id == user_id
+        assert membership.family_role == "admin"
+        assert current in second
+    assert statements == []
+
+
+def test_profile_update_invalidates_cached_user(db_session, user):
+    _resolve(db_session, user.openid)
+    user_service.update_profile(db_session, user=user, nickname="新名字")
+
+    with Session(bind=db_session.get_bind(), autoflush=False) as other:
+        current, _ = _resolve(other, user.openid)
+        assert current.nickname == "新名字"
+
+
+def test_acl_grant_write_invalidates_snapshot(db_session, user, member):
+    actor_id, owner_id = member.id, user.id
+    assert service.has_acl_action(db_session, actor_user_id=actor_id, owner_user_id=owner_id, action="view_report")
+    assert owner_id in service.visible_owner_ids(db_session, actor_user_id=actor_id, action="view_report")
+
+    service.set_acl_grant(db_session, owner_user_id=owner_id, grantee_user_id=actor_id, actions=["upload_for_owner"])
+
+    assert not service.has_acl_action(db_session, actor_user_id=actor_id, owner_user_id=owner_id, action="view_report")
+    assert service.visible_owner_ids(db_session, actor_user_id=actor_id, action="view_report") == [actor_id]
+
+
+def test_membership_write_invalidates_snapshot(db_session, user, member):
+    actor_id, member_id = user.id, member.id
+    assert member_id in service.visible_owner_ids(db_session, actor_user_id=actor_id, action="view_report")
+
+    db_session.query(FamilyMembership).filter_by(user_id=member_id).update({"is_active": False})
+    db_session.commit()
+
+    assert service.visible_owner_ids(db_session, actor_user_id=actor_id, action="view_report") == [actor_id]
+    assert not service.has_acl_action(db_session, actor_user_id=actor_id, owner_user_id=member_id, action="view_report")
+
+
+def test_rollback_after_flush_drops_snapshots(db_session, user, member):
+    actor_id, member_id = user.id, member.id
+    db_session.query(FamilyMembership).filter_by(user_id=member_id).one().is_active = False
+    db_session.flush()
+    # Read inside the uncommitted transaction, then roll it back.
+    assert member_id not in service.visible_owner_ids(db_session, actor_user_id=actor_id, action="view_report")
+    db_session.rollback()
+
+    assert member_id in service.visible_owner_ids(db_session, actor_user_id=actor_id, action="view_report")
+
+
+def test_zero_ttl_disables_cache(db_session, user, monkeypatch):
+    monkeypatch.setattr(identity_cache.settings, "identity_cache_ttl", 0)
+    engine = db_session.get_bind()
+    with Session(bind=engine, autoflush=False) as first:
+        _resolve(first, user.openid)
+
+    with Session(bind=engine, autoflush=False) as second, _count_queries(second) as statements:
+        _resolve(second, user.openid)
+    assert len(statements) == 2
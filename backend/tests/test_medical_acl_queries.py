@@ -0,0 +1,117 @@
+from contextlib import contextmanager
+
+from sqlalchemy import event
+
+from app.core.user import service as user_service
+from app.core.user.models import FamilyMembership, User
+from app.modules.medical import router, service, vision
+
+_FAKE_PARSED = {
+    "is_lab_report": True,
+    "report_type": "blood",
+    "report_type_label": "血常规",
+    "report_date": "2026-05-01",
+    "hospital": "医院A",
+    "metrics": [
+        {
+            "item_name": "WBC", "item_code": "WBC", "value_text": "11",
+            "value_num": 11.0, "unit": "10^9/L", "ref_range": "4-9",
+            "ref_low": 4.0, "ref_high": 9.0, "abnormal_flag": "high", "seq": 0,
+        }
+    ],
+}
+
+
+def _grow_family(db_session, actor, size: int) -> list[User]:
+    """Add members until the actor's family has `size` people. Every third
+    member hides view_report from the actor; the rest grant it or stay default."""
+    family_id = user_service.get_active_membership(db_session, user_id=actor.id).family_id
+    existing = db_session.query(FamilyMembership).filter_by(family_id=family_id).count()
+    added = []
+    for i in range(existing, size):
+        member = User(openid=f"m{i}", nickname=f"成员{i}", role="member", account_type="wechat", status="active")
+        db_session.add(member)
+        db_session.flush()
+        db_session.add(FamilyMembership(family_id=family_id, user_id=member.id, family_role="member", is_active=True))
+        added.append(member)
+    db_session.commit()
+    for i, member in enumerate(added):
+        if i % 3 == 0:
+            actions = ["upload_for_owner"]
+        elif i % 3 == 1:
+            actions = ["view_report"]
+        else:
+            continue
+        service.set_acl_grant(db_session, owner_user_id=member.id, grantee_user_id=actor.id, actions=actions)
+    return added
+
+
+@contextmanager
+def _count_queries(db_session):
+    engine = db_session.get_bind()
+    statements: list[str] = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+
+def test_visible_owner_ids_matches_per_owner_checks(db_session, user):
+    members = _grow_family(db_session, user, 8)
+    outsider = User(openid="outsider", nickname="外人", role="member", account_type="wechat", status="active")
+    db_session.add(outsider)
+    db_session.commit()
+    user_service.ensure_user_family(db_session, user=outsider)
+
+    got = service.visible_owner_ids(db_session, actor_user_id=user.id, action="view_report")
+
+    expected = [
+        uid for uid in [user.id, *(m.id for m in members), outsider.id]
+        if service.has_acl_action(db_session, actor_user_id=user.id, owner_user_id=uid, action="view_report")
+    ]
+    assert sorted(got) == sorted(expected)
+    assert outsider.id not in got
+    assert service.visible_owner_ids(db_session, actor_user_id=user.id, action="bogus") == [user.id]
+
+
+def _call_endpoints(db_session, user):
+    membership = user_service.get_active_membership(db_session, user_id=user.id)
+    db_session.expire_all()
+    common = {"db": db_session, "user": user, "membership": membership}
+    router.list_reports(
+        subject_id=None, report_type=None, hospital=None, date_from=None, date_to=None,
+        page=1, size=20, cursor=None, with_total=True, **common,
+    )
+    router.list_hospitals(**common)
+    router.metric_trend(dictionary_id=None, item_code="WBC", item_name=None, subject_id=None, **common)
+    router.metric_catalog(subject_id=None, mapped=0, category_key=None, **common)
+
+
+def test_acl_query_count_is_constant_in_family_size(db_session, user, tmp_upload, monkeypatch):
+    monkeypatch.setattr(vision, "parse_report_image", lambda b, **kwargs: (_FAKE_PARSED, "{}"))
+    draft = service.create_draft_from_images(
+        db_session, uploader_id=user.id, subject_id=user.id,
+        files=[(b"\x89PNG acl", "a.png", "image/png")],
+    )
+    service.commit_parsed_draft(db_session, draft_id=draft["draft_id"])
+
+    actor_id = user.id
+    _grow_family(db_session, user, 3)
+    with _count_queries(db_session) as small:
+        service.visible_owner_ids(db_session, actor_user_id=actor_id, action="view_report")
+    with _count_queries(db_session) as small_endpoints:
+        _call_endpoints(db_session, user)
+
+    _grow_family(db_session, user, 15)
+    with _count_queries(db_session) as large:
+        service.visible_owner_ids(db_session, actor_user_id=actor_id, action="view_report")
+    with _count_queries(db_session) as large_endpoints:
+        _call_endpoints(db_session, user)
+
+    assert len(small) == len(large) == 2
+    assert len(small_endpoints) == len(large_endpoints)
@@ -0,0 +1,169 @@
+import os
+from datetime import date, datetime, timedelta
+
+import pytest
+from sqlalchemy.orm import sessionmaker
+
+from app.modules.medical import drafts, service, vision
+
+
+def _draft(user_id: int, *, draft_id="d1", expires_in=timedelta(hours=1)) -> dict:
+    return {
+        "draft_id": draft_id,
+        "uploader_id": user_id,
+        "subject_id": None,
+        "image_paths": ["2026/07/a.png"],
+        "content_hash": "h",
+        "is_lab_report": True,
+        "report_type": "blood",
+        "report_type_label": "血常规",
+        "report_date": date(2026, 7, 1),
+        "hospital": "医院A",
+        "metrics": [{"item_name": "WBC", "seq": 0}],
+        "raw_json": "{}",
+        "status": "parsed",
+        "expires_at": datetime.now() + expires_in,
+    }
+
+
+@pytest.mark.parametrize("store_cls", [drafts.MemoryDraftStore, drafts.DbDraftStore])
+def test_store_round_trip_and_delete(db_session, user, store_cls):
+    store = store_cls()
+    store.put(db_session, _draft(user.id))
+
+    got = store.get(db_session, "d1")
+    assert got["report_date"] == date(2026, 7, 1)
+    assert got["metrics"] == [{"item_name": "WBC", "seq": 0}]
+    assert got["status"] == "parsed"
+
+    store.delete(db_session, "d1")
+    assert store.get(db_session, "d1") is None
+
+
+@pytest.mark.parametrize("store_cls", [drafts.MemoryDraftStore, drafts.DbDraftStore])
+def test_store_purges_only_expired(db_session, user, store_cls):
+    store = store_cls()
+    store.put(db_session, _draft(user.id, draft_id="old", expires_in=timedelta(seconds=-1)))
+    store.put(db_session, _draft(user.id, draft_id="new"))
+
+    assert [d["draft_id"] for d in store.purge_expired(db_session, datetime.now())] == ["old"]
+    assert store.get(db_session, "old") is None
+    assert store.get(db_session, "new") is not None
+
+
+@pytest.mark.parametrize("store_cls", [drafts.MemoryDraftStore, drafts.DbDraftStore])
+def test_store_trim_evicts_least_recently_used(db_session, user, store_cls, monkeypatch):
+    store = store_cls(max_count=2)
+    clock = [datetime(2026, 7, 1, 8, 0)]
+
+    class FakeDatetime(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return clock[0]
+
+    monkeypatch.setattr(drafts, "datetime", FakeDatetime)
+
+    for draft_id in ("a", "b"):
+        store.put(db_session, _draft(user.id, draft_id=draft_id))
+        clock[0] += timedelta(minutes=5)
+    store.get(db_session, "a")  # "a" is now the most recently used
+    clock[0] += timedelta(minutes=5)
+    store.put(db_session, _draft(user.id, draft_id="c"))
+    store.trim(db_session)
+
+    assert store.get(db_session, "b") is None
+    assert store.get(db_session, "a") is not None
+    assert store.get(db_session, "c") is not None
+
+
+def test_memory_store_caps_bytes():
+    store = drafts.MemoryDraftStore(max_count=100, max_bytes=1500)
+    for i in range(5):
+        draft = _draft(1, draft_id=f"d{i}")
+        draft["raw_json"] = "x" * 400
+        store.put(None, draft)
+
+    assert len(store) == 2
+    assert store.get(None, "d4") is not None
+    assert store.get(None, "d0") is None
+
+
+def test_memory_store_purge_skips_stale_heap_entries():
+    store = drafts.MemoryDraftStore()
+    store.put(None, _draft(1, draft_id="d", expires_in=timedelta(seconds=-1)))
+    # Re-put with a later expiry leaves the old heap entry behind.
+    store.put(None, _draft(1, draft_id="d"))
+
+    assert store.purge_expired(None, datetime.now()) == []
+    assert store.get(None, "d") is not None
+
+
+def test_get_draft_hides_expired_before_sweep(db_session, user, monkeypatch):
+    store = drafts.DbDraftStore()
+    monkeypatch.setattr(drafts, "_store", store)
+    store.put(db_session, _draft(user.id, draft_id="old", expires_in=timedelta(seconds=-1)))
+
+    assert service.get_draft(db_session, "old") is None
+    assert service.sweep_drafts(db_session) == {"expired": 1, "evicted": 0, "images_removed": 0}
+    assert store.get(db_session, "old") is None
+
+
+def test_db_draft_survives_new_session(db_session, user, tmp_path, monkeypatch):
+    # A commit served by another worker/after a restart sees the same draft.
+    from app.core import storage
+
+    monkeypatch.setattr(storage.settings, "upload_dir", str(tmp_path))
+    monkeypatch.setattr(drafts, "_store", drafts.DbDraftStore())
+    monkeypatch.setattr(
+        vision,
+        "parse_report_image",
+        lambda b, **kwargs: ({
+            "is_lab_report": True, "report_type": "blood", "report_type_label": None,
+            "report_date": "2026-05-01", "hospital": None, "metrics": [],
+        }, "{}"),
+    )
+
+    draft = service.create_draft_from_images(
+        db_session,
+        uploader_id=user.id,
+        subject_id=None,
+        files=[(b"\x89PNG\r\n\x1a\n persisted", "a.png", "image/png")],
+        hospital_override="X",
+    )
+
+    other = sessionmaker(bind=db_session.get_bind())()
+    try:
+        report = service.commit_parsed_draft(other, draft_id=draft["draft_id"])
+        assert report.report_date == date(2026, 5, 1)
+        assert service.get_draft(other, draft["draft_id"]) is None
+    finally:
+        other.close()
+
+
+@pytest.mark.parametrize("store_cls", [drafts.MemoryDraftStore, drafts.DbDraftStore])
+def test_draft_evicted_during_parse_stays_gone(db_session, user, tmp_path, monkeypatch, store_cls):
+    from app.core import storage
+
+    monkeypatch.setattr(storage.settings, "upload_dir", str(tmp_path))
+    store = store_cls()
+    monkeypatch.setattr(drafts, "_store", store)
+    draft = service.stage_draft(
+        db_session, uploader_id=user.id, subject_id=None,
+        files=[(b"\x89PNG\r\n\x1a\n evicted", "a.png", "image/png")],
+    )
+    image = storage.abs_path(draft["image_paths"][0])
+
+    def parse_while_swept(_b, **kwargs):
+        # The sweeper runs mid-parse and LRU-evicts the draft and its images.
+        store.max_count = 0
+        assert service.sweep_drafts(db_session)["evicted"] == 1
+        return {
+            "is_lab_report": True, "report_type": "blood", "report_type_label": None,
+            "report_date": None, "hospital": None, "metrics": [],
+        }, "{}"
+
+    monkeypatch.setattr(vision, "parse_report_image", parse_while_swept)
+
+    assert service.parse_draft(db_session, draft["draft_id"]) is None
+    assert store.get(db_session, draft["draft_id"]) is None
+    assert not os.path.exists(image)
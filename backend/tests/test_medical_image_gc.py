@@ -0,0 +1,114 @@
+import os
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.modules.medical import image_gc, service, vision
+
+_FAKE_PARSED = {
+    "is_lab_report": True,
+    "report_type": "blood",
+    "report_type_label": "血常规",
+    "report_date": "2026-05-01",
+    "hospital": None,
+    "metrics": [],
+}
+
+
+def _write(root, rel: str, content: bytes, *, age: timedelta = timedelta(days=1)) -> None:
+    path = os.path.join(root, rel)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(content)
+    ts = time.time() - age.total_seconds()
+    os.utime(path, (ts, ts))
+
+
+def _stage(db_session, user, content: bytes) -> dict:
+    return service.create_draft_from_images(
+        db_session,
+        uploader_id=user.id,
+        subject_id=None,
+        files=[(content, "a.png", "image/png")],
+    )
+
+
+def _age_everything(root) -> None:
+    ts = time.time() - 86400
+    for rel, _ in image_gc.iter_upload_files(str(root)):
+        os.utime(os.path.join(root, rel), (ts, ts))
+
+
+@pytest.fixture
+def tree(db_session, user, tmp_upload, monkeypatch):
+    monkeypatch.setattr(vision, "parse_report_image", lambda b, **kwargs: (_FAKE_PARSED, "{}"))
+    committed = service.commit_parsed_draft(
+        db_session, draft_id=_stage(db_session, user, b"\x89PNG committed")["draft_id"]
+    )
+    live_draft = _stage(db_session, user, b"\x89PNG live draft")
+    _age_everything(tmp_upload)
+
+    _write(tmp_upload, "2025/01/orphan_a.png", b"a" * 100)
+    _write(tmp_upload, "2025/02/orphan_b.png", b"b" * 50)
+    _write(tmp_upload, "2025/02/fresh.png", b"c" * 10, age=timedelta(0))
+    return {
+        "committed": committed.image_paths[0],
+        "draft": live_draft["image_paths"][0],
+    }
+
+
+def test_dry_run_reports_orphans_without_touching_files(db_session, tmp_upload, tree):
+    report = image_gc.collect_orphan_images(db_session)
+
+    assert report.scanned == 5
+    assert report.referenced == 2
+    assert report.too_recent == 1
+    assert sorted(report.orphan_paths) == ["2025/01/orphan_a.png", "2025/02/orphan_b.png"]
+    assert report.orphan_bytes == 150
+    assert report.removed == 0
+    assert os.path.exists(tmp_upload / "2025/01/orphan_a.png")
+
+
+def test_quarantine_moves_orphans_and_keeps_referenced(db_session, tmp_upload, tree):
+    report = image_gc.collect_orphan_images(db_session, dry_run=False, batch_size=1)
+
+    assert report.removed == 2
+    assert report.removed_bytes == 150
+    assert not os.path.exists(tmp_upload / "2025/01/orphan_a.png")
+    assert os.path.exists(tmp_upload / image_gc.QUARANTINE_DIR / "2025/01/orphan_a.png")
+    assert os.path.exists(tmp_upload / tree["committed"])
+    assert os.path.exists(tmp_upload / tree["draft"])
+    assert os.path.exists(tmp_upload / "2025/02/fresh.png")
+
+    # The quarantine dir itself is never rescanned.
+    again = image_gc.collect_orphan_images(db_session)
+    assert again.orphans == 0
+
+
+def test_delete_respects_limit(db_session, tmp_upload, tree):
+    report = image_gc.collect_orphan_images(db_session, dry_run=False, action="delete", limit=1)
+
+    assert report.orphans == 1
+    assert report.removed == 1
+    remaining = image_gc.collect_orphan_images(db_session)
+    assert remaining.orphans == 1
+
+
+def test_unknown_action_rejected(db_session, tmp_upload):
+    with pytest.raises(ValueError):
+        image_gc.collect_orphan_images(db_session, action="shred")
+
+
+def test_sweep_removes_images_of_expired_drafts(db_session, user, tmp_upload, monkeypatch):
+    monkeypatch.setattr(vision, "parse_report_image", lambda b, **kwargs: (_FAKE_PARSED, "{}"))
+    draft = _stage(db_session, user, b"\x89PNG abandoned")
+    path = tmp_upload / draft["image_paths"][0]
+    assert path.exists()
+
+    from app.modules.medical import drafts
+    draft["expires_at"] = datetime.now() - timedelta(seconds=1)
+    drafts.get_store().put(db_session, draft)
+
+    assert service.sweep_drafts(db_session) == {"expired": 1, "evicted": 0, "images_removed": 1}
+    assert not path.exists()
@@ -0,0 +1,87 @@
+import base64
+import io
+
+from PIL import Image
+
+from app.modules.medical import imaging, vision
+
+
+def _image_bytes(size=(4000, 3000), mode="RGB", fmt="PNG", exif_orientation=None) -> bytes:
+    img = Image.new(mode, size, "white" if mode != "RGBA" else (255, 255, 255, 0))
+    out = io.BytesIO()
+    kwargs = {}
+    if exif_orientation is not None:
+        exif = Image.Exif()
+        exif[0x0112] = exif_orientation
+        kwargs["exif"] = exif
+    img.save(out, format=fmt, **kwargs)
+    return out.getvalue()
+
+
+def _open(data: bytes) -> Image.Image:
+    return Image.open(io.BytesIO(data))
+
+
+def test_large_photo_is_shrunk_and_reencoded_as_jpeg():
+    out = imaging.preprocess_for_vision(_image_bytes(), max_edge=1024, image_format="jpeg", quality=80)
+    img = _open(out)
+    assert img.format == "JPEG"
+    assert img.size == (1024, 768)
+
+
+def test_exif_orientation_is_applied():
+    # Orientation 6 = rotate 90° clockwise to display.
+    out = imaging.preprocess_for_vision(
+        _image_bytes(size=(300, 200), fmt="JPEG", exif_orientation=6), max_edge=2048
+    )
+    assert _open(out).size == (200, 300)
+
+
+def test_grayscale_and_webp():
+    out = imaging.preprocess_for_vision(
+        _image_bytes(size=(500, 500), mode="RGBA"), image_format="webp", grayscale=True
+    )
+    img = _open(out)
+    assert img.format == "WEBP"
+    assert img.getpixel((0, 0)) in (255, (255, 255, 255), (255, 255, 255))
+
+
+def test_undecodable_bytes_pass_through():
+    data = b"\x00\x01 not an image"
+    assert imaging.preprocess_for_vision(data) is data
+
+
+def test_small_image_kept_when_reencode_is_bigger():
+    img = Image.effect_noise((64, 64), 64).convert("RGB")
+    buf = io.BytesIO()
+    img.save(buf, format="JPEG", quality=10)
+    data = buf.getvalue()
+    assert imaging.preprocess_for_vision(data, max_edge=2048, quality=100) == data
+
+
+def test_parse_report_image_sends_preprocessed_image(monkeypatch):
+    seen = {}
+
+    class _FakeCompletions:
+        def create(self, **kwargs):
+            url = kwargs["messages"][1]["content"][1]["image_url"]["url"]
+            seen["url"] = url
+            msg = type("M", (), {"content": '{"report_type": "blood", "metrics": []}'})
+            choice = type("C", (), {"message": msg})
+            return type("R", (), {"choices": [choice]})
+
+    class _FakeClient:
+        chat = type("Chat", (), {"completions": _FakeCompletions()})
+
+    monkeypatch.setattr(vision, "_client", lambda: _FakeClient())
+    monkeypatch.setattr(vision.settings, "vision_preprocess", True)
+    monkeypatch.setattr(vision.settings, "vision_cache_enabled", False)
+    monkeypatch.setattr(vision.settings, "vision_max_edge", 512)
+    monkeypatch.setattr(vision.settings, "vision_image_format", "jpeg")
+
+    parsed, _ = vision.parse_report_image(_image_bytes())
+
+    assert parsed["report_type"] == "blood"
+    assert seen["url"].startswith("data:image/jpeg;base64,")
+    sent = _open(base64.b64decode(seen["url"].split(",", 1)[1]))
+    assert max(sent.size) == 512
@@ -0,0 +1,317 @@
+import pytest
+from sqlalchemy import event, func, insert
+
+from app.core.user import service as user_service
+from app.modules.medical import router, service, vision
+from app.modules.medical.models import (
+    MedicalMetricAlias,
+    MedicalMetricDictionary,
+    MedicalReport,
+    MedicalReportMetric,
+    MedicalReportMetricMap,
+)
+
+_FAKE_PARSED = {
+    "is_lab_report": True,
+    "report_type": "blood",
+    "report_type_label": "血常规",
+    "report_date": "2026-05-01",
+    "hospital": "医院A",
+    "metrics": [
+        {
+            "item_name": "WBC", "item_code": "WBC", "value_text": "11",
+            "value_num": 11.0, "unit": "10^9/L", "ref_range": "4-9",
+            "ref_low": 4.0, "ref_high": 9.0, "abnormal_flag": "high", "seq": 0,
+        },
+        {
+            "item_name": "血红蛋白", "item_code": "HGB", "value_text": "130",
+            "value_num": 130.0, "unit": "g/L", "ref_range": "120-160",
+            "ref_low": 120.0, "ref_high": 160.0, "abnormal_flag": "normal", "seq": 1,
+        },
+    ],
+}
+
+
+@pytest.fixture
+def wbc(db_session):
+    dic = MedicalMetricDictionary(
+        canonical_key="wbc", canonical_name="白细胞", canonical_unit="10^9/L",
+        category_key="blood_routine", enabled=True,
+    )
+    db_session.add(dic)
+    db_session.commit()
+    return dic
+
+
+def _commit_report(db_session, user, name=b"a"):
+    draft = service.create_draft_from_images(
+        db_session, uploader_id=user.id, subject_id=user.id,
+        files=[(b"\x89PNG " + name, "a.png", "image/png")],
+    )
+    return service.commit_parsed_draft(db_session, draft_id=draft["draft_id"])
+
+
+def _maps(db_session, report):
+    by_metric = {
+        m.report_metric_id: m
+        for m in db_session.query(MedicalReportMetricMap).populate_existing()
+    }
+    return {metric.item_name: by_metric.get(metric.id) for metric in report.metrics}
+
+
+def test_commit_maps_new_metrics_without_rebuild(db_session, user, tmp_upload, monkeypatch, wbc):
+    monkeypatch.setattr(vision, "parse_report_image", lambda b, **kwargs: (_FAKE_PARSED, "{}"))
+    service.create_metric_alias(db_session, owner_user_id=user.id, dictionary_id=wbc.id, alias_name="wbc")
+
+    report = _commit_report(db_session, user)
+
+    maps = _maps(db_session, report)
+    assert maps["WBC"].match_status == "auto"
+    assert maps["WBC"].dictionary_id == wbc.id
+    assert maps["血红蛋白"].match_status == "unmapped"
+
+    membership = user_service.get_active_membership(db_session, user_id=user.id)
+    trend = router.metric_trend(
+        dictionary_id=wbc.id, item_code=None, item_name=None, subject_id=None,
+        db=db_session, user=user, membership=membership,
+    )
+    assert [p.report_id for p in trend.data.points] == [report.id]
+
+
+def test_alias_edits_remap_existing_metrics(db_session, user, tmp_upload, monkeypatch, wbc):
+    monkeypatch.setattr(vision, "parse_report_image", lambda b, **kwargs: (_FAKE_PARSED, "{}"))
+    report = _commit_report(db_session, user)
+    assert _maps(db_session, report)["WBC"].match_status == "unmapped"
+
+    alias = service.create_metric_alias(db_session, owner_user_id=user.id, dictionary_id=wbc.id, alias_name="WBC")
+    assert _maps(db_session, report)["WBC"].dictionary_id == wbc.id
+
+    # Renaming moves the exact match to the new name; WBC only keeps
+    # reaching the entry through its item code.
+    service.update_metric_alias(db_session, owner_user_id=user.id, alias_id=alias.id, alias_name="血红蛋白")
+    maps = _maps(db_session, report)
+    assert (maps["WBC"].match_status, maps["WBC"].confidence) == ("fuzzy", 0.9)
+    assert (maps["血红蛋白"].match_status, maps["血红蛋白"].dictionary_id) == ("auto", wbc.id)
+
+    service.delete_metric_alias(db_session, owner_user_id=user.id, alias_id=alias.id)
+    maps = _maps(db_session, report)
+    assert {m.match_status for m in maps.values()} == {"unmapped"}
+    assert maps["血红蛋白"].alias_id is None
+
+
+def test_update_and_reparse_remap_replaced_metrics(db_session, user, tmp_upload, monkeypatch, wbc):
+    monkeypatch.setattr(vision, "parse_report_image", lambda b, **kwargs: (_FAKE_PARSED, "{}"))
+    service.create_metric_alias(db_session, owner_user_id=user.id, dictionary_id=wbc.id, alias_name="白细胞")
+    report = _commit_report(db_session, user)
+    assert _maps(db_session, report)["血红蛋白"].match_status == "unmapped"
+
+    report = service.update_report(
+        db_session, report_id=report.id, report_type="blood", report_type_label=None,
+        report_date=None, hospital=None,
+        metrics=[{"item_name": "白细胞", "value_text": "5", "unit": "10^9/L"}],
+    )
+    assert _maps(db_session, report)["白细胞"].dictionary_id == wbc.id
+
+    report = service.reparse_report(db_session, report_id=report.id)
+    maps = _maps(db_session, report)
+    assert set(maps) == {"WBC", "血红蛋白"}
+    assert maps["WBC"].match_status == "fuzzy"  # by item code
+    assert maps["血红蛋白"].match_status == "unmapped"
+
+
+def test_rebuild_writes_only_changed_mappings(db_session, user, tmp_upload, monkeypatch, wbc):
+    monkeypatch.setattr(vision, "parse_report_image", lambda b, **kwargs: (_FAKE_PARSED, "{}"))
+    _commit_report(db_session, user, b"a")
+    _commit_report(db_session, user, b"b")
+    # Bulk alias import bypassing the service, as bootstrap does.
+    db_session.add(MedicalMetricAlias(owner_user_id=user.id, dictionary_id=wbc.id, alias_name="WBC", priority=10))
+    db_session.commit()
+
+    out = service.rebuild_metric_mappings(db_session, owner_user_id=user.id)
+    assert out == {"mapped": 2, "unmapped": 2, "changed": 2}
+
+    writes: list[str] = []
+    engine = db_session.get_bind()
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith(("INSERT", "UPDATE", "DELETE")):
+            writes.append(statement)
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        out = service.rebuild_metric_mappings(db_session, owner_user_id=user.id)
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+    assert out == {"mapped": 2, "unmapped": 2, "changed": 0}
+    assert writes == []
+
+
+def test_bootstrap_is_set_based_and_idempotent(db_session, user, tmp_upload, monkeypatch, wbc):
+    monkeypatch.setattr(vision, "parse_report_image", lambda b, **kwargs: (_FAKE_PARSED, "{}"))
+    # Same (name, unit, hospital) in several reports: one alias each.
+    for i in range(3):
+        _commit_report(db_session, user, bytes([i]))
+    user_id = user.id
+
+    statements: list[str] = []
+    engine = db_session.get_bind()
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        out = service.bootstrap_metric_dictionary(db_session, owner_user_id=user_id)
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+    # "wbc" already exists; only HGB is new.
+    assert out == {"dictionary_created": 1, "alias_created": 2}
+    # Metric rows, dictionary keys, new entries, owner aliases, new aliases.
+    assert len(statements) == 5
+
+    aliases = db_session.query(MedicalMetricAlias).filter_by(owner_user_id=user.id).all()
+    assert {(a.dictionary_id == wbc.id, a.alias_name, a.hospital_hint, a.priority) for a in aliases} == {
+        (True, "WBC", "医院A", 100),
+        (False, "血红蛋白", "医院A", 100),
+    }
+    hgb = db_session.query(MedicalMetricDictionary).filter_by(canonical_key="hgb").one()
+    assert (hgb.canonical_name, hgb.canonical_unit, hgb.category_key) == ("血红蛋白", "g/L", "blood_routine")
+
+    assert service.bootstrap_metric_dictionary(db_session, owner_user_id=user.id) == {
+        "dictionary_created": 0, "alias_created": 0,
+    }
+
+
+def test_rebuild_streams_in_chunks_with_bulk_writes(db_session, user, wbc, monkeypatch):
+    from app.modules.medical import mapping
+
+    monkeypatch.setattr(mapping, "IN_CHUNK", 100)
+    monkeypatch.setattr(mapping, "STREAM_BATCH", 150)
+    user_id = user.id
+    engine = db_session.get_bind()
+    with engine.begin() as conn:
+        conn.execute(insert(MedicalReport), [
+            {"id": i, "uploader_id": user_id, "subject_id": user_id, "report_type": "blood",
+             "hospital": "医院A", "image_path": f"{i}.png", "status": "parsed", "abnormal_count": 0}
+            for i in range(1, 101)
+        ])
+        conn.execute(insert(MedicalReportMetric), [
+            {"report_id": i // 5 + 1, "item_name": "WBC" if i % 2 else "HGB", "unit": "10^9/L", "seq": i % 5}
+            for i in range(500)
+        ])
+    db_session.add(MedicalMetricAlias(owner_user_id=user_id, dictionary_id=wbc.id, alias_name="WBC", priority=10))
+    db_session.commit()
+
+    statements: list[str] = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement.lstrip().split()[0].upper())
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        out = service.rebuild_metric_mappings(db_session, owner_user_id=user_id)
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+    assert out == {"mapped": 250, "unmapped": 250, "changed": 500}
+    # 5 chunks: one existing-maps SELECT and one executemany INSERT each,
+    # plus the streamed metric query and the alias index.
+    assert statements.count("INSERT") == 5
+    assert statements.count("SELECT") == 7
+    # No ORM map objects were built.
+    assert not any(isinstance(obj, MedicalReportMetricMap) for obj in db_session.identity_map.values())
+
+    counts = dict(
+        db_session.query(MedicalReportMetricMap.match_status, func.count()).group_by(MedicalReportMetricMap.match_status)
+    )
+    assert counts == {"auto": 250, "unmapped": 250}
+
+
+def test_normalize_name_folds_width_brackets_and_punctuation():
+    from app.modules.medical.mapping import bracket_codes, normalize_name
+
+    assert normalize_name("谷丙转氨酶（ALT）") == "谷丙转氨酶"
+    assert normalize_name(" 谷丙转氨酶 [ALT] ") == "谷丙转氨酶"
+    assert normalize_name("ＷＢＣ-计数") == "wbc计数"
+    assert normalize_name("(ALT)") == "alt"
+    assert normalize_name("NEUT%") != normalize_name("NEUT#")
+    assert bracket_codes("谷丙转氨酶【ALT】") == ["alt"]
+
+
+def test_alias_index_fuzzy_candidates():
+    from app.modules.medical.mapping import AliasIndex
+
+    index = AliasIndex([
+        (1, 10, "alt", "ALT", "U/L", "谷丙转氨酶", None, None, 10),
+        (2, 20, "wbc", "白细胞", "10^9/L", "白细胞计数", None, None, 10),
+        (3, 30, "neut_pct", "中性粒细胞百分比", "%", "中性粒细胞%", None, None, 10),
+    ])
+
+    def hit(name, code=None):
+        found = index.candidates(name, code)
+        return None if found is None else (found[0][0][1], found[1], found[2])
+
+    assert hit("谷丙转氨酶") == (10, "auto", 1.0)
+    assert hit("谷丙转氨酶（ALT）") == (10, "fuzzy", 0.95)
+    assert hit("丙氨酸氨基转移酶", "ALT") == (10, "fuzzy", 0.9)
+    assert hit("丙氨酸氨基转移酶(ALT)") == (10, "fuzzy", 0.9)
+    # A longer spelling of the same test clears the bar...
+    dictionary_id, status, score = hit("谷丙转氨酶测定")
+    assert (dictionary_id, status) == (10, "fuzzy") and 0.8 <= score < 0.9
+    # ...but a different test one character (or one %/# mark) away does not.
+    assert hit("红细胞计数") is None
+    assert hit("中性粒细胞#") is None
+
+
+def test_ocr_variant_is_mapped_fuzzy_with_confidence(db_session, user, tmp_upload, monkeypatch, wbc):
+    parsed = {**_FAKE_PARSED, "metrics": [
+        {**_FAKE_PARSED["metrics"][0], "item_name": "白细胞（WBC）", "item_code": None},
+    ]}
+    monkeypatch.setattr(vision, "parse_report_image", lambda b, **kwargs: (parsed, "{}"))
+    service.create_metric_alias(db_session, owner_user_id=user.id, dictionary_id=wbc.id, alias_name="白细胞")
+
+    report = _commit_report(db_session, user)
+    m = _maps(db_session, report)["白细胞（WBC）"]
+    assert (m.match_status, m.confidence, m.dictionary_id) == ("fuzzy", 0.95, wbc.id)
+
+    # An exact alias for the OCR spelling takes over.
+    service.create_metric_alias(db_session, owner_user_id=user.id, dictionary_id=wbc.id, alias_name="白细胞（WBC）")
+    m = _maps(db_session, report)["白细胞（WBC）"]
+    assert (m.match_status, m.confidence) == ("auto", 1.0)
+
+
+def test_canonical_trend_converts_mixed_units_at_write_time(db_session, user, tmp_upload, monkeypatch):
+    glu = MedicalMetricDictionary(
+        canonical_key="glu", canonical_name="葡萄糖", canonical_unit="mmol/L",
+        category_key="biochem", enabled=True,
+    )
+    db_session.add(glu)
+    db_session.commit()
+    service.create_metric_alias(db_session, owner_user_id=user.id, dictionary_id=glu.id, alias_name="葡萄糖")
+
+    def glucose(value, unit, low, high):
+        return {**_FAKE_PARSED, "metrics": [{
+            "item_name": "葡萄糖", "item_code": "GLU", "value_text": str(value), "value_num": value,
+            "unit": unit, "ref_range": f"{low}-{high}", "ref_low": low, "ref_high": high,
+            "abnormal_flag": "normal", "seq": 0,
+        }]}
+
+    reports = []
+    for name, parsed in ((b"a", glucose(5.5, "mmol/L", 3.9, 6.1)), (b"b", glucose(126.0, "mg/dL", 70.0, 110.0)),
+                         (b"c", glucose(7.0, "IU/L", None, None))):
+        monkeypatch.setattr(vision, "parse_report_image", lambda b, parsed=parsed, **kwargs: (parsed, "{}"))
+        reports.append(_commit_report(db_session, user, name=name))
+
+    maps = [_maps(db_session, r)["葡萄糖"] for r in reports]
+    assert [m.canonical_value for m in maps] == [5.5, 6.99378, None]
+    assert (maps[1].canonical_ref_low, maps[1].canonical_ref_high) == (3.88544, 6.10568)
+
+    membership = user_service.get_active_membership(db_session, user_id=user.id)
+    common = dict(item_code=None, item_name=None, subject_id=None, db=db_session, user=user, membership=membership)
+    raw = router.metric_trend(dictionary_id=glu.id, **common).data
+    assert [p.value_num for p in raw.points] == [5.5, 126.0, 7.0]
+    assert raw.canonical is False
+
+    trend = router.metric_trend(dictionary_id=glu.id, canonical=True, **common).data
+    assert trend.canonical is True
+    assert trend.unit == "mmol/L"
+    assert [(p.value_num, p.unit) for p in trend.points] == [(5.5, "mmol/L"), (6.99378, "mmol/L"), (None, "IU/L")]
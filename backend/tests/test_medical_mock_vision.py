@@ -0,0 +1,76 @@
+import openai
+import pytest
+from fastapi.testclient import TestClient
+from openai import AzureOpenAI
+
+from app.modules.medical import vision
+from scripts import mock_azure_vision as mock
+
+
+@pytest.fixture
+def use_mock(monkeypatch):
+    """Point vision at an in-process mock server; returns a function taking a MockConfig."""
+    monkeypatch.setattr(vision.settings, "vision_cache_enabled", False)
+    monkeypatch.setattr(vision.settings, "vision_preprocess", False)
+    monkeypatch.setattr(vision.time, "sleep", lambda _s: None)
+
+    def install(cfg: mock.MockConfig):
+        app = mock.create_app(cfg)
+        client = AzureOpenAI(
+            azure_endpoint="http://testserver",
+            api_key="k",
+            api_version="2024-10-21",
+            max_retries=0,
+            http_client=TestClient(app),
+        )
+        monkeypatch.setattr(vision, "_client_instance", client)
+        return app.state.stats
+
+    return install
+
+
+def test_mock_returns_canned_report_parseable_by_vision(use_mock):
+    stats = use_mock(mock.MockConfig(latency_ms=0, distribution="fixed"))
+
+    parsed, raw_text = vision.parse_report_image(b"\x89PNG page", category_candidates=["血常规"])
+
+    assert parsed["is_lab_report"] is True
+    assert parsed["report_type"] in {r["report_type"] for r in mock.CANNED_REPORTS}
+    assert parsed["metrics"] and all(m["item_name"] for m in parsed["metrics"])
+    assert stats.ok == 1
+    # Same image -> same canned report.
+    again, _ = vision.parse_report_image(b"\x89PNG page", category_candidates=["血常规"])
+    assert again == parsed
+
+
+def test_mock_429_carries_retry_after_and_vision_retries(use_mock, monkeypatch):
+    stats = use_mock(mock.MockConfig(latency_ms=0, distribution="fixed", rate_limit_rate=1.0, retry_after=3))
+    monkeypatch.setattr(vision.settings, "vision_max_retries", 2)
+
+    with pytest.raises(openai.RateLimitError) as exc_info:
+        vision.parse_report_image(b"\x89PNG page")
+
+    assert exc_info.value.response.headers["retry-after"] == "3"
+    assert stats.requests == 3
+    assert stats.rate_limited == 3
+
+
+def test_mock_error_rate_returns_500(use_mock, monkeypatch):
+    stats = use_mock(mock.MockConfig(latency_ms=0, distribution="fixed", error_rate=1.0))
+    monkeypatch.setattr(vision.settings, "vision_max_retries", 0)
+
+    with pytest.raises(openai.InternalServerError):
+        vision.parse_report_image(b"\x89PNG page")
+    assert stats.errors == 1
+
+
+@pytest.mark.parametrize("distribution", mock.LATENCY_DISTRIBUTIONS)
+def test_latency_sampling_is_non_negative_and_near_mean(distribution):
+    import random
+
+    cfg = mock.MockConfig(latency_ms=500, latency_jitter_ms=100, distribution=distribution)
+    rng = random.Random(7)
+    samples = [mock.sample_latency(cfg, rng) for _ in range(2000)]
+
+    assert min(samples) >= 0
+    assert 0.45 < sum(samples) / len(samples) < 0.55
@@ -0,0 +1,177 @@
+"""EXPLAIN QUERY PLAN guard for the hot medical read queries.
+
+Seeds a few thousand reports/metrics across many users (the actor's family
+is a small slice, like production), ANALYZEs, runs the real endpoints while
+capturing their SQL, and fails if any of them plans a full scan of a big
+table.
+"""
+import random
+import re
+from contextlib import contextmanager
+from datetime import date, timedelta
+
+import pytest
+from sqlalchemy import event, insert, text
+
+from app.core.user.models import FamilyGroup, FamilyMembership, User
+from app.modules.medical import router
+from app.modules.medical.models import (
+    MedicalMetricDictionary,
+    MedicalReport,
+    MedicalReportMetric,
+    MedicalReportMetricMap,
+)
+
+pytestmark = pytest.mark.sqlite_only
+
+_HOT_TABLES = ("medical_reports", "medical_report_metrics", "medical_report_metric_maps")
+# The report list walks this index in sort order and stops at LIMIT.
+_ORDERED_SCAN_INDEXES = {"ix_medical_reports_list_order"}
+
+_USERS = 30
+_REPORTS_PER_USER = 40
+_METRICS_PER_REPORT = 6
+_CODES = 40
+
+
+@pytest.fixture
+def seeded(db_session):
+    rng = random.Random(7)
+    engine = db_session.get_bind()
+    reports, metrics, maps = [], [], []
+    metric_id = 0
+    for report_id in range(1, _USERS * _REPORTS_PER_USER + 1):
+        owner = (report_id - 1) // _REPORTS_PER_USER + 1
+        reports.append({
+            "id": report_id, "uploader_id": owner,
+            "subject_id": owner if rng.random() < 0.9 else None,
+            "report_type": "blood", "report_date": date(2024, 1, 1) + timedelta(days=rng.randint(0, 700)),
+            "hospital": f"医院{rng.randint(1, 5)}", "image_path": f"{report_id}.png", "status": "parsed",
+            "abnormal_count": 0,
+        })
+        for seq in range(_METRICS_PER_REPORT):
+            metric_id += 1
+            code = rng.randint(1, _CODES)
+            metrics.append({
+                "id": metric_id, "report_id": report_id, "item_name": f"指标{code}",
+                "item_code": f"C{code}", "seq": seq,
+            })
+            maps.append({"report_metric_id": metric_id, "dictionary_id": code, "match_status": "auto"})
+
+    with engine.begin() as conn:
+        conn.execute(insert(User), [
+            {"id": i, "openid": f"plan-{i}", "nickname": f"u{i}", "role": "member",
+             "account_type": "wechat", "status": "active"}
+            for i in range(1, _USERS + 1)
+        ])
+        conn.execute(insert(FamilyGroup), [{"id": 1, "name": "家庭", "owner_user_id": 1}])
+        conn.execute(insert(FamilyMembership), [
+            {"family_id": 1, "user_id": i, "family_role": "admin" if i == 1 else "member", "is_active": True}
+            for i in (1, 2, 3)
+        ])
+        conn.execute(insert(MedicalMetricDictionary), [
+            {"id": i, "canonical_key": f"c{i}", "canonical_name": f"指标{i}", "category_key": "blood_routine"}
+            for i in range(1, _CODES + 1)
+        ])
+        conn.execute(insert(MedicalReport), reports)
+        conn.execute(insert(MedicalReportMetric), metrics)
+        conn.execute(insert(MedicalReportMetricMap), maps)
+        conn.execute(text("ANALYZE"))
+
+    user = db_session.get(User, 1)
+    membership = db_session.query(FamilyMembership).filter_by(user_id=1).one()
+    return {"db": db_session, "user": user, "membership": membership}
+
+
+@contextmanager
+def _capture_selects(db_session):
+    engine = db_session.get_bind()
+    captured: list[tuple[str, tuple]] = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT") and any(t in statement for t in _HOT_TABLES):
+            captured.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield captured
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+
+def _plans(db_session, captured) -> list[list[str]]:
+    with db_session.get_bind().connect() as conn:
+        return [
+            [row[3] for row in conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters)]
+            for statement, parameters in captured
+        ]
+
+
+def _full_scans(plan: list[str]) -> list[str]:
+    bad = []
+    for detail in plan:
+        m = re.match(r"SCAN (\w+)(?: USING (?:COVERING )?INDEX (\w+))?", detail)
+        if not m or m.group(1) not in _HOT_TABLES:
+            continue
+        if m.group(2) not in _ORDERED_SCAN_INDEXES:
+            bad.append(detail)
+    return bad
+
+
+_HOT_CALLS = {
+    "list_reports": lambda c: router.list_reports(
+        subject_id=None, report_type=None, hospital=None, date_from=None, date_to=None,
+        page=1, size=20, cursor=None, with_total=True, **c,
+    ),
+    "list_reports_subject_dates": lambda c: router.list_reports(
+        subject_id=2, report_type=None, hospital=None, date_from="2024-03-01", date_to="2024-09-01",
+        page=1, size=20, cursor=None, with_total=True, **c,
+    ),
+    "list_hospitals": lambda c: router.list_hospitals(**c),
+    "trend_by_dictionary": lambda c: router.metric_trend(
+        dictionary_id=3, item_code=None, item_name=None, subject_id=None, **c,
+    ),
+    "trend_by_code": lambda c: router.metric_trend(
+        dictionary_id=None, item_code="C3", item_name=None, subject_id=None, **c,
+    ),
+    "trend_by_name": lambda c: router.metric_trend(
+        dictionary_id=None, item_code=None, item_name="指标3", subject_id=2, **c,
+    ),
+    "catalog": lambda c: router.metric_catalog(subject_id=None, mapped=0, category_key=None, **c),
+    "catalog_mapped": lambda c: router.metric_catalog(subject_id=None, mapped=1, category_key="blood_routine", **c),
+}
+
+
+@pytest.mark.parametrize("name", sorted(_HOT_CALLS))
+def test_hot_query_has_no_full_table_scan(seeded, name):
+    db = seeded["db"]
+    with _capture_selects(db) as captured:
+        out = _HOT_CALLS[name](seeded)
+    assert out.code == 0
+    assert captured
+
+    for (statement, _), plan in zip(captured, _plans(db, captured)):
+        assert not _full_scans(plan), f"{name} full scan:\n{statement}\n{plan}"
+
+
+def test_report_list_cursor_page_has_no_full_table_scan(seeded):
+    db = seeded["db"]
+    first = _HOT_CALLS["list_reports"](seeded).data
+    with _capture_selects(db) as captured:
+        router.list_reports(
+            subject_id=None, report_type=None, hospital=None, date_from=None, date_to=None,
+            page=1, size=20, cursor=first.next_cursor, with_total=False, **seeded,
+        )
+    for plan in _plans(db, captured):
+        assert not _full_scans(plan), plan
+
+
+def test_family_filter_and_catalog_use_covering_indexes(seeded):
+    db = seeded["db"]
+    with _capture_selects(db) as captured:
+        _HOT_CALLS["catalog"](seeded)
+    plan = " | ".join(_plans(db, captured)[-1])
+    # Uploads with no subject are found without visiting report rows, and
+    # code/name come straight from the metric index.
+    assert "COVERING INDEX ix_medical_reports_uploader_subject" in plan
+    assert "COVERING INDEX ix_medical_report_metrics_report_item" in plan
@@ -0,0 +1,88 @@
+from datetime import date
+
+import pytest
+
+from app.core.exceptions import PikaException
+from app.core.user import service as user_service
+from app.modules.medical import router
+from app.modules.medical.models import MedicalReport
+
+
+def _add_reports(db_session, user_id, dates):
+    # All inserted in the same second: created_at ties are broken by id.
+    for i, report_date in enumerate(dates):
+        db_session.add(
+            MedicalReport(
+                uploader_id=user_id, subject_id=user_id, report_type="blood",
+                report_date=report_date, image_path=f"r{i}.png", status="parsed",
+            )
+        )
+    db_session.commit()
+
+
+def _list(db_session, user, *, page=1, size=20, cursor=None, with_total=True):
+    membership = user_service.get_active_membership(db_session, user_id=user.id)
+    return router.list_reports(
+        subject_id=None, report_type=None, hospital=None, date_from=None, date_to=None,
+        page=page, size=size, cursor=cursor, with_total=with_total,
+        db=db_session, user=user, membership=membership,
+    ).data
+
+
+def _walk(db_session, user, *, size):
+    ids, cursor = [], None
+    for _ in range(20):
+        out = _list(db_session, user, size=size, cursor=cursor, with_total=False)
+        assert out.total is None
+        ids.extend(item.id for item in out.items)
+        cursor = out.next_cursor
+        if cursor is None:
+            return ids
+    pytest.fail(f"cursor walk did not terminate: {ids}")
+
+
+def test_cursor_walk_matches_offset_order(db_session, user):
+    _add_reports(db_session, user.id, [
+        date(2026, 5, 1), None, date(2026, 4, 1), date(2026, 5, 1),
+        None, date(2026, 4, 1), date(2026, 5, 1),
+    ])
+
+    full = _list(db_session, user, size=100)
+    assert full.total == 7
+    assert full.next_cursor is None
+    expected = [item.id for item in full.items]
+    assert [item.report_date for item in full.items][-2:] == [None, None]
+
+    for size in (1, 2, 3, 7):
+        assert _walk(db_session, user, size=size) == expected
+
+
+def test_cursor_is_stable_under_new_inserts(db_session, user):
+    _add_reports(db_session, user.id, [date(2026, 3, d) for d in range(1, 7)])
+    first = _list(db_session, user, size=3, with_total=False)
+    assert first.next_cursor is not None
+
+    # A newer report lands between page loads; offset paging would shift.
+    _add_reports(db_session, user.id, [date(2026, 6, 1)])
+    second = _list(db_session, user, size=3, cursor=first.next_cursor, with_total=False)
+
+    seen = [item.id for item in first.items] + [item.id for item in second.items]
+    assert len(set(seen)) == 6
+    assert [item.report_date.day for item in second.items] == [3, 2, 1]
+    assert second.next_cursor is None
+
+
+def test_page_size_mode_still_counts_and_offers_cursor(db_session, user):
+    _add_reports(db_session, user.id, [date(2026, 1, d) for d in range(1, 6)])
+
+    page2 = _list(db_session, user, page=2, size=2)
+    assert page2.total == 5
+    assert [item.report_date.day for item in page2.items] == [3, 2]
+    rest = _list(db_session, user, size=2, cursor=page2.next_cursor)
+    assert [item.report_date.day for item in rest.items] == [1]
+
+
+def test_invalid_cursor_rejected(db_session, user):
+    with pytest.raises(PikaException) as exc:
+        _list(db_session, user, cursor="not-a-cursor")
+    assert exc.value.code == 400
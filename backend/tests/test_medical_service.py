@@ -10,24 +10,6 @@ from app.modules.medical.models import (
 )
 
 
-@pytest.fixture
-def user(db_session):
-    u = User(openid="test-openid", nickname="tester", role="admin", account_type="wechat", status="active")
-    db_session.add(u)
-    db_session.commit()
-    db_session.refresh(u)
-    user_service.ensure_user_family(db_session, user=u)
-    return u
-
-
-@pytest.fixture
-def tmp_upload(monkeypatch, tmp_path):
-    # Redirect image storage to a temp dir so tests don't touch real uploads.
-    from app.core import storage
-    monkeypatch.setattr(storage.settings, "upload_dir", str(tmp_path))
-    return tmp_path
-
-
 _FAKE_PARSED = {
     "is_lab_report": True,
     "report_type": "blood",
@@ -114,6 +96,38 @@ def test_vision_failure_marks_failed_but_keeps_image(db_session, user, tmp_uploa
     assert len(draft["image_paths"]) == 1
 
 
+def test_stage_then_parse_draft_moves_status(db_session, user, tmp_upload, monkeypatch):
+    calls = []
+
+    def fake_parse(b, **kwargs):
+        calls.append(b)
+        return _FAKE_PARSED, "{}"
+
+    monkeypatch.setattr(vision, "parse_report_image", fake_parse)
+
+    draft = service.stage_draft(
+        db_session,
+        uploader_id=user.id,
+        subject_id=None,
+        files=[(b"\x89PNG\r\n\x1a\n staged", "a.png", "image/png")],
+        report_date_override="2026-01-02",
+    )
+    assert draft["status"] == "parsing"
+    assert draft["metrics"] == []
+    assert calls == []
+
+    parsed = service.parse_draft(db_session, draft["draft_id"])
+    assert parsed["status"] == "parsed"
+    assert calls == [b"\x89PNG\r\n\x1a\n staged"]
+    # The upload's override still wins over the parsed date.
+    assert str(parsed["report_date"]) == "2026-01-02"
+    assert service.get_draft(db_session, draft["draft_id"])["status"] == "parsed"
+
+
+def test_parse_missing_draft_returns_none(db_session):
+    assert service.parse_draft(db_session, "does-not-exist") is None
+
+
 def test_commit_missing_draft_raises(db_session):
     with pytest.raises(ValueError):
         service.commit_draft(
@@ -362,6 +376,7 @@ def test_update_report_edits_header_and_metrics(db_session, user, tmp_upload, mo
     # value re-derived from edited text: 15 > 9 -> high
     assert updated.metrics[0].value_num == 15.0
     assert updated.metrics[0].abnormal_flag == "high"
+    assert updated.abnormal_count == 1
 
 
 def test_update_missing_report_returns_none(db_session):
@@ -603,6 +618,8 @@ def test_list_reports_filters_multiple_hospitals(db_session, user, tmp_upload, m
         date_to=None,
         page=1,
         size=20,
+        cursor=None,
+        with_total=True,
         db=db_session,
         user=user,
         membership=membership,
@@ -613,6 +630,45 @@ def test_list_reports_filters_multiple_hospitals(db_session, user, tmp_upload, m
     assert out.data.total == 2
 
 
+def test_list_reports_reads_abnormal_count_without_loading_metrics(db_session, user, tmp_upload, monkeypatch):
+    from sqlalchemy import event
+
+    from app.modules.medical import router
+
+    many = dict(_FAKE_PARSED, metrics=[
+        dict(_FAKE_PARSED["metrics"][0], item_name=f"M{i}", item_code=f"M{i}", seq=i,
+             abnormal_flag=("high", "low", "normal")[i % 3])
+        for i in range(30)
+    ])
+    monkeypatch.setattr(vision, "parse_report_image", lambda b, **kwargs: (many, "{}"))
+    for i in range(5):
+        draft = service.create_draft_from_images(
+            db_session, uploader_id=user.id, subject_id=user.id,
+            files=[(f"\x89PNG n+1 {i}".encode(), "a.png", "image/png")],
+        )
+        _commit(db_session, draft)
+
+    membership = user_service.get_active_membership(db_session, user_id=user.id)
+    db_session.expire_all()
+    statements: list[str] = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    engine = db_session.get_bind()
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        out = router.list_reports(
+            subject_id=None, report_type=None, hospital=None, date_from=None, date_to=None,
+            page=1, size=20, cursor=None, with_total=True, db=db_session, user=user, membership=membership,
+        )
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+    assert [item.abnormal_count for item in out.data.items] == [20] * 5
+    assert not any("medical_report_metrics" in s for s in statements)
+
+
 def test_medical_acl_requires_same_family(db_session, user):
     outsider = User(openid="outsider-openid", nickname="外人", role="member", account_type="wechat", status="active")
     db_session.add(outsider)
@@ -1006,3 +1062,170 @@ def test_metric_catalog_supports_mapped_and_category_filter(db_session, user, tm
     assert out.data.items[0].dictionary_id == dic.id
     assert out.data.items[0].category_key == "blood_routine"
 
+
+def test_save_image_stream_hashes_while_writing(tmp_upload):
+    import hashlib
+    import io
+    import os
+
+    from app.core import storage
+
+    content = os.urandom(10_000)
+    rel, digest, size = storage.save_image_stream(io.BytesIO(content), "a.jpg", "image/jpeg", chunk_size=1024)
+
+    assert digest == hashlib.sha256(content).hexdigest()
+    assert size == len(content)
+    with open(storage.abs_path(rel), "rb") as f:
+        assert f.read() == content
+    # No temp file left next to the image.
+    assert os.listdir(os.path.dirname(storage.abs_path(rel))) == [os.path.basename(rel)]
+
+
+def test_stage_draft_from_file_objects_dedupes_and_cleans_up(db_session, user, tmp_upload, monkeypatch):
+    import io
+    import os
+
+    monkeypatch.setattr(vision, "parse_report_image", lambda b, **kwargs: (_FAKE_PARSED, "{}"))
+    content = b"\x89PNG\r\n\x1a\n streamed"
+
+    draft = service.create_draft_from_images(
+        db_session, uploader_id=user.id, subject_id=None,
+        files=[(io.BytesIO(content), "a.png", "image/png")],
+    )
+    _commit(db_session, draft)
+
+    # Same image as raw bytes hashes identically; the rejected copy is removed.
+    from app.core.exceptions import DuplicateReportError
+    with pytest.raises(DuplicateReportError):
+        service.stage_draft(
+            db_session, uploader_id=user.id, subject_id=None, files=[(content, "b.png", "image/png")]
+        )
+    saved = [f for _, _, names in os.walk(tmp_upload) for f in names]
+    assert saved == [os.path.basename(draft["image_paths"][0])]
+
+
+def _page(report_type, metrics, **header):
+    return {
+        "is_lab_report": True, "report_type": report_type, "report_type_label": None,
+        "report_date": header.get("report_date"), "hospital": header.get("hospital"),
+        "metrics": [
+            {"item_name": name, "item_code": code, "value_text": v, "value_num": None, "unit": None,
+             "ref_range": None, "ref_low": None, "ref_high": None, "abnormal_flag": "unknown", "seq": i}
+            for i, (name, code, v) in enumerate(metrics)
+        ],
+    }
+
+
+def test_multi_page_draft_parses_pages_concurrently_and_merges(
+    db_session, user, tmp_upload, monkeypatch, vision_concurrency
+):
+    import json
+    import threading
+    import time
+
+    pages = {
+        b"page-1": _page("unknown", [("WBC", "WBC", "5"), ("RBC", None, "4.5")], hospital="医院A"),
+        b"page-2": _page("blood", [("白细胞", "wbc", "5"), ("PLT", "PLT", "200")], report_date="2026-05-02"),
+        b"page-3": _page("blood", [("RBC", None, "4.5"), ("HGB", "HGB", "140")]),
+    }
+    in_flight, peak = 0, 0
+    lock = threading.Lock()
+
+    def fake_parse(b, **kwargs):
+        nonlocal in_flight, peak
+        with lock:
+            in_flight += 1
+            peak = max(peak, in_flight)
+        time.sleep(0.1)
+        with lock:
+            in_flight -= 1
+        return pages[b.split(b" ", 1)[1]], "{}"
+
+    monkeypatch.setattr(vision, "parse_report_image", fake_parse)
+    vision_concurrency(2)
+
+    draft = service.create_draft_from_images(
+        db_session, uploader_id=user.id, subject_id=None,
+        files=[(b"\x89PNG " + name, f"{name.decode()}.png", "image/png") for name in pages],
+    )
+
+    assert peak == 2
+    assert draft["status"] == "parsed"
+    assert draft["report_type"] == "blood"
+    assert draft["hospital"] == "医院A"
+    assert str(draft["report_date"]) == "2026-05-02"
+    assert [(m["item_name"], m["seq"]) for m in draft["metrics"]] == [
+        ("WBC", 0), ("RBC", 1), ("PLT", 2), ("HGB", 3),
+    ]
+    assert [p["page"] for p in json.loads(draft["raw_json"])] == [1, 2, 3]
+
+
+def test_multi_page_parse_tolerates_one_failed_page(db_session, user, tmp_upload, monkeypatch):
+    import json
+
+    def flaky(b, **kwargs):
+        if b.endswith(b"bad"):
+            raise RuntimeError("azure hiccup")
+        return _FAKE_PARSED, "{}"
+
+    monkeypatch.setattr(vision, "parse_report_image", flaky)
+    draft = service.create_draft_from_images(
+        db_session, uploader_id=user.id, subject_id=None,
+        files=[(b"\x89PNG good", "1.png", "image/png"), (b"\x89PNG bad", "2.png", "image/png")],
+    )
+
+    assert draft["status"] == "parsed"
+    assert len(draft["metrics"]) == 1
+    assert json.loads(draft["raw_json"])[1] == {"page": 2, "error": "azure hiccup"}
+
+    # Reparse covers every stored page too.
+    def by_page(b, **kwargs):
+        return _page("blood", [(b.split(b" ", 1)[1].decode(), None, "1")]), "{}"
+
+    monkeypatch.setattr(vision, "parse_report_image", by_page)
+    report = _commit(db_session, draft)
+    reparsed = service.reparse_report(db_session, report_id=report.id)
+    assert [m.item_name for m in reparsed.metrics] == ["good", "bad"]
+
+
+def test_backfill_reference_ranges_rederives_legacy_rows(db_session, user, tmp_upload, monkeypatch):
+    monkeypatch.setattr(vision, "parse_report_image", lambda b, **kwargs: (_FAKE_PARSED, "{}"))
+    draft = service.create_draft_from_images(
+        db_session, uploader_id=user.id, subject_id=None,
+        files=[(b"\x89PNG\r\n\x1a\n legacy", "a.png", "image/png")],
+    )
+
+    def legacy(name, value, ref_range, flag="unknown", low=None, high=None):
+        # As the old a-b-only parser stored them.
+        return {
+            "item_name": name, "item_code": None, "value_text": value, "value_num": vision._to_num(value),
+            "unit": None, "ref_range": ref_range, "ref_low": low, "ref_high": high, "abnormal_flag": flag,
+        }
+
+    report = _commit(db_session, draft, metrics=[
+        legacy("CRP", "6.0", "<5.0"),
+        legacy("ALT", "40", "≤ 40"),
+        legacy("eGFR", "60", ">60"),
+        legacy("HBsAg", "阳性", "阴性"),
+        legacy("WBC", "11", "4-9", flag="normal", low=4.0, high=9.0),
+        legacy("GLU", "5.0", "3.9～6.1"),
+    ])
+    assert report.abnormal_count == 0
+
+    out = service.backfill_reference_ranges(db_session, batch_size=4)
+
+    assert out == {"scanned": 6, "updated": 5, "reports": 1}
+    db_session.refresh(report)
+    got = {m.item_name: (m.ref_low, m.ref_high, m.abnormal_flag) for m in report.metrics}
+    assert got == {
+        "CRP": (None, 5.0, "high"),
+        "ALT": (None, 40.0, "normal"),
+        "eGFR": (60.0, None, "low"),
+        "HBsAg": (None, None, "high"),
+        # A stored explicit flag is kept, like an explicit model flag.
+        "WBC": (4.0, 9.0, "normal"),
+        "GLU": (3.9, 6.1, "normal"),
+    }
+    assert report.abnormal_count == 3
+
+    assert service.backfill_reference_ranges(db_session)["updated"] == 0
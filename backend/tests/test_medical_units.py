@@ -0,0 +1,39 @@
+import pytest
+
+from app.modules.medical import units
+
+
+@pytest.mark.parametrize(
+    ("raw", "normalized"),
+    [
+        ("μmol/L", "umol/l"),
+        ("µmol/L", "umol/l"),
+        (" mg / dL ", "mg/dl"),
+        ("10⁹/L", "10^9/l"),
+        ("×10^12/L", "10^12/l"),
+        ("10*9/L", "10^9/l"),
+        ("IU/L", "u/l"),
+        ("mIU/mL", "mu/ml"),
+        ("个/μL", "/ul"),
+        (None, ""),
+    ],
+)
+def test_normalize_unit_spellings(raw, normalized):
+    assert units.normalize_unit(raw) == normalized
+
+
+def test_factor_within_dimension_and_across_with_molar_mass():
+    assert units.factor("g/dL", "g/L") == 10.0
+    assert units.factor("10^3/μL", "10^9/L") == 1.0
+    assert units.factor("IU/L", "U/L") == 1.0
+    assert units.convert(126.0, units.factor("mg/dL", "mmol/L", ("GLU", "葡萄糖"))) == 6.99378
+    assert units.convert(1.0, units.factor("mg/dL", "μmol/L", ("x", "肌酐"))) == 88.4017
+    assert units.convert(88.4017, units.factor("umol/L", "mg/dL", ("crea",))) == 1.0
+
+
+def test_factor_refuses_what_it_cannot_convert():
+    assert units.factor("mg/dL", "mmol/L", ("unknown",)) is None
+    assert units.factor("g/L", "U/L") is None
+    assert units.factor("mmol/L", None) is None
+    assert units.factor(None, None) == 1.0
+    assert units.convert(None, 2.0) is None
@@ -0,0 +1,254 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import Future
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import httpx
+import pytest
+from sqlalchemy.orm import sessionmaker
+
+from app import main
+from app.core.db import get_db
+from app.modules.medical import jobs, service, vision
+
+SLOW_PARSE_SECONDS = 0.5
+IN_FLIGHT = 4
+
+_FAKE_PARSED = {
+    "is_lab_report": True,
+    "report_type": "blood",
+    "report_type_label": "血常规",
+    "report_date": "2026-05-01",
+    "hospital": None,
+    "metrics": [],
+}
+
+
+@pytest.fixture
+def user(user, db_session):
+    # Seed categories up front so concurrent uploads don't race to create them.
+    service.list_user_categories(db_session, user_id=user.id)
+    return user
+
+
+@pytest.fixture
+def client_app(db_session, user, monkeypatch, tmp_path):
+    from app.core import storage
+
+    monkeypatch.setattr(storage.settings, "upload_dir", str(tmp_path))
+    monkeypatch.setattr(main, "engine", db_session.get_bind())
+
+    RequestSession = sessionmaker(bind=db_session.get_bind(), autocommit=False, autoflush=False)
+
+    def override_get_db():
+        db = RequestSession()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    monkeypatch.setattr(jobs, "SessionLocal", RequestSession)
+    main.app.dependency_overrides[get_db] = override_get_db
+    try:
+        yield main.app
+    finally:
+        main.app.dependency_overrides.pop(get_db, None)
+
+
+def test_health_stays_responsive_while_parses_in_flight(client_app, user, monkeypatch):
+    def slow_parse(_b, **kwargs):
+        time.sleep(SLOW_PARSE_SECONDS)
+        return _FAKE_PARSED, "{}"
+
+    monkeypatch.setattr(vision, "parse_report_image", slow_parse)
+    headers = {"X-Pika-Token": user.openid}
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=client_app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            started = time.perf_counter()
+            uploads = [
+                asyncio.create_task(
+                    client.post(
+                        "/api/medical/report-drafts",
+                        files=[("files", (f"{i}.png", b"\x89PNG\r\n\x1a\n slow-%d" % i, "image/png"))],
+                        headers=headers,
+                    )
+                )
+                for i in range(IN_FLIGHT)
+            ]
+            # Let every upload reach the (sleeping) vision call first.
+            await asyncio.sleep(SLOW_PARSE_SECONDS / 5)
+
+            health_started = time.perf_counter()
+            health = await client.get("/health")
+            health_latency = time.perf_counter() - health_started
+
+            responses = await asyncio.gather(*uploads)
+            return health, health_latency, responses, time.perf_counter() - started
+
+    health, health_latency, responses, total = asyncio.run(scenario())
+
+    assert health.status_code == 200
+    assert health.json()["code"] == 0
+    assert health_latency < SLOW_PARSE_SECONDS / 2
+    assert [r.json()["code"] for r in responses] == [0] * IN_FLIGHT
+    # Parses overlap on the worker pool instead of running back to back.
+    assert total < SLOW_PARSE_SECONDS * IN_FLIGHT
+
+
+def test_async_draft_returns_parsing_then_long_poll_gets_result(client_app, user, monkeypatch):
+    def slow_parse(_b, **kwargs):
+        time.sleep(SLOW_PARSE_SECONDS)
+        return {**_FAKE_PARSED, "report_type": "liver"}, "{}"
+
+    monkeypatch.setattr(vision, "parse_report_image", slow_parse)
+    headers = {"X-Pika-Token": user.openid}
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=client_app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            started = time.perf_counter()
+            created = await client.post(
+                "/api/medical/report-drafts",
+                files=[("files", ("a.png", b"\x89PNG\r\n\x1a\n async", "image/png"))],
+                data={"async_parse": "1"},
+                headers=headers,
+            )
+            created_latency = time.perf_counter() - started
+            draft_id = created.json()["data"]["draft_id"]
+
+            early = await client.get(f"/api/medical/report-drafts/{draft_id}", headers=headers)
+            polled = await client.get(
+                f"/api/medical/report-drafts/{draft_id}", params={"wait": 5}, headers=headers
+            )
+            return created, created_latency, early, polled
+
+    created, created_latency, early, polled = asyncio.run(scenario())
+
+    assert created.json()["data"]["status"] == "parsing"
+    assert created_latency < SLOW_PARSE_SECONDS
+    assert early.json()["data"]["status"] == "parsing"
+    assert polled.json()["data"]["status"] == "parsed"
+    assert polled.json()["data"]["report_type"] == "liver"
+
+
+def test_poll_unknown_draft_is_not_found(client_app, user):
+    async def scenario():
+        transport = httpx.ASGITransport(app=client_app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.get(
+                "/api/medical/report-drafts/nope", headers={"X-Pika-Token": user.openid}
+            )
+
+    resp = asyncio.run(scenario())
+    assert resp.json()["code"] == 404
+
+
+def test_poll_requeues_parse_orphaned_by_restart(client_app, user, db_session, monkeypatch):
+    monkeypatch.setattr(vision, "parse_report_image", lambda b, **kwargs: (_FAKE_PARSED, "{}"))
+    headers = {"X-Pika-Token": user.openid}
+    # Staged, but its job died with the process that owned it.
+    orphan = service.stage_draft(
+        db_session, uploader_id=user.id, subject_id=None,
+        files=[(b"\x89PNG\r\n\x1a\n orphan", "a.png", "image/png")],
+    )
+    fresh = service.stage_draft(
+        db_session, uploader_id=user.id, subject_id=None,
+        files=[(b"\x89PNG\r\n\x1a\n fresh", "b.png", "image/png")],
+    )
+
+    class AnHourLater(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return datetime.now(tz) + timedelta(hours=1)
+
+    monkeypatch.setattr(jobs, "datetime", AnHourLater)
+    monkeypatch.setattr(jobs.settings, "parse_orphan_after", 600)
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=client_app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.get(
+                f"/api/medical/report-drafts/{orphan['draft_id']}", params={"wait": 5}, headers=headers
+            )
+
+    polled = asyncio.run(scenario())
+    assert polled.json()["data"]["status"] == "parsed"
+    assert polled.json()["data"]["report_type"] == "blood"
+
+    # Still inside the window: left to the worker that staged it.
+    monkeypatch.setattr(jobs, "datetime", datetime)
+    assert jobs.resume_orphaned(service.get_draft(db_session, fresh["draft_id"])) is None
+    assert jobs.pending_job(fresh["draft_id"]) is None
+
+
+def test_full_parse_queue_shows_in_health_and_rejects_upload(client_app, user, monkeypatch, caplog):
+    monkeypatch.setattr(jobs.settings, "parse_queue_limit", 1)
+    monkeypatch.setitem(jobs._pending, "queued-draft", Future())
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=client_app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            health = await client.get("/health")
+            upload = await client.post(
+                "/api/medical/report-drafts",
+                files=[("files", ("a.png", b"\x89PNG\r\n\x1a\n full", "image/png"))],
+                headers={"X-Pika-Token": user.openid},
+            )
+            return health, upload
+
+    with caplog.at_level("WARNING", logger=jobs.logger.name):
+        health, upload = asyncio.run(scenario())
+
+    assert health.json()["data"]["parse_queue"] == {"pending": 1, "limit": 1}
+    assert upload.json()["code"] == 5031
+    assert "parse queue full (1/1)" in caplog.text
+
+
+def test_vision_calls_stay_under_one_process_wide_limit(client_app, user, monkeypatch, vision_concurrency):
+    in_flight, peak = 0, 0
+    lock = threading.Lock()
+
+    def create(**kwargs):
+        nonlocal in_flight, peak
+        with lock:
+            in_flight += 1
+            peak = max(peak, in_flight)
+        time.sleep(SLOW_PARSE_SECONDS / 5)
+        with lock:
+            in_flight -= 1
+        message = SimpleNamespace(content='{"report_type": "blood", "metrics": []}')
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+    fake_client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+    monkeypatch.setattr(vision, "_client_instance", fake_client)
+    monkeypatch.setattr(vision.settings, "vision_cache_enabled", False)
+    monkeypatch.setattr(vision.settings, "vision_preprocess", False)
+    vision_concurrency(2)
+    headers = {"X-Pika-Token": user.openid}
+    # Multi-page reports (page pool) and single-page ones (parse workers) at once.
+    page_counts = [3, 3, 1, 1]
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=client_app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            uploads = [
+                client.post(
+                    "/api/medical/report-drafts",
+                    files=[
+                        ("files", (f"{i}-{page}.png", b"\x89PNG\r\n\x1a\n %d-%d" % (i, page), "image/png"))
+                        for page in range(pages)
+                    ],
+                    headers=headers,
+                )
+                for i, pages in enumerate(page_counts)
+            ]
+            return await asyncio.gather(*uploads)
+
+    responses = asyncio.run(scenario())
+
+    assert [r.json()["data"]["status"] for r in responses] == ["parsed"] * len(page_counts)
+    assert peak == 2
@@ -0,0 +1,111 @@
+import os
+import time
+
+import pytest
+
+from app.modules.medical import vision, vision_cache
+
+_REPLY = '{"is_lab_report": true, "report_type": "blood", "metrics": [{"item_name": "WBC", "value": "5"}]}'
+
+
+class _FakeClient:
+    def __init__(self, reply: str = _REPLY):
+        self.calls = 0
+        self.reply = reply
+        client = self
+
+        class _Completions:
+            def create(self, **kwargs):
+                client.calls += 1
+                msg = type("M", (), {"content": client.reply})
+                return type("R", (), {"choices": [type("C", (), {"message": msg})]})
+
+        self.chat = type("Chat", (), {"completions": _Completions()})
+
+
+@pytest.fixture
+def cache(monkeypatch, tmp_path):
+    c = vision_cache.VisionCache(str(tmp_path / "vision"), max_bytes=1024 * 1024)
+    monkeypatch.setattr(vision_cache, "_cache", c)
+    monkeypatch.setattr(vision.settings, "vision_cache_enabled", True)
+    monkeypatch.setattr(vision.settings, "vision_preprocess", False)
+    return c
+
+
+@pytest.fixture
+def client(monkeypatch):
+    c = _FakeClient()
+    monkeypatch.setattr(vision, "_client", lambda: c)
+    return c
+
+
+def test_identical_image_and_prompt_hits_cache(cache, client):
+    first, raw1 = vision.parse_report_image(b"img-a", category_candidates=["血常规"])
+    second, raw2 = vision.parse_report_image(b"img-a", category_candidates=["血常规"])
+
+    assert client.calls == 1
+    assert first == second
+    assert raw1 == raw2 == _REPLY
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_different_image_or_candidates_miss(cache, client):
+    vision.parse_report_image(b"img-a", category_candidates=["血常规"])
+    vision.parse_report_image(b"img-b", category_candidates=["血常规"])
+    vision.parse_report_image(b"img-a", category_candidates=["肝功能"])
+
+    assert client.calls == 3
+    assert cache.stats()["hits"] == 0
+
+
+def test_use_cache_false_forces_fresh_call_and_refreshes(cache, client):
+    vision.parse_report_image(b"img-a")
+    client.reply = '{"report_type": "liver", "metrics": []}'
+
+    parsed, _ = vision.parse_report_image(b"img-a", use_cache=False)
+    assert client.calls == 2
+    assert parsed["report_type"] == "liver"
+
+    # The fresh reply replaced the cached one.
+    again, _ = vision.parse_report_image(b"img-a")
+    assert client.calls == 2
+    assert again["report_type"] == "liver"
+
+
+def test_unparseable_reply_is_not_cached(cache, client):
+    client.reply = "sorry, I can't help"
+    with pytest.raises(Exception):
+        vision.parse_report_image(b"img-a")
+    assert cache.stats()["writes"] == 0
+
+
+def test_eviction_drops_oldest_entries(tmp_path):
+    c = vision_cache.VisionCache(str(tmp_path), max_bytes=250)
+    for i in range(5):
+        c.put(f"{i:02d}" + "0" * 62, "x" * 100)
+        path = c._path(f"{i:02d}" + "0" * 62)
+        # Distinct mtimes so LRU order is deterministic.
+        ts = time.time() - 100 + i
+        os.utime(path, (ts, ts))
+
+    assert c.stats()["evictions"] >= 3
+    assert c.get("04" + "0" * 62) == "x" * 100
+    assert c.get("00" + "0" * 62) is None
+    total = sum(
+        os.path.getsize(os.path.join(d, n)) for d, _, names in os.walk(tmp_path) for n in names
+    )
+    assert total <= 250
+
+
+def test_overwriting_a_key_counts_only_the_new_size(tmp_path):
+    c = vision_cache.VisionCache(str(tmp_path), max_bytes=250)
+    key = "ab" + "0" * 62
+    c.put("cd" + "0" * 62, "y" * 100)
+    c.put(key, "x" * 100)
+    for _ in range(5):
+        c.put(key, "x" * 120)
+
+    assert c._bytes == 220
+    assert c.stats()["evictions"] == 0
+    assert c.get("cd" + "0" * 62) == "y" * 100
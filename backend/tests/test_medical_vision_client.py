@@ -0,0 +1,103 @@
+import httpx
+import openai
+import pytest
+from openai import AzureOpenAI
+
+from app.modules.medical import vision
+
+_COMPLETION = {
+    "id": "x",
+    "object": "chat.completion",
+    "created": 0,
+    "model": "m",
+    "choices": [
+        {
+            "index": 0,
+            "finish_reason": "stop",
+            "message": {"role": "assistant", "content": '{"report_type": "blood", "metrics": []}'},
+        }
+    ],
+}
+
+
+@pytest.fixture
+def responses(monkeypatch):
+    """Queue of httpx.Response objects the fake Azure endpoint returns in order."""
+    queue: list[httpx.Response] = []
+    calls: list[httpx.Request] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request)
+        return queue.pop(0)
+
+    client = AzureOpenAI(
+        azure_endpoint="https://example.invalid",
+        api_key="k",
+        api_version="2024-10-21",
+        max_retries=0,
+        http_client=httpx.Client(transport=httpx.MockTransport(handler)),
+    )
+    monkeypatch.setattr(vision, "_client_instance", client)
+    monkeypatch.setattr(vision.settings, "vision_cache_enabled", False)
+    monkeypatch.setattr(vision.settings, "vision_preprocess", False)
+    monkeypatch.setattr(vision.settings, "vision_max_retries", 3)
+    sleeps: list[float] = []
+    monkeypatch.setattr(vision.time, "sleep", sleeps.append)
+    return queue, calls, sleeps
+
+
+def test_client_is_built_once_and_lazily(monkeypatch):
+    monkeypatch.setattr(vision, "_client_instance", None)
+    monkeypatch.setattr(vision.settings, "azure_openai_endpoint", "https://example.invalid")
+    monkeypatch.setattr(vision.settings, "azure_openai_api_key", "k")
+    first = vision._client()
+    assert vision._client() is first
+    vision.close_client()
+    assert vision._client_instance is None
+
+
+def test_429_is_retried_honoring_retry_after(responses):
+    queue, calls, sleeps = responses
+    queue += [
+        httpx.Response(429, headers={"retry-after": "2"}, json={"error": {"message": "slow down"}}),
+        httpx.Response(200, json=_COMPLETION),
+    ]
+
+    parsed, _ = vision.parse_report_image(b"img")
+
+    assert parsed["report_type"] == "blood"
+    assert len(calls) == 2
+    assert sleeps == [2.0]
+
+
+def test_5xx_backoff_is_jittered_and_bounded(responses, monkeypatch):
+    queue, calls, sleeps = responses
+    monkeypatch.setattr(vision.settings, "vision_retry_base_delay", 1.0)
+    queue += [httpx.Response(503, json={}), httpx.Response(502, json={}), httpx.Response(200, json=_COMPLETION)]
+
+    vision.parse_report_image(b"img")
+
+    assert len(calls) == 3
+    assert 0 <= sleeps[0] <= 1.0
+    assert 0 <= sleeps[1] <= 2.0
+
+
+def test_client_errors_are_not_retried(responses):
+    queue, calls, sleeps = responses
+    queue.append(httpx.Response(400, json={"error": {"message": "bad image"}}))
+
+    with pytest.raises(openai.BadRequestError):
+        vision.parse_report_image(b"img")
+    assert len(calls) == 1
+    assert sleeps == []
+
+
+def test_gives_up_after_max_retries(responses, monkeypatch):
+    queue, calls, sleeps = responses
+    monkeypatch.setattr(vision.settings, "vision_max_retries", 2)
+    queue += [httpx.Response(500, json={}) for _ in range(3)]
+
+    with pytest.raises(openai.InternalServerError):
+        vision.parse_report_image(b"img")
+    assert len(calls) == 3
+    assert len(sleeps) == 2
@@ -0,0 +1,65 @@
+"""Alembic chain on a real database: SQLite by default, or whatever
+PIKA_TEST_DATABASE_URL points at (migrations carry data steps that must
+stay portable, e.g. boolean literals PostgreSQL won't cast from 1)."""
+import os
+import tempfile
+
+import pytest
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import create_engine, inspect, make_url, text
+from sqlalchemy.pool import NullPool
+
+from app.core import db as core_db
+
+_BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _alembic_config() -> Config:
+    # No ini file: env.py takes the URL from settings and leaves logging alone.
+    config = Config()
+    config.set_main_option("script_location", os.path.join(_BACKEND_DIR, "alembic"))
+    return config
+
+
+@pytest.fixture
+def migration_engine(monkeypatch):
+    path = None
+    if os.environ.get("PIKA_TEST_DATABASE_URL"):
+        url = make_url(os.environ["PIKA_TEST_DATABASE_URL"])
+    else:
+        fd, path = tempfile.mkstemp(suffix=".db")
+        os.close(fd)
+        url = make_url(f"sqlite:///{path}")
+    monkeypatch.setattr(core_db.settings, "database_url", url.render_as_string(hide_password=False))
+    engine = create_engine(url, poolclass=NullPool)
+    try:
+        yield engine
+    finally:
+        engine.dispose()
+        if path:
+            os.remove(path)
+
+
+def test_upgrade_backfills_then_downgrades_cleanly(migration_engine):
+    config = _alembic_config()
+    command.upgrade(config, "af6a6363811c")
+    with migration_engine.begin() as conn:
+        conn.execute(text(
+            "INSERT INTO users (openid, nickname, role) VALUES ('a', '管理员', 'admin'), ('m', '成员', 'member')"
+        ))
+
+    command.upgrade(config, "head")
+    with migration_engine.connect() as conn:
+        memberships = conn.execute(text(
+            "SELECT u.openid, fm.family_role, fm.is_active FROM family_memberships fm "
+            "JOIN users u ON u.id = fm.user_id ORDER BY u.openid"
+        )).all()
+        category_owners = conn.execute(text(
+            "SELECT DISTINCT u.openid FROM medical_report_categories c JOIN users u ON u.id = c.user_id ORDER BY u.openid"
+        )).scalars().all()
+    assert [tuple(r) for r in memberships] == [("a", "admin", True), ("m", "member", True)]
+    assert category_owners == ["a", "m"]
+
+    command.downgrade(config, "base")
+    assert set(inspect(migration_engine).get_table_names()) <= {"alembic_version"}
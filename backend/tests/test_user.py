@@ -1,42 +1,9 @@
 import os
-import tempfile
 
 import pytest
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
 
-from app.core.db import Base
-from app.core import models_base  # noqa: F401
-from app.core.user import models as user_models  # noqa: F401
 from app.core.user import service
 from app.core.user.models import FamilyMembership, User
-from app.modules.medical import models  # noqa: F401
-
-
-@pytest.fixture
-def db_session():
-    fd, path = tempfile.mkstemp(suffix=".db")
-    os.close(fd)
-    engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
-    Base.metadata.create_all(bind=engine)
-    Session = sessionmaker(bind=engine, autocommit=False, autoflush=False)
-    session = Session()
-    try:
-        yield session
-    finally:
-        session.close()
-        engine.dispose()
-        os.remove(path)
-
-
-@pytest.fixture
-def user(db_session):
-    u = User(openid="me", nickname="我", role="admin", account_type="wechat", status="active")
-    db_session.add(u)
-    db_session.commit()
-    db_session.refresh(u)
-    service.ensure_user_family(db_session, user=u)
-    return u
 
 
 @pytest.fixture
@@ -45,6 +45,18 @@ class TestParseRange:
     def test_negative_bounds(self):
         assert vision._parse_range("-2.0 - 3.0") == (-2.0, 3.0)
 
+    def test_full_width(self):
+        assert vision._parse_range("3.5～9.5") == (3.5, 9.5)
+        assert vision._parse_range("３．５－９．５") == (3.5, 9.5)
+
+    def test_one_sided(self):
+        assert vision._parse_range("<5.0") == (None, 5.0)
+        assert vision._parse_range("≤ 40") == (None, 40.0)
+        assert vision._parse_range(">60") == (60.0, None)
+        assert vision._parse_range("＜0.5") == (None, 0.5)
+        assert vision._parse_range("40 U/L以下") == (None, 40.0)
+        assert vision._parse_range("不低于1.0") == (1.0, None)
+
 
 class TestToNum:
     def test_plain(self):
@@ -82,6 +94,22 @@ class TestDeriveFlag:
     def test_missing_value_keeps_given(self):
         assert vision._derive_flag(None, 4, 9, "unknown") == "unknown"
 
+    def test_one_sided_bounds_respect_inclusiveness(self):
+        assert vision._derive_flag(5.0, None, 5.0, "unknown", ref_range="<5.0") == "high"
+        assert vision._derive_flag(4.9, None, 5.0, "unknown", ref_range="<5.0") == "normal"
+        assert vision._derive_flag(40, None, 40, "unknown", ref_range="≤40") == "normal"
+        assert vision._derive_flag(60, 60, None, "unknown", ref_range=">60") == "low"
+        assert vision._derive_flag(61, 60, None, None) == "normal"
+
+    def test_qualitative_range(self):
+        assert vision._derive_flag(None, None, None, "unknown", ref_range="阴性", value_text="阴性(-)") == "normal"
+        assert vision._derive_flag(None, None, None, "unknown", ref_range="阴性", value_text="弱阳性") == "high"
+        assert vision._derive_flag(None, None, None, "unknown", ref_range="(-)", value_text="未检出") == "normal"
+        assert vision._derive_flag(None, None, None, "unknown", ref_range="阴性", value_text="±") == "unknown"
+
+    def test_edited_bounds_win_over_range_text(self):
+        assert vision._derive_flag(8, 4, 7, "unknown", ref_range="4-9") == "high"
+
 
 class TestNormalizeMetric:
     def test_full_metric_derives_flag(self):
@@ -106,6 +134,13 @@ class TestNormalizeMetric:
         assert out["value_num"] is None
         assert out["abnormal_flag"] == "unknown"
 
+    def test_qualitative_value_against_qualitative_range(self):
+        out = vision._normalize_metric(
+            {"item_name": "HBsAg", "value": "阳性(+)", "ref_range": "阴性"}, seq=1
+        )
+        assert (out["ref_low"], out["ref_high"]) == (None, None)
+        assert out["abnormal_flag"] == "high"
+
     def test_seq_is_passed_through(self):
         out = vision._normalize_metric({"item_name": "X", "value": "1"}, seq=7)
         assert out["seq"] == 7